@@ -0,0 +1,308 @@
+import math
+from calculator import trig
+from calculator.parser import UnaryOp, BinaryOp, Number, Function, Variable, Call
+from calculator.evaluator import (
+    resolve_unary, apply_unary, apply_binary, apply_function, apply_call, lookup_variable,
+)
+
+# Множитель перевода градусов в радианы и обратно
+_RADIANS = math.pi / 180
+_DEGREES = 180 / math.pi
+
+# Частные производные считаются по правилам IEEE 754, как в gradient_batch:
+# где производная не определена или слишком велика, она равна inf или NaN,
+# а не исключению (само значение выражения проверяется как в evaluate())
+
+def _quotient(left, right):
+    # Деление с x/0 = ±inf и 0/0 = nan; переполнение float и так даёт inf
+    try:
+        return left / right
+    except ZeroDivisionError:
+        if left == 0 or left != left:
+            return math.nan
+        return math.copysign(math.inf, left) * math.copysign(1.0, right)
+
+def _ieee_power(left, right):
+    # Степень с ±inf вместо ZeroDivisionError (0 в отрицательной степени)
+    # и OverflowError, как у np.power
+    try:
+        return float(left) ** right
+    except (ZeroDivisionError, OverflowError):
+        odd = float(right).is_integer() and right % 2 == 1
+        return math.copysign(math.inf, left) if odd else math.inf
+
+def _power_partials(left, right, result, need_left, need_right):
+    # Производные считаются только по аргументам, зависящим от переменных:
+    # например, 0 ^ 0.5 вычислимо, а производная по основанию - нет
+    d_left = d_right = 0.0
+    if need_left and right != 0:
+        d_left = right * _ieee_power(left, right - 1)
+    if need_right:
+        if left > 0:
+            d_right = result * math.log(left)
+        elif left < 0 or right <= 0 or right != right:
+            # По показателю при неположительном основании производной нет
+            d_right = math.nan
+    return d_left, d_right
+
+# Частные производные бинарных операций: (left, right, result, need_left, need_right) -> (d_left, d_right)
+BINARY_DERIVATIVES = {
+    '+': lambda left, right, result, need_left, need_right: (1.0, 1.0),
+    '-': lambda left, right, result, need_left, need_right: (1.0, -1.0),
+    '*': lambda left, right, result, need_left, need_right: (right, left),
+    '/': lambda left, right, result, need_left, need_right: (_quotient(1.0, right), -_quotient(result, right)),
+    '^': _power_partials,
+}
+
+UNARY_DERIVATIVES = {
+    '-': -1.0,
+}
+
+# Производные функций: (аргумент, значение) -> производная
+RADIAN_DERIVATIVES = {
+    'sqrt': lambda x, y: _quotient(0.5, y),
+    'sin': lambda x, y: math.cos(x),
+    'cos': lambda x, y: -math.sin(x),
+    'tg': lambda x, y: 1 + y * y,
+    'ctg': lambda x, y: -(1 + y * y),
+    'ln': lambda x, y: _quotient(1.0, x),
+    'exp': lambda x, y: y,
+    'arctg': lambda x, y: 1 / (1 + x * x),
+}
+
+DEGREE_DERIVATIVES = {
+    **RADIAN_DERIVATIVES,
+    'sin': lambda x, y: math.cos(math.radians(x)) * _RADIANS,
+    'cos': lambda x, y: -math.sin(math.radians(x)) * _RADIANS,
+    'tg': lambda x, y: (1 + y * y) * _RADIANS,
+    'ctg': lambda x, y: -(1 + y * y) * _RADIANS,
+    'arctg': lambda x, y: _DEGREES / (1 + x * x),
+}
+
+EXACT_DEGREE_DERIVATIVES = {
+    **DEGREE_DERIVATIVES,
+    'sin': lambda x, y: trig.cos(x) * _RADIANS,
+    'cos': lambda x, y: -trig.sin(x) * _RADIANS,
+}
+
+def _partials(degrees):
+    if degrees == trig.EXACT:
+        return EXACT_DEGREE_DERIVATIVES
+    return DEGREE_DERIVATIVES if degrees else RADIAN_DERIVATIVES
+
+def _selected(args, result, needs):
+    # Производная min/max равна 1 по первому аргументу, равному результату
+    # (результат NaN не равен ничему, и все производные нулевые)
+    partials = [0.0] * len(args)
+    for i, arg in enumerate(args):
+        if arg == result:
+            partials[i] = 1.0
+            break
+    return partials
+
+# Частные производные функций нескольких аргументов: (аргументы, значение, нужные) -> список
+CALL_DERIVATIVES = {
+    'hypot': lambda args, result, needs: [_quotient(arg, result) if need else 0.0 for arg, need in zip(args, needs)],
+    'pow': lambda args, result, needs: list(_power_partials(args[0], args[1], result, needs[0], needs[1])),
+    'min': _selected,
+    'max': _selected,
+}
+
+# Маркер в стеке обхода: следующий за ним узел готов к применению
+_APPLY = object()
+
+def derivative(expr, variables=None, wrt=None, degrees=False):
+    """Прямой режим: значение и производная по направлению за один обход.
+
+    wrt - имя переменной или словарь {имя: компонента направления}.
+    Возвращает (значение, производная).
+    """
+    if isinstance(wrt, str):
+        seeds = {wrt: 1.0}
+    else:
+        seeds = dict(wrt or {})
+    partials = _partials(degrees)
+    values = []
+    tangents = []
+    stack = [expr]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        node = pop()
+        if node is _APPLY:
+            node = pop()
+            if isinstance(node, BinaryOp):
+                right = values.pop()
+                right_tangent = tangents.pop()
+                left = values[-1]
+                left_tangent = tangents[-1]
+                result = apply_binary(node.op, left, right)
+                values[-1] = result
+                if left_tangent or right_tangent:
+                    d_left, d_right = BINARY_DERIVATIVES[node.op](
+                        left, right, result, bool(left_tangent), bool(right_tangent))
+                    tangent = 0.0
+                    if left_tangent:
+                        tangent += d_left * left_tangent
+                    if right_tangent:
+                        tangent += d_right * right_tangent
+                    tangents[-1] = tangent
+            elif isinstance(node, Function):
+                arg = values[-1]
+                result = apply_function(node.name, arg, degrees)
+                values[-1] = result
+                if tangents[-1]:
+                    tangents[-1] *= partials[node.name](arg, result)
+            elif isinstance(node, Call):
+                count = len(node.args)
+                args = values[-count:]
+                arg_tangents = tangents[-count:]
+                del values[-count:], tangents[-count:]
+                result = apply_call(node.name, args)
+                values.append(result)
+                tangent = 0.0
+                if any(arg_tangents):
+                    d_args = CALL_DERIVATIVES[node.name](args, result, [bool(t) for t in arg_tangents])
+                    for d, t in zip(d_args, arg_tangents):
+                        if t:
+                            tangent += d * t
+                tangents.append(tangent)
+            else:
+                values[-1] = apply_unary(node.op, values[-1])
+                tangents[-1] *= UNARY_DERIVATIVES[node.op]
+        elif isinstance(node, Number):
+            values.append(node.value)
+            tangents.append(0.0)
+        elif isinstance(node, Variable):
+            values.append(lookup_variable(node.name, variables))
+            tangents.append(seeds.get(node.name, 0.0))
+        elif isinstance(node, BinaryOp):
+            push(node)
+            push(_APPLY)
+            push(node.right)
+            push(node.left)
+        elif isinstance(node, UnaryOp):
+            resolve_unary(node.op)
+            push(node)
+            push(_APPLY)
+            push(node.operand)
+        elif isinstance(node, Function):
+            push(node)
+            push(_APPLY)
+            push(node.arg)
+        elif isinstance(node, Call):
+            push(node)
+            push(_APPLY)
+            stack.extend(reversed(node.args))
+        else:
+            raise TypeError("Invalid expression type")
+    return values[0], tangents[0]
+
+def gradient(expr, variables=None, degrees=False):
+    """Обратный режим: значение и градиент по всем переменным.
+
+    Прямой обход вычисляет значение и записывает на ленту локальные
+    частные производные, обратный проход накапливает сопряжённые значения.
+    Стоимость не зависит от числа переменных. Возвращает
+    (значение, {имя: частная производная}) для всех имён из variables.
+    """
+    partials = _partials(degrees)
+    # Лента: для каждого узла, зависящего от переменных, пары (индекс аргумента, производная)
+    tape = []
+    slots = {}
+    values = []
+    indices = []
+    stack = [expr]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        node = pop()
+        if node is _APPLY:
+            node = pop()
+            if isinstance(node, BinaryOp):
+                right = values.pop()
+                right_index = indices.pop()
+                left = values[-1]
+                left_index = indices[-1]
+                result = apply_binary(node.op, left, right)
+                values[-1] = result
+                if left_index is None and right_index is None:
+                    continue
+                d_left, d_right = BINARY_DERIVATIVES[node.op](
+                    left, right, result, left_index is not None, right_index is not None)
+                entry = []
+                if left_index is not None:
+                    entry.append((left_index, d_left))
+                if right_index is not None:
+                    entry.append((right_index, d_right))
+                indices[-1] = len(tape)
+                tape.append(entry)
+            elif isinstance(node, Function):
+                arg = values[-1]
+                result = apply_function(node.name, arg, degrees)
+                values[-1] = result
+                if indices[-1] is not None:
+                    tape.append(((indices[-1], partials[node.name](arg, result)),))
+                    indices[-1] = len(tape) - 1
+            elif isinstance(node, Call):
+                count = len(node.args)
+                args = values[-count:]
+                arg_indices = indices[-count:]
+                del values[-count:], indices[-count:]
+                result = apply_call(node.name, args)
+                values.append(result)
+                needs = [index is not None for index in arg_indices]
+                if not any(needs):
+                    indices.append(None)
+                    continue
+                d_args = CALL_DERIVATIVES[node.name](args, result, needs)
+                indices.append(len(tape))
+                tape.append([(index, d) for index, d in zip(arg_indices, d_args) if index is not None])
+            else:
+                values[-1] = apply_unary(node.op, values[-1])
+                if indices[-1] is not None:
+                    tape.append(((indices[-1], UNARY_DERIVATIVES[node.op]),))
+                    indices[-1] = len(tape) - 1
+        elif isinstance(node, Number):
+            values.append(node.value)
+            indices.append(None)
+        elif isinstance(node, Variable):
+            values.append(lookup_variable(node.name, variables))
+            if node.name not in slots:
+                slots[node.name] = len(tape)
+                tape.append(())
+            indices.append(slots[node.name])
+        elif isinstance(node, BinaryOp):
+            push(node)
+            push(_APPLY)
+            push(node.right)
+            push(node.left)
+        elif isinstance(node, UnaryOp):
+            resolve_unary(node.op)
+            push(node)
+            push(_APPLY)
+            push(node.operand)
+        elif isinstance(node, Function):
+            push(node)
+            push(_APPLY)
+            push(node.arg)
+        elif isinstance(node, Call):
+            push(node)
+            push(_APPLY)
+            stack.extend(reversed(node.args))
+        else:
+            raise TypeError("Invalid expression type")
+
+    adjoints = [0.0] * len(tape)
+    if indices[0] is not None:
+        adjoints[indices[0]] = 1.0
+    for i in range(len(tape) - 1, -1, -1):
+        adjoint = adjoints[i]
+        if adjoint:
+            for j, partial in tape[i]:
+                adjoints[j] += adjoint * partial
+
+    result = dict.fromkeys(variables or (), 0.0)
+    for name, index in slots.items():
+        result[name] = adjoints[index]
+    return values[0], result
@@ -0,0 +1,77 @@
+import csv
+import json
+import math
+from calculator.parser import parse
+from calculator.evaluator import evaluate
+
+FORMATS = ('plain', 'csv', 'json')
+
+def read_expressions(stream):
+    # Файл читается построчно, поэтому память не зависит от его размера
+    for line_number, line in enumerate(stream, start=1):
+        expression = line.strip()
+        if expression:
+            yield line_number, expression
+
+def evaluate_expressions(items, degrees=False):
+    # Ошибка в одной строке не прерывает обработку остальных
+    for line_number, expression in items:
+        try:
+            result = evaluate(parse(expression), degrees=degrees)
+        except Exception as e:
+            yield line_number, expression, None, str(e)
+        else:
+            yield line_number, expression, result, None
+
+def write_plain(results, out):
+    for _, _, result, error in results:
+        if error is None:
+            out.write(f"{result}\n")
+        else:
+            out.write(f"Error: {error}\n")
+        yield error is None
+
+def write_csv(results, out):
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(("line", "expression", "result", "error"))
+    for line_number, expression, result, error in results:
+        writer.writerow((line_number, expression, "" if result is None else result, error or ""))
+        yield error is None
+
+def write_json(results, out):
+    for line_number, expression, result, error in results:
+        record = {"line": line_number, "expression": expression}
+        if error is None:
+            # В строгом JSON нет Infinity и NaN: такие результаты пишутся
+            # строками "inf", "-inf", "nan", которые понимает float()
+            record["result"] = result if math.isfinite(result) else repr(float(result))
+        else:
+            record["error"] = error
+        out.write(json.dumps(record, allow_nan=False))
+        out.write("\n")
+        yield error is None
+
+WRITERS = {
+    'plain': write_plain,
+    'csv': write_csv,
+    'json': write_json,
+}
+
+def run_batch(stream, out, degrees=False, output_format='plain', jobs=1, chunk_size=1000):
+    """Вычисляет выражения из stream построчно и пишет результаты в out.
+
+    При jobs > 1 выражения вычисляются в пуле процессов с сохранением порядка.
+    Возвращает пару (всего выражений, из них с ошибкой).
+    """
+    items = read_expressions(stream)
+    if jobs == 1:
+        results = evaluate_expressions(items, degrees=degrees)
+    else:
+        from calculator.parallel import evaluate_parallel
+        results = evaluate_parallel(items, degrees=degrees, jobs=jobs, chunk_size=chunk_size)
+    total = failed = 0
+    for ok in WRITERS[output_format](results, out):
+        total += 1
+        if not ok:
+            failed += 1
+    return total, failed
@@ -0,0 +1,563 @@
+import argparse
+import decimal
+import gc
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from decimal import Decimal
+from calculator.trig import EXACT
+from calculator.parser import tokenize, parse_tokens
+from calculator.evaluator import evaluate
+
+PHASES = ('tokenize', 'parse', 'evaluate')
+
+def _flat_chain():
+    return [" + ".join(["1"] * 10_000)]
+
+def _deep_nesting():
+    return ["sin(" * 1000 + "pi/2" + ")" * 1000, "(" * 5000 + "1" + ")" * 5000]
+
+def _function_heavy():
+    return [" + ".join(f"sin({i}) * cos({i}) + ln({i + 1}) - sqrt({i}) / exp(1) + arctg({i})" for i in range(500))]
+
+def _huge_literals():
+    return [" + ".join(["1" + "0" * 100] * 200), " * ".join(["1.000000000000000000000000000001"] * 200)]
+
+def _power_edges():
+    return [
+        "1.000000000000001 ^ 36893488147419103232",
+        "1 ^ 36893488147419103232",
+        "(-1) ^ 36893488147419103232",
+        "0 ^ 36893488147419103232",
+        "9007199254740993 ^ 17",
+        "2 ^ 1023",
+        "10 ^ 400",
+        "2 ^ 0.5 ^ 3 ^ 2",
+    ]
+
+def _batch_corpus():
+    rng = random.Random(0)
+    functions = ['sin', 'cos', 'tg', 'ln', 'exp', 'sqrt', 'arctg']
+    expressions = []
+    for _ in range(1000):
+        terms = []
+        for _ in range(rng.randint(1, 6)):
+            number = f"{rng.uniform(0.1, 100):.3f}"
+            if rng.random() < 0.4:
+                number = f"{rng.choice(functions)}({number})"
+            terms.append(number)
+        expressions.append("".join(f"{term} {rng.choice('+-*/')} " for term in terms[:-1]) + terms[-1])
+    return expressions
+
+# Генераторы нагрузок: имя -> функция, возвращающая список выражений
+WORKLOADS = {
+    'flat_chain': _flat_chain,
+    'deep_nesting': _deep_nesting,
+    'function_heavy': _function_heavy,
+    'huge_literals': _huge_literals,
+    'power_edges': _power_edges,
+    'batch_corpus': _batch_corpus,
+}
+
+def _evaluate_all(trees):
+    for tree in trees:
+        try:
+            evaluate(tree)
+        except (ArithmeticError, ValueError):
+            pass
+
+def phase_runner(phase, expressions):
+    """Функция без аргументов, выполняющая одну фазу для всех выражений нагрузки.
+
+    Входные данные фазы готовятся заранее: parse получает лексемы,
+    evaluate - деревья, поэтому каждая фаза измеряется отдельно.
+    """
+    if phase == 'tokenize':
+        return lambda: [tokenize(expression) for expression in expressions]
+    tokens = [tokenize(expression) for expression in expressions]
+    if phase == 'parse':
+        return lambda: [parse_tokens(item) for item in tokens]
+    if phase == 'evaluate':
+        trees = [parse_tokens(item) for item in tokens]
+        return lambda: _evaluate_all(trees)
+    raise ValueError(f"Unknown phase: {phase}")
+
+def _percentile(ordered, fraction):
+    # Линейная интерполяция между соседними замерами
+    position = (len(ordered) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+def measure(function, warmup=2, repeat=20, min_time=0.2):
+    """Замеряет function: warmup прогонов без учёта, затем не меньше repeat
+    замеров и не меньше min_time секунд. Сборщик мусора на время замеров
+    отключается. Возвращает словарь статистики в секундах на операцию.
+    """
+    for _ in range(warmup):
+        function()
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        while len(timings) < repeat or time.perf_counter() - started < min_time:
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    ordered = sorted(timings)
+    mean = statistics.fmean(ordered)
+    return {
+        'rounds': len(ordered),
+        'ops_per_sec': 1 / mean if mean else float('inf'),
+        'min': ordered[0],
+        'mean': mean,
+        'stdev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'p50': _percentile(ordered, 0.5),
+        'p90': _percentile(ordered, 0.9),
+        'p99': _percentile(ordered, 0.99),
+    }
+
+def run(workloads=None, phases=None, warmup=2, repeat=20, min_time=0.2):
+    """Прогоняет выбранные нагрузки по фазам. Результаты - под ключами 'нагрузка/фаза'."""
+    results = {}
+    for name in workloads or WORKLOADS:
+        if name not in WORKLOADS:
+            raise ValueError(f"Unknown workload: {name}")
+        expressions = WORKLOADS[name]()
+        for phase in phases or PHASES:
+            results[f"{name}/{phase}"] = measure(phase_runner(phase, expressions), warmup, repeat, min_time)
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+def compare(current, baseline, threshold=0.2, metric='p50'):
+    """Замеры, ставшие медленнее базовых больше чем на threshold (доля).
+
+    Возвращает список (имя, базовое значение, текущее, отношение),
+    отсортированный по убыванию отношения. Замеры, которых нет в одном
+    из наборов, не сравниваются.
+    """
+    regressions = []
+    for name, stats in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None or not base[metric]:
+            continue
+        ratio = stats[metric] / base[metric]
+        if ratio > 1 + threshold:
+            regressions.append((name, base[metric], stats[metric], ratio))
+    regressions.sort(key=lambda item: item[3], reverse=True)
+    return regressions
+
+# Каталог, из которого импортируется пакет calculator
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_times(module="calculator.main", python=None):
+    """Время импорта модулей при запуске "python -X importtime -c 'import module'".
+
+    Возвращает {имя модуля: (собственное время, суммарное с вложенными
+    импортами)} в секундах для всех модулей, загруженных процессом.
+    """
+    # Байт-код кэшируется, как у установленного пакета: иначе замер
+    # показывал бы время компиляции исходников
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    completed = subprocess.run([python or sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=_ROOT, env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            times[name.strip()] = (int(own) / 1e6, int(cumulative) / 1e6)
+    return times
+
+def startup(module="calculator.main", repeat=5, python=None):
+    """Холодный импорт module: лучший из repeat запусков после одного прогревочного.
+
+    Возвращает (суммарное время импорта module в секундах, отчёт import_times
+    этого запуска).
+    """
+    import_times(module, python)
+    best = None
+    for _ in range(repeat):
+        times = import_times(module, python)
+        if best is None or times[module][1] < best[module][1]:
+            best = times
+    return best[module][1], best
+
+def format_startup(total, times, limit=10):
+    lines = [f"{'module':32} {'self ms':>10} {'total ms':>10}"]
+    heaviest = sorted(times.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+    for name, (own, cumulative) in heaviest:
+        lines.append(f"{name:32} {own * 1e3:10.3f} {cumulative * 1e3:10.3f}")
+    lines.append(f"{'import total':32} {'':10} {total * 1e3:10.3f}")
+    return "\n".join(lines)
+
+TRIG_FUNCTIONS = ('sin', 'cos', 'tg', 'ctg')
+# Режимы углов для сравнения: текущий (degrees=True) и точная редукция
+TRIG_MODES = {'degrees': True, 'exact': EXACT}
+
+def _trig_grids(count, seed=0):
+    rng = random.Random(seed)
+    return {
+        'integer': [float(rng.randint(-720, 720)) for _ in range(count)],
+        'real': [rng.uniform(-720, 720) for _ in range(count)],
+    }
+
+def _trig_reference(x):
+    """Точные значения sin, cos, tg, ctg угла x градусов; None - полюс.
+
+    Остаток по модулю 360 берётся в Decimal без округления; кратные 90
+    углы дают точные 0 и ±1.
+    """
+    from calculator.precise import pi, sin_cos, _context
+
+    # Остаток Decimal имеет знак делимого
+    remainder = Decimal(x) % 360
+    if remainder % 90 == 0:
+        sin, cos = {0: (0.0, 1.0), 90: (1.0, 0.0), 180: (0.0, -1.0), 270: (-1.0, 0.0)}[int(remainder) % 360]
+        return {'sin': sin, 'cos': cos, 'tg': sin / cos + 0.0 if cos else None,
+                'ctg': cos / sin + 0.0 if sin else None}
+    with decimal.localcontext(_context(40)):
+        sin, cos = sin_cos(remainder * pi(40) / 180)
+        return {'sin': float(sin), 'cos': float(cos), 'tg': float(sin / cos), 'ctg': float(cos / sin)}
+
+def _trig_accuracy(function, angles, references, name):
+    # (наибольшая ошибка в ulp, доля точных значений в углах, кратных 30 и 45)
+    worst = 0.0
+    special = exact = 0
+    for x, reference in zip(angles, references):
+        try:
+            value = function(x)
+        except ZeroDivisionError:
+            value = None
+        expected = reference[name]
+        if x % 30 == 0 or x % 45 == 0:
+            special += 1
+            exact += value == expected
+        elif expected:
+            worst = max(worst, abs(value - expected) / math.ulp(expected))
+    return worst, exact / special if special else None
+
+def _time_per_item(function, count, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best / count
+
+def trig_comparison(count=100_000, sample=2000, seed=0):
+    """Точность и скорость тригонометрии в градусах: текущий режим против EXACT.
+
+    Углы - целые градусы и вещественные из [-720, 720]. Для каждой пары
+    (сетка, функция, режим) возвращает время скалярного вызова функции
+    и пакетного evaluate_batch на элемент (нс; NaN без NumPy), наибольшую
+    ошибку в ulp на первых sample углах и долю точных значений в особых углах
+    (ошибка в полюсе считается точным ответом; None, если таких углов нет).
+    """
+    from calculator.evaluator import resolve_function
+    from calculator.parser import parse
+    try:
+        import numpy as np
+        from calculator.vectorized import evaluate_batch
+    except ImportError:
+        np = None
+
+    results = {}
+    for grid, angles in _trig_grids(count, seed).items():
+        references = [_trig_reference(x) for x in angles[:sample]]
+        array = np.array(angles) if np is not None else None
+        for name in TRIG_FUNCTIONS:
+            for mode, degrees in TRIG_MODES.items():
+                function = resolve_function(name, degrees)
+
+                def scalar():
+                    for x in angles:
+                        try:
+                            function(x)
+                        except ZeroDivisionError:
+                            pass
+
+                batch_ns = float('nan')
+                if np is not None:
+                    expr = parse(f"{name}(x)")
+                    batch_ns = _time_per_item(
+                        lambda: evaluate_batch(expr, {"x": array}, degrees=degrees, errors='nan'), count) * 1e9
+                worst, special = _trig_accuracy(function, angles[:sample], references, name)
+                results[f"{grid}/{name}/{mode}"] = {
+                    'scalar_ns': _time_per_item(scalar, count) * 1e9,
+                    'batch_ns': batch_ns,
+                    'max_ulps': worst,
+                    'special_exact': special,
+                }
+    return results
+
+def format_trig(results):
+    lines = [f"{'benchmark':24} {'scalar ns':>10} {'batch ns':>10} {'max ulps':>12} {'special ok':>11}"]
+    for name, stats in results.items():
+        special = '-' if stats['special_exact'] is None else f"{stats['special_exact']:.1%}"
+        lines.append(f"{name:24} {stats['scalar_ns']:10.1f} {stats['batch_ns']:10.1f} "
+                     f"{stats['max_ulps']:12.1f} {special:>11}")
+    return "\n".join(lines)
+
+# Выражения и диапазоны переменных для сравнения интервальной оценки с выборкой
+INTERVAL_CASES = {
+    'polynomial': ("x^3 - 2*x^2 + x - 1", {'x': (-2.0, 3.0)}),
+    'trig': ("sin(x) * cos(y) + tg(x / 4)", {'x': (-3.0, 3.0), 'y': (0.0, 6.0)}),
+    'rational': ("(x + 1) / (y^2 + 1) - sqrt(x + 2)", {'x': (-1.0, 5.0), 'y': (-2.0, 2.0)}),
+    'domain': ("ln(x) + 1 / (x - y)", {'x': (-1.0, 4.0), 'y': (0.0, 1.0)}),
+}
+
+def interval_comparison(samples=5000, seed=0, repeat=3):
+    """Одна интервальная оценка против samples вычислений в случайных точках.
+
+    Для каждого выражения возвращает время обоих способов (мс), границы
+    интервала, наблюдаемые в выборке минимум и максимум (ошибочные точки
+    пропускаются) и найденные интервальной оценкой возможные ошибки.
+    """
+    from calculator.parser import parse
+    from calculator.interval import evaluate_interval
+
+    rng = random.Random(seed)
+    results = {}
+    for name, (text, ranges) in INTERVAL_CASES.items():
+        expr = parse(text)
+        points = [{variable: rng.uniform(lo, hi) for variable, (lo, hi) in ranges.items()}
+                  for _ in range(samples)]
+        observed = []
+
+        def sample():
+            observed.clear()
+            for point in points:
+                try:
+                    observed.append(evaluate(expr, variables=point))
+                except (ValueError, ZeroDivisionError, OverflowError):
+                    pass
+
+        bounds, issues = evaluate_interval(expr, ranges)
+        results[name] = {
+            'interval_ms': _time_per_item(lambda: evaluate_interval(expr, ranges), 1, repeat) * 1e3,
+            'sampling_ms': _time_per_item(sample, 1, repeat) * 1e3,
+            'bounds': None if bounds is None else (bounds.lo, bounds.hi),
+            'sampled': (min(observed), max(observed)) if observed else None,
+            'issues': sorted({issue.kind for issue in issues}),
+        }
+    return results
+
+def format_interval(results):
+    lines = [f"{'expression':12} {'interval ms':>12} {'sampling ms':>12} {'bounds':>28} {'sampled':>28}  issues"]
+    for name, stats in results.items():
+        bounds = '-' if stats['bounds'] is None else "[{:.4g}, {:.4g}]".format(*stats['bounds'])
+        sampled = '-' if stats['sampled'] is None else "[{:.4g}, {:.4g}]".format(*stats['sampled'])
+        lines.append(f"{name:12} {stats['interval_ms']:12.4f} {stats['sampling_ms']:12.2f} {bounds:>28} "
+                     f"{sampled:>28}  {', '.join(stats['issues']) or '-'}")
+    return "\n".join(lines)
+
+def formula_library(count=50_000, seed=0):
+    """Библиотека формул для замера загрузки: переменные, целые и дробные литералы, функции."""
+    rng = random.Random(seed)
+    functions = ['sin', 'cos', 'tg', 'ln', 'exp', 'sqrt', 'arctg']
+    expressions = []
+    for _ in range(count):
+        terms = []
+        for _ in range(rng.randint(2, 8)):
+            term = rng.choice([f"{rng.uniform(0.1, 100):.2f}", rng.choice("xyz"), str(rng.randint(1, 20))])
+            if rng.random() < 0.4:
+                term = f"{rng.choice(functions)}({term})"
+            terms.append(term)
+        expressions.append("".join(f"{term} {rng.choice('+-*/^')} " for term in terms[:-1]) + terms[-1])
+    return expressions
+
+def library_comparison(expressions=None, repeat=3):
+    """Загрузка двоичной библиотеки (serialize.loads) против parse каждой строки.
+
+    expressions - строки библиотеки, по умолчанию formula_library().
+    Возвращает время разбора, записи и загрузки (с), размеры текста и
+    двоичного представления (байт) и число выражений.
+    """
+    from calculator.parser import parse
+    from calculator.serialize import dumps, loads
+
+    if expressions is None:
+        expressions = formula_library()
+    lines = [line.strip() for line in expressions]
+
+    def parse_all():
+        trees = []
+        for line in lines:
+            try:
+                trees.append(parse(line) if line else None)
+            except Exception:
+                trees.append(None)
+        return trees
+
+    trees = parse_all()
+    start = time.perf_counter()
+    data = dumps(trees)
+    dump_time = time.perf_counter() - start
+    return {
+        'expressions': len(lines),
+        'text_bytes': sum(len(line.encode()) + 1 for line in lines),
+        'binary_bytes': len(data),
+        'parse_s': _time_per_item(parse_all, 1, repeat),
+        'dump_s': dump_time,
+        'load_s': _time_per_item(lambda: loads(data), 1, repeat),
+    }
+
+def format_library(stats):
+    return (f"{stats['expressions']} expressions, text {stats['text_bytes'] / 1e6:.2f} MB, "
+            f"binary {stats['binary_bytes'] / 1e6:.2f} MB\n"
+            f"parse {stats['parse_s'] * 1e3:.1f}ms, dump {stats['dump_s'] * 1e3:.1f}ms, "
+            f"load {stats['load_s'] * 1e3:.1f}ms ({stats['parse_s'] / stats['load_s']:.1f}x faster than parse)")
+
+THROUGHPUT_VARIABLES = {'x': 0.7, 'y': 1.3, 'z': 2.5}
+
+def thread_throughput(threads=(1, 2, 4), count=20_000, distinct=500, repeat=3):
+    """Выражений в секунду при вычислении из нескольких потоков одновременно.
+
+    count выражений (distinct различных формул по кругу) делятся между
+    потоками поровну. Для каждого числа потоков сравниваются общий
+    Evaluator (кэш без блокировок), общий ParseCache.compile (кэш с
+    блокировкой) и Evaluator.evaluate_many в пуле из стольких же процессов
+    (вместе с запуском пула).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from calculator.cache import ParseCache
+    from calculator.context import Evaluator
+
+    library = formula_library(distinct)
+    expressions = [library[i % distinct] for i in range(count)]
+    variables = THROUGHPUT_VARIABLES
+
+    def in_threads(pool, function, jobs):
+        def work(part):
+            for expression in part:
+                try:
+                    function(expression)
+                except Exception:
+                    pass
+
+        parts = [expressions[i::jobs] for i in range(jobs)]
+        return lambda: list(pool.map(work, parts))
+
+    results = {}
+    for jobs in threads:
+        evaluator = Evaluator()
+        cache = ParseCache()
+        stats = {}
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            runners = {
+                'evaluator': in_threads(pool, lambda expression: evaluator.evaluate(expression, variables), jobs),
+                'locked_cache': in_threads(pool, lambda expression: cache.compile(expression)(variables), jobs),
+            }
+            for name, runner in runners.items():
+                runner()   # прогрев кэша
+                stats[name] = 1 / _time_per_item(runner, count, repeat)
+        stats['processes'] = 1 / _time_per_item(
+            lambda: list(evaluator.evaluate_many(expressions, variables, jobs=jobs, executor='process')), count, 1)
+        results[jobs] = stats
+    return results
+
+def format_throughput(results):
+    lines = [f"{'threads':>7} {'evaluator/s':>12} {'locked cache/s':>15} {'processes/s':>12}"]
+    for jobs, stats in results.items():
+        lines.append(f"{jobs:7} {stats['evaluator']:12.0f} {stats['locked_cache']:15.0f} {stats['processes']:12.0f}")
+    return "\n".join(lines)
+
+def format_results(report):
+    lines = [f"{'benchmark':32} {'ops/s':>10} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'rounds':>7}"]
+    for name, stats in report['results'].items():
+        lines.append(f"{name:32} {stats['ops_per_sec']:10.1f} {stats['p50'] * 1e3:10.3f} "
+                     f"{stats['p90'] * 1e3:10.3f} {stats['p99'] * 1e3:10.3f} {stats['rounds']:7}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculator benchmarks")
+    parser.add_argument("--workload", action="append", choices=list(WORKLOADS),
+                        help="Workload to run (repeatable, default: all)")
+    parser.add_argument("--phase", action="append", choices=PHASES, help="Phase to run (repeatable, default: all)")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed runs before measuring")
+    parser.add_argument("--repeat", type=int, default=20, help="Minimum number of timed runs")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum measuring time per benchmark, seconds")
+    parser.add_argument("--save", metavar="FILE", help="Store results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="Compare against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed relative slowdown against the baseline (0.2 = 20%%)")
+    parser.add_argument("--startup", nargs="?", const="calculator.main", metavar="MODULE",
+                        help="Measure cold import time of MODULE (default calculator.main) instead of workloads")
+    parser.add_argument("--budget", type=float, metavar="MS",
+                        help="Fail if the --startup import time exceeds MS milliseconds")
+    parser.add_argument("--trig", action="store_true",
+                        help="Compare accuracy and speed of degree-mode trigonometry instead of workloads")
+    parser.add_argument("--library", nargs="?", const="", metavar="FILE",
+                        help="Compare loading a binary expression library against parsing FILE "
+                             "(one expression per line; a generated library if omitted)")
+    parser.add_argument("--interval", action="store_true",
+                        help="Compare one interval evaluation against sampling instead of workloads")
+    parser.add_argument("--threads", nargs="*", type=int, metavar="N",
+                        help="Measure throughput of a shared Evaluator from N threads (default: 1 2 4) "
+                             "instead of workloads")
+    parser.add_argument("--metric", choices=('min', 'mean', 'p50', 'p90', 'p99'), default='p50',
+                        help="Statistic compared against the baseline")
+    args = parser.parse_args(argv)
+
+    if args.startup is not None:
+        total, times = startup(args.startup, max(args.repeat // 4, 1))
+        print(format_startup(total, times))
+        if args.budget is not None and total * 1e3 > args.budget:
+            print(f"Startup budget exceeded: {total * 1e3:.3f}ms > {args.budget:.3f}ms", file=sys.stderr)
+            return 1
+        return 0
+
+    if args.trig:
+        print(format_trig(trig_comparison()))
+        return 0
+
+    if args.library is not None:
+        expressions = None
+        if args.library:
+            with open(args.library, encoding="utf-8") as stream:
+                expressions = stream.read().splitlines()
+        print(format_library(library_comparison(expressions)))
+        return 0
+
+    if args.interval:
+        print(format_interval(interval_comparison()))
+        return 0
+
+    if args.threads is not None:
+        print(format_throughput(thread_throughput(args.threads or (1, 2, 4))))
+        return 0
+
+    report = run(args.workload, args.phase, args.warmup, args.repeat, args.min_time)
+    print(format_results(report))
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as stream:
+            json.dump(report, stream, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as stream:
+            baseline = json.load(stream)
+        regressions = compare(report, baseline, args.threshold, args.metric)
+        for name, base, current, ratio in regressions:
+            print(f"Regression: {name} {args.metric} {base * 1e3:.3f}ms -> {current * 1e3:.3f}ms ({ratio:.2f}x)",
+                  file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import mmap
+import numpy as np
+from numpy.lib.format import open_memmap
+from calculator.parser import tokenize_buffer, parse_tokens
+from calculator.evaluator import evaluate
+
+# Строк в одной порции: результаты копируются в отображённый файл порциями
+CHUNK_LINES = 1 << 16
+# Байтов за один шаг подсчёта строк
+_COUNT_BLOCK = 1 << 26
+_WHITESPACE = b" \t\r\f\v"
+_NEWLINES = b"\n\r"
+
+class BulkResult:
+    """Итог evaluate_file: число строк, ошибок и компактный индекс ошибок.
+
+    error_lines - номера строк с ошибкой (с нуля), error_codes - индексы
+    их сообщений в messages: одинаковые сообщения хранятся один раз.
+    """
+
+    def __init__(self, total, error_lines, error_codes, messages):
+        self.total = total
+        self.error_lines = error_lines
+        self.error_codes = error_codes
+        self.messages = messages
+
+    @property
+    def failed(self):
+        return len(self.error_lines)
+
+    def errors(self):
+        """Пары (номер строки, сообщение)."""
+        for line, code in zip(self.error_lines.tolist(), self.error_codes.tolist()):
+            yield line, self.messages[code]
+
+def count_lines(buffer):
+    """Число строк в буфере, как при чтении в текстовом режиме.
+
+    Строку завершает \n, \r или \r\n (универсальные переводы строк
+    open()); перевод строки в конце не даёт лишней пустой строки.
+    """
+    size = len(buffer)
+    if size == 0:
+        return 0
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    breaks = 0
+    for start in range(0, size, _COUNT_BLOCK):
+        # Лишний байт в конце блока - чтобы увидеть \n после \r на границе
+        block = data[start:start + _COUNT_BLOCK + 1]
+        body = block[:_COUNT_BLOCK]
+        breaks += int(np.count_nonzero(body == 10)) + int(np.count_nonzero(body == 13))
+        breaks -= int(np.count_nonzero((block[:-1] == 13) & (block[1:] == 10)))
+    del data, block, body
+    return breaks + (buffer[size - 1] not in _NEWLINES)
+
+def evaluate_buffer(buffer, results, degrees=False):
+    """Вычисляет по выражению на строку buffer и пишет значения в results.
+
+    results - массив float64 длиной count_lines(buffer); строкам с ошибкой
+    и пустым строкам (в индекс ошибок не попадают) соответствует NaN.
+    Возвращает BulkResult.
+    """
+    size = len(buffer)
+    find = buffer.find
+    error_lines = []
+    error_codes = []
+    messages = {}
+    chunk = []
+    chunk_start = 0
+    index = 0
+    position = 0
+    # Ближайшие \n и \r ищутся отдельно и переиспользуются, пока не пройдены:
+    # повторный поиск отсутствующего символа просматривал бы весь остаток
+    next_lf = next_cr = -1
+    while position < size:
+        if next_lf < position:
+            next_lf = find(b"\n", position)
+            if next_lf < 0:
+                next_lf = size
+        if next_cr < position:
+            next_cr = find(b"\r", position)
+            if next_cr < 0:
+                next_cr = size
+        end = min(next_lf, next_cr)
+        start, stop = position, end
+        # Как line.strip() в построчном режиме, но без копирования
+        while start < stop and buffer[start] in _WHITESPACE:
+            start += 1
+        while stop > start and buffer[stop - 1] in _WHITESPACE:
+            stop -= 1
+        if start == stop:
+            # Пустая строка - NaN, но не ошибка: построчный режим её пропускает
+            value = np.nan
+        else:
+            try:
+                value = evaluate(parse_tokens(tokenize_buffer(buffer, start, stop)), degrees)
+            except Exception as e:
+                value = np.nan
+                error_lines.append(index)
+                error_codes.append(messages.setdefault(str(e), len(messages)))
+        chunk.append(value)
+        index += 1
+        # \r\n - один перевод строки, как в текстовом режиме
+        position = end + 2 if end == next_cr and next_lf == end + 1 else end + 1
+        if len(chunk) == CHUNK_LINES:
+            results[chunk_start:index] = chunk
+            chunk_start = index
+            chunk = []
+    if chunk:
+        results[chunk_start:index] = chunk
+    return BulkResult(
+        index,
+        np.array(error_lines, dtype=np.int64),
+        np.array(error_codes, dtype=np.int32),
+        list(messages),
+    )
+
+def evaluate_file(path, output_path, degrees=False, errors_path=None):
+    """Вычисляет файл выражений (по одному в строке) в массив float64.
+
+    Вход отображается в память и разбирается прямо из байтового буфера,
+    результаты пишутся в заранее выделенный файл .npy (читается np.load,
+    в том числе с mmap_mode). Строка i файла - элемент i массива, ошибкам
+    и пустым строкам соответствует NaN. Индекс ошибок возвращается
+    в BulkResult и при заданном errors_path сохраняется в .npz
+    (см. load_error_index).
+    """
+    with open(path, "rb") as stream:
+        if stream.seek(0, 2) == 0:
+            results = open_memmap(output_path, mode="w+", dtype=np.float64, shape=(0,))
+            result = BulkResult(0, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32), [])
+        else:
+            with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                results = open_memmap(output_path, mode="w+", dtype=np.float64, shape=(count_lines(buffer),))
+                result = evaluate_buffer(buffer, results, degrees)
+    results.flush()
+    del results
+    if errors_path is not None:
+        save_error_index(errors_path, result)
+    return result
+
+def save_error_index(path, result):
+    with open(path, "wb") as stream:
+        np.savez(stream, lines=result.error_lines, codes=result.error_codes,
+                 messages=np.array(result.messages, dtype=str), total=result.total)
+
+def load_error_index(path):
+    with np.load(path) as data:
+        return BulkResult(int(data["total"]), data["lines"], data["codes"], data["messages"].tolist())
@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict
+from calculator.parser import parse, normalize_expression
+from calculator.compiler import compile
+
+class _Store:
+    # Одно LRU-хранилище со своими счётчиками; блокировку держит ParseCache
+    __slots__ = ('entries', 'hits', 'misses', 'evictions')
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self, capacity):
+        lookups = self.hits + self.misses
+        return {
+            'capacity': capacity,
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+class ParseCache:
+    """Ограниченный LRU-кэш разобранных (и, по желанию, скомпилированных) выражений.
+
+    Деревья неизменяемы, поэтому одно и то же дерево безопасно отдавать
+    нескольким потокам. Ошибки разбора не кэшируются. Скомпилированные
+    программы хранятся отдельно от деревьев (capacity - на каждое
+    хранилище), поэтому не вытесняют их; stats() описывает деревья,
+    stats()['compiled'] - программы.
+    """
+
+    def __init__(self, capacity=1024):
+        if capacity < 0:
+            raise ValueError("Cache capacity must be non-negative")
+        self.capacity = capacity
+        self._trees = _Store()
+        self._programs = _Store()
+        self._lock = threading.Lock()
+
+    def _get(self, key, store=None):
+        store = store or self._trees
+        with self._lock:
+            try:
+                value = store.entries[key]
+            except KeyError:
+                store.misses += 1
+                return None
+            store.entries.move_to_end(key)
+            store.hits += 1
+            return value
+
+    def _put(self, key, value, store=None):
+        if self.capacity == 0:
+            return
+        store = store or self._trees
+        with self._lock:
+            store.entries[key] = value
+            store.entries.move_to_end(key)
+            while len(store.entries) > self.capacity:
+                store.entries.popitem(last=False)
+                store.evictions += 1
+
+    def parse(self, expression: str):
+        key = normalize_expression(expression)
+        if key is None:
+            return parse(expression)
+        expr = self._get(key)
+        if expr is None:
+            expr = parse(key)
+            self._put(key, expr)
+        return expr
+
+    def compile(self, expression: str, degrees=False):
+        key = normalize_expression(expression)
+        if key is None:
+            return compile(parse(expression), degrees=degrees)
+        compiled = self._get((key, degrees), self._programs)
+        if compiled is None:
+            # Дерево берётся без учёта в счётчиках: промах компиляции - один промах
+            with self._lock:
+                expr = self._trees.entries.get(key)
+            compiled = compile(expr if expr is not None else parse(key), degrees=degrees)
+            self._put((key, degrees), compiled, self._programs)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._trees = _Store()
+            self._programs = _Store()
+
+    def __len__(self):
+        return len(self._trees.entries)
+
+    def stats(self):
+        with self._lock:
+            stats = self._trees.stats(self.capacity)
+            stats['compiled'] = self._programs.stats(self.capacity)
+            return stats
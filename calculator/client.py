@@ -0,0 +1,108 @@
+import builtins
+import json
+import math
+import socket
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+# Исключения, которые клиент восстанавливает по полю "type" ответа
+_ERROR_TYPES = {'ValueError', 'ZeroDivisionError', 'OverflowError', 'TypeError'}
+
+def parse_address(address: str):
+    """'unix:/path/to.sock' или 'host:port' -> (семейство, адрес сокета)."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError(f"Invalid server address: {address}")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+# Протокол - строгий JSON: бесконечности и NaN передаются строками,
+# одинаково понятными float() и клиентам на других языках
+_NON_FINITE = {'inf': math.inf, '-inf': -math.inf, 'nan': math.nan}
+
+def encode_number(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return repr(value)
+    return value
+
+def decode_number(value):
+    if isinstance(value, str):
+        return _NON_FINITE.get(value, value)
+    return value
+
+def make_request(expression, degrees=False, variables=None, request_id=None):
+    request = {"expression": expression, "degrees": degrees}
+    if variables:
+        request["variables"] = {name: encode_number(value) for name, value in variables.items()}
+    if request_id is not None:
+        request["id"] = request_id
+    return request
+
+def raise_for_error(response):
+    if "error" not in response:
+        return decode_number(response["result"])
+    name = response.get("type")
+    error = getattr(builtins, name) if name in _ERROR_TYPES else ValueError
+    raise error(response["error"])
+
+class Client:
+    """Синхронный клиент сервера вычислений (см. calculator.server).
+
+    Протокол: по одному JSON-объекту в строке в обе стороны, ответы
+    приходят в порядке запросов.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=None):
+        family, target = parse_address(address)
+        if family == socket.AF_UNIX:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            try:
+                self._socket.connect(target)
+            except OSError:
+                self._socket.close()
+                raise
+        else:
+            self._socket = socket.create_connection(target, timeout=timeout)
+        self._reader = self._socket.makefile("rb")
+
+    def _send(self, requests):
+        payload = b"".join(json.dumps(request, allow_nan=False).encode() + b"\n" for request in requests)
+        self._socket.sendall(payload)
+
+    def _receive(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Server closed the connection")
+        response = json.loads(line)
+        if "result" in response:
+            response["result"] = decode_number(response["result"])
+        return response
+
+    def evaluate(self, expression, degrees=False, variables=None):
+        self._send([make_request(expression, degrees, variables)])
+        return raise_for_error(self._receive())
+
+    def evaluate_many(self, requests, window=256):
+        """Отправляет запросы конвейером, окнами по window штук.
+
+        Возвращает сырые ответы (словари с "result" или "error").
+        """
+        requests = list(requests)
+        responses = []
+        for start in range(0, len(requests), window):
+            chunk = requests[start:start + window]
+            self._send(chunk)
+            responses.extend(self._receive() for _ in chunk)
+        return responses
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,86 @@
+from calculator.parser import UnaryOp, BinaryOp, Number, Function, Variable, Call
+from calculator.evaluator import resolve_unary, resolve_binary, resolve_function, resolve_call, lookup_variable
+
+# Коды инструкций плоской программы
+PUSH = 0     # положить константу на стек
+CALL1 = 1    # применить унарную функцию к вершине стека
+CALL2 = 2    # применить бинарную функцию к двум верхним значениям
+RAISE = 3    # выбросить заранее подготовленное исключение
+LOAD = 4     # положить на стек значение переменной
+CALLN = 5    # применить функцию (функция, n) к n верхним значениям
+
+class CompiledExpression:
+    """Выражение, заранее сведённое к плоской программе в постфиксной записи.
+
+    Операторы и функции разрешаются один раз при компиляции, поэтому
+    повторные вычисления не обходят дерево и не сравнивают строки.
+    """
+
+    def __init__(self, program, degrees=False):
+        self.program = program
+        self.degrees = degrees
+
+    def __call__(self, variables=None):
+        values = []
+        push = values.append
+        pop = values.pop
+        for code, arg in self.program:
+            if code == PUSH:
+                push(arg)
+            elif code == CALL2:
+                right = pop()
+                values[-1] = arg(values[-1], right)
+            elif code == CALL1:
+                values[-1] = arg(values[-1])
+            elif code == LOAD:
+                push(lookup_variable(arg, variables))
+            elif code == CALLN:
+                function, count = arg
+                result = function(*values[-count:])
+                del values[-count:]
+                push(result)
+            else:
+                raise type(arg)(*arg.args)
+        return values[0]
+
+def _resolve(code, resolver, *args):
+    # Ошибки разрешения откладываются до вычисления, как в evaluate()
+    try:
+        return code, resolver(*args)
+    except ValueError as e:
+        return RAISE, e
+
+def compile(expr, degrees=False):
+    program = []
+    emit = program.append
+    stack = [(expr, False)]
+    while stack:
+        node, ready = stack.pop()
+        if ready:
+            emit(node)
+        elif isinstance(node, Number):
+            emit((PUSH, node.value))
+        elif isinstance(node, Variable):
+            emit((LOAD, node.name))
+        elif isinstance(node, BinaryOp):
+            stack.append((_resolve(CALL2, resolve_binary, node.op), True))
+            stack.append((node.right, False))
+            stack.append((node.left, False))
+        elif isinstance(node, UnaryOp):
+            instruction = _resolve(CALL1, resolve_unary, node.op)
+            if instruction[0] == RAISE:
+                # evaluate() отвергает неизвестный оператор до вычисления операнда
+                emit(instruction)
+                continue
+            stack.append((instruction, True))
+            stack.append((node.operand, False))
+        elif isinstance(node, Function):
+            stack.append((_resolve(CALL1, resolve_function, node.name, degrees), True))
+            stack.append((node.arg, False))
+        elif isinstance(node, Call):
+            code, function = _resolve(CALLN, resolve_call, node.name)
+            stack.append(((code, (function, len(node.args)) if code == CALLN else function), True))
+            stack.extend((arg, False) for arg in reversed(node.args))
+        else:
+            emit((RAISE, TypeError("Invalid expression type")))
+    return CompiledExpression(program, degrees)
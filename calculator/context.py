@@ -0,0 +1,215 @@
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from calculator.parser import parse, normalize_expression
+from calculator.evaluator import evaluate
+from calculator.compiler import compile
+from calculator.optimizer import count_nodes
+from calculator.parallel import available_cpus, map_chunks, _chunked
+from calculator.trig import EXACT
+
+ANGLE_MODES = (False, True, EXACT)
+EXECUTORS = ('thread', 'process')
+
+class _Counters:
+    # Счётчики одного потока: изменяются только им, поэтому без блокировки
+    __slots__ = ('evaluations', 'errors', 'hits', 'misses')
+
+    def __init__(self):
+        self.evaluations = self.errors = self.hits = self.misses = 0
+
+class Evaluator:
+    """Переиспользуемый контекст вычисления: настройки, кэш программ и счётчики.
+
+    degrees - режим углов (False, True или trig.EXACT), precision - число
+    значащих цифр Decimal (None - float), functions - FunctionRegistry,
+    max_length и max_nodes - ограничения длины текста и размера дерева.
+    Один объект можно использовать из многих потоков: кэш - обычный dict,
+    чтение и запись которого атомарны, а счётчики у каждого потока свои,
+    поэтому горячий путь обходится без блокировок.
+    """
+
+    def __init__(self, degrees=False, precision=None, functions=None,
+                 max_length=None, max_nodes=None, cache_size=1024):
+        if degrees not in ANGLE_MODES:
+            raise ValueError(f"Unknown angle mode: {degrees!r}")
+        if precision is not None and precision < 1:
+            raise ValueError("Precision must be positive")
+        if cache_size < 0:
+            raise ValueError("Cache capacity must be non-negative")
+        self.degrees = degrees
+        self.precision = precision
+        self.functions = functions
+        self.max_length = max_length
+        self.max_nodes = max_nodes
+        self.cache_size = cache_size
+        self._programs = {}
+        self._local = threading.local()
+        self._all_counters = []
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        # В другой процесс передаются только настройки: кэш и счётчики там свои
+        if self.functions is not None:
+            raise TypeError("User-defined functions cannot be sent to another process")
+        return Evaluator, (self.degrees, self.precision, None, self.max_length, self.max_nodes, self.cache_size)
+
+    def _counters(self):
+        try:
+            return self._local.counters
+        except AttributeError:
+            counters = self._local.counters = _Counters()
+            with self._lock:
+                self._all_counters.append(counters)
+            return counters
+
+    def parse(self, expression: str):
+        """Дерево выражения с проверкой ограничений контекста."""
+        if self.max_length is not None and len(expression) > self.max_length:
+            raise ValueError(f"Expression is too long: {len(expression)} characters (limit {self.max_length})")
+        expr = parse(expression, functions=self.functions)
+        self._check_size(expr)
+        return expr
+
+    def _check_size(self, expr):
+        if self.max_nodes is not None:
+            size = count_nodes(expr)
+            if size > self.max_nodes:
+                raise ValueError(f"Expression is too large: {size} nodes (limit {self.max_nodes})")
+
+    def _build(self, expr):
+        if self.precision is not None:
+            from calculator.precise import evaluate_precise
+            return partial(evaluate_precise, expr, self.precision, self.degrees)
+        return compile(expr, degrees=self.degrees)
+
+    def program(self, expression: str):
+        """Вычисляющая функция program(variables) для текста выражения (из кэша)."""
+        program = self._programs.get(expression)
+        if program is not None:
+            self._counters().hits += 1
+            return program
+        return self._miss(expression, self._counters())
+
+    def _miss(self, expression, counters):
+        # Вариант с другими пробелами находит ту же программу
+        key = normalize_expression(expression)
+        programs = self._programs
+        program = programs.get(key) if key is not None else None
+        if program is None:
+            counters.misses += 1
+            program = self._build(self.parse(expression))
+        else:
+            counters.hits += 1
+        if self.cache_size:
+            # Без блокировки: переполненный кэш заменяется пустым целиком,
+            # а запись, потерянная при гонке двух потоков, просто строится заново
+            keys = {expression, key} if key is not None and self.cache_size > 1 else {expression}
+            if len(programs) + len(keys) > self.cache_size:
+                programs = self._programs = {}
+            for name in keys:
+                programs[name] = program
+        return program
+
+    def evaluate(self, expression, variables=None):
+        """Значение выражения (текст или дерево) в настройках контекста."""
+        counters = self._counters()
+        counters.evaluations += 1
+        try:
+            if not isinstance(expression, str):
+                self._check_size(expression)
+                return evaluate(expression, self.degrees, variables, self.precision)
+            program = self._programs.get(expression)
+            if program is None:
+                program = self._miss(expression, counters)
+            else:
+                counters.hits += 1
+            return program(variables)
+        except Exception:
+            counters.errors += 1
+            raise
+
+    def _evaluate_chunk(self, chunk, variables=None):
+        results = []
+        for expression in chunk:
+            try:
+                results.append((self.evaluate(expression, variables), None))
+            except Exception as e:
+                results.append((None, str(e)))
+        return results
+
+    def evaluate_many(self, expressions, variables=None, jobs=None, chunk_size=1000, executor='thread'):
+        """Пары (результат, сообщение об ошибке или None) в порядке входа.
+
+        Выражения отдаются пулу порциями по chunk_size, в работе не больше
+        двух порций на исполнителя, поэтому вход может быть генератором
+        любой длины. executor - 'thread' (общий кэш; из-за GIL ускоряет
+        в основном выражения с долгими функциями), 'process' (настоящий
+        параллелизм, у каждого процесса свой кэш) или готовый
+        concurrent.futures.Executor. При jobs=1 порции вычисляются в
+        вызывающем потоке. Неверные параметры отвергаются сразу, до
+        получения первого результата.
+        """
+        if jobs is None:
+            jobs = available_cpus()
+        if jobs < 1:
+            raise ValueError("Number of jobs must be positive")
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be positive")
+        if not isinstance(executor, Executor) and executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor: {executor!r}")
+        if executor == 'process' and self.functions is not None:
+            raise ValueError("User-defined functions cannot be sent to a process pool")
+        return self._evaluate_many(_chunked(expressions, chunk_size), variables, jobs, executor)
+
+    def _evaluate_many(self, chunks, variables, jobs, executor):
+        if isinstance(executor, Executor):
+            for results in map_chunks(executor, partial(self._evaluate_chunk, variables=variables), chunks, jobs * 2):
+                yield from results
+        elif jobs == 1:
+            for chunk in chunks:
+                yield from self._evaluate_chunk(chunk, variables)
+        elif executor == 'thread':
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                for results in map_chunks(pool, partial(self._evaluate_chunk, variables=variables), chunks, jobs * 2):
+                    yield from results
+        else:
+            counters = self._counters()
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_start_worker, initargs=(self,)) as pool:
+                for results in map_chunks(pool, partial(_worker_chunk, variables=variables), chunks, jobs * 2):
+                    # Попадания в кэш остаются в процессах, сюда - только итоги
+                    counters.evaluations += len(results)
+                    counters.errors += sum(error is not None for _, error in results)
+                    yield from results
+
+    def stats(self):
+        with self._lock:
+            counters = list(self._all_counters)
+        hits = sum(c.hits for c in counters)
+        misses = sum(c.misses for c in counters)
+        lookups = hits + misses
+        return {
+            'evaluations': sum(c.evaluations for c in counters),
+            'errors': sum(c.errors for c in counters),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'cached': len(self._programs),
+            'threads': len(counters),
+        }
+
+    def clear(self):
+        self._programs = {}
+        with self._lock:
+            for counters in self._all_counters:
+                counters.__init__()
+
+# Контекст процесса пула: создаётся один раз, кэш живёт между порциями
+_worker = None
+
+def _start_worker(evaluator):
+    global _worker
+    _worker = evaluator
+
+def _worker_chunk(chunk, variables=None):
+    return _worker._evaluate_chunk(chunk, variables)
@@ -1,61 +1,271 @@
 import math
-from calculator.parser import UnaryOp, BinaryOp, Number, Function
-
-def evaluate(expr, degrees=False):
-    if isinstance(expr, Number):
-        return expr.value
-    elif isinstance(expr, UnaryOp):
-        if expr.op == '-':
-            return -evaluate(expr.operand, degrees)
+import operator
+from calculator import profiling, trig
+from calculator.parser import UnaryOp, BinaryOp, Number, Function, Variable, Call
+
+def divide(left, right):
+    if right == 0:
+        raise ZeroDivisionError("Division by zero")
+    result = left / right
+    if math.isinf(result):
+        raise OverflowError("Result is infinite")
+    return result
+
+# ln(sys.float_info.max): больший логарифм модуля результата - переполнение
+_LOG_MAX_FLOAT = 709.782712893384
+
+def power(left, right):
+    # Проверка на отрицательную степень и некорректный синтаксис
+    integer_exponent = float(right).is_integer()
+    if left < 0 and not integer_exponent:
+        raise ValueError("A negative number cannot be raised to a non-integer power")
+
+    # Тривиальные основания не требуют вычисления
+    if left == 1:
+        return 1.0
+    if left == 0 and math.isfinite(right):
+        # nan и inf в показателе идут общим путём, как до быстрых путей:
+        # 0 ** nan = nan, 0 ** -inf = inf
+        if right < 0:
+            raise ZeroDivisionError("0.0 cannot be raised to a negative power")
+        # Степень нуля вычисляется сразу и сохраняет знак: (-0.0) ** 3 = -0.0
+        return float(left) ** right
+    if left == -1 and integer_exponent:
+        return -1.0 if right % 2 else 1.0
+
+    if math.isfinite(left) and math.isfinite(right):
+        # Оценка порядка результата до вычисления
+        magnitude = right * math.log(abs(left))
+        if magnitude > _LOG_MAX_FLOAT:
+            raise OverflowError("Result is infinite")
+    try:
+        if integer_exponent and right > 0 and float(left).is_integer():
+            # Точное возведение целых в степень (возведение в квадрат), одно округление
+            return float(int(left) ** int(right))
+        return left ** right
+    except OverflowError:
+        raise OverflowError("Result is infinite") from None
+
+def ctg(x):
+    return 1 / math.tan(x)
+
+def hypot(*args):
+    result = math.hypot(*args)
+    if math.isinf(result) and all(map(math.isfinite, args)):
+        raise OverflowError("Result is infinite")
+    return result
+
+UNARY_OPERATORS = {
+    '-': operator.neg,
+}
+
+BINARY_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': divide,
+    '^': power,
+}
+
+RADIAN_FUNCTIONS = {
+    'sqrt': math.sqrt,
+    'sin': math.sin,
+    'cos': math.cos,
+    'tg': math.tan,
+    'ctg': ctg,
+    'ln': math.log,
+    'exp': math.exp,
+    'arctg': math.atan,
+}
+
+# Тригонометрия с аргументом (или результатом для arctg) в градусах
+DEGREE_FUNCTIONS = {
+    **RADIAN_FUNCTIONS,
+    'sin': lambda x: math.sin(math.radians(x)),
+    'cos': lambda x: math.cos(math.radians(x)),
+    'tg': lambda x: math.tan(math.radians(x)),
+    'ctg': lambda x: ctg(math.radians(x)),
+    'arctg': lambda x: math.degrees(math.atan(x)),
+}
+
+# Градусы с точной редукцией аргумента (degrees=trig.EXACT): sin(180) == 0,
+# tg(90) - ошибка; значения на повторяющихся углах берутся из памяти
+EXACT_DEGREE_FUNCTIONS = {
+    **RADIAN_FUNCTIONS,
+    **trig.FUNCTIONS,
+}
+
+# Функции нескольких аргументов (parser.CALL_FUNCTIONS); от режима углов не зависят
+CALL_FUNCTIONS = {
+    'hypot': hypot,
+    'pow': power,
+    'min': lambda *args: min(args),
+    'max': lambda *args: max(args),
+}
+
+def resolve_unary(op):
+    try:
+        return UNARY_OPERATORS[op]
+    except KeyError:
+        raise ValueError(f"Unknown unary operator: {op}") from None
+
+def resolve_binary(op):
+    try:
+        return BINARY_OPERATORS[op]
+    except KeyError:
+        raise ValueError(f"Unknown operator: {op}") from None
+
+def angle_functions(degrees):
+    """Функции для режима углов: False - радианы, True - градусы, trig.EXACT -
+    градусы с точной редукцией."""
+    if degrees == trig.EXACT:
+        return EXACT_DEGREE_FUNCTIONS
+    return DEGREE_FUNCTIONS if degrees else RADIAN_FUNCTIONS
+
+def resolve_function(name, degrees=False):
+    functions = angle_functions(degrees)
+    try:
+        return functions[name]
+    except KeyError:
+        raise ValueError(f"Unsupported function: {name}") from None
+
+def resolve_call(name):
+    try:
+        return CALL_FUNCTIONS[name]
+    except KeyError:
+        raise ValueError(f"Unsupported function: {name}") from None
+
+def lookup_variable(name, variables):
+    try:
+        return variables[name]
+    except (KeyError, TypeError):
+        raise ValueError(f"Unknown variable: {name}") from None
+
+def apply_unary(op, operand):
+    return resolve_unary(op)(operand)
+
+def apply_binary(op, left, right):
+    return resolve_binary(op)(left, right)
+
+def apply_function(name, arg, degrees=False):
+    return resolve_function(name, degrees)(arg)
+
+def apply_call(name, args):
+    return resolve_call(name)(*args)
+
+# Маркер в стеке обхода: следующий за ним узел готов к применению
+_APPLY = object()
+
+def evaluate(expr, degrees=False, variables=None, precision=None):
+    if profiling.active is not None:
+        return profiling.active.evaluate(_evaluate, expr, degrees, variables, precision)
+    return _evaluate(expr, degrees, variables, precision)
+
+def _evaluate(expr, degrees, variables, precision):
+    if precision is not None:
+        # Высокая точность: Decimal с precision значащими цифрами
+        from calculator.precise import evaluate_precise
+        return evaluate_precise(expr, precision, degrees, variables)
+    # Обход в обратном порядке с явным стеком: глубина дерева ограничена
+    # только памятью, а не лимитом рекурсии.
+    values = []
+    stack = [expr]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        node = pop()
+        if node is _APPLY:
+            node = pop()
+            if isinstance(node, BinaryOp):
+                right = values.pop()
+                values[-1] = apply_binary(node.op, values[-1], right)
+            elif isinstance(node, Function):
+                values[-1] = apply_function(node.name, values[-1], degrees)
+            elif isinstance(node, Call):
+                count = len(node.args)
+                result = apply_call(node.name, values[-count:])
+                del values[-count:]
+                values.append(result)
+            else:
+                values[-1] = apply_unary(node.op, values[-1])
+        elif isinstance(node, Number):
+            values.append(node.value)
+        elif isinstance(node, Variable):
+            values.append(lookup_variable(node.name, variables))
+        elif isinstance(node, BinaryOp):
+            push(node)
+            push(_APPLY)
+            push(node.right)
+            push(node.left)
+        elif isinstance(node, UnaryOp):
+            resolve_unary(node.op)
+            push(node)
+            push(_APPLY)
+            push(node.operand)
+        elif isinstance(node, Function):
+            push(node)
+            push(_APPLY)
+            push(node.arg)
+        elif isinstance(node, Call):
+            push(node)
+            push(_APPLY)
+            stack.extend(reversed(node.args))
         else:
-            raise ValueError(f"Unknown unary operator: {expr.op}")
-    elif isinstance(expr, BinaryOp):
-        left = evaluate(expr.left, degrees)
-        right = evaluate(expr.right, degrees)
-        if expr.op == '+':
-            return left + right
-        elif expr.op == '-':
-            return left - right
-        elif expr.op == '*':
-            return left * right
-        elif expr.op == '/':
-            if right == 0:
-                raise ZeroDivisionError("Division by zero")
-            if math.isinf(left / right):
-                raise OverflowError("Result is infinite")
-            return left / right
-        elif expr.op == '^':
-            # Проверка на отрицательную степень и некорректный синтаксис
-            if left < 0 and not right.is_integer():
-                raise ValueError("A negative number cannot be raised to a non-integer power")
-            return left ** right
+            raise TypeError("Invalid expression type")
+    return values[0]
+
+def evaluate_shared(expr, degrees=False, variables=None):
+    """То же, что evaluate(), но значение каждого узла вычисляется один раз.
+
+    Для DAG из optimizer.share(): узел, на который ссылаются несколько
+    раз, вычисляется при первой встрече, дальше берётся запомненное значение.
+    """
+    values = []
+    memo = {}
+    stack = [expr]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        node = pop()
+        if node is _APPLY:
+            node = pop()
+            if isinstance(node, BinaryOp):
+                right = values.pop()
+                values[-1] = apply_binary(node.op, values[-1], right)
+            elif isinstance(node, Function):
+                values[-1] = apply_function(node.name, values[-1], degrees)
+            elif isinstance(node, Call):
+                count = len(node.args)
+                result = apply_call(node.name, values[-count:])
+                del values[-count:]
+                values.append(result)
+            else:
+                values[-1] = apply_unary(node.op, values[-1])
+            memo[id(node)] = values[-1]
+        elif isinstance(node, Number):
+            values.append(node.value)
+        elif isinstance(node, Variable):
+            values.append(lookup_variable(node.name, variables))
+        elif id(node) in memo:
+            values.append(memo[id(node)])
+        elif isinstance(node, BinaryOp):
+            push(node)
+            push(_APPLY)
+            push(node.right)
+            push(node.left)
+        elif isinstance(node, UnaryOp):
+            resolve_unary(node.op)
+            push(node)
+            push(_APPLY)
+            push(node.operand)
+        elif isinstance(node, Function):
+            push(node)
+            push(_APPLY)
+            push(node.arg)
+        elif isinstance(node, Call):
+            push(node)
+            push(_APPLY)
+            stack.extend(reversed(node.args))
         else:
-            raise ValueError(f"Unknown operator: {expr.op}")
-
-    elif isinstance(expr, Function):
-        arg = evaluate(expr.arg, degrees)
-        if degrees and expr.name in {'sin', 'cos', 'tg', 'ctg'}:
-            arg = math.radians(arg)
-        match expr.name:
-            case 'sqrt':
-                return math.sqrt(arg)
-            case 'sin':
-                return math.sin(arg)
-            case 'cos':
-                return math.cos(arg)
-            case 'tg':
-                return math.tan(arg)
-            case 'ctg':
-                return 1 / math.tan(arg)
-            case 'ln':
-                return math.log(arg)
-            case 'exp':
-                return math.exp(arg)
-            case 'arctg':
-                result = math.atan(arg)
-                return math.degrees(result) if degrees else result
-            case _:
-                raise ValueError(f"Unsupported function: {expr.name}")
-
-    else:
-        raise TypeError("Invalid expression type")
+            raise TypeError("Invalid expression type")
+    return values[0]
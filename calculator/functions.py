@@ -0,0 +1,238 @@
+from calculator.parser import (
+    UnaryOp, BinaryOp, Number, Function, Variable, Call, FUNCTIONS, CALL_FUNCTIONS, CONSTANTS,
+    parse, parse_tokens, tokenize,
+)
+
+# Ограничения по умолчанию: размер дерева после подстановки (с повторами,
+# столько узлов обходит evaluate()) и глубина вложенности определений
+MAX_NODES = 1_000_000
+MAX_DEPTH = 32
+
+_RESERVED = FUNCTIONS | CALL_FUNCTIONS.keys() | CONSTANTS.keys()
+
+# Маркер в стеке обхода: следующий за ним узел готов к применению
+_APPLY = object()
+
+def _children(node):
+    if isinstance(node, BinaryOp):
+        return (node.left, node.right)
+    if isinstance(node, UnaryOp):
+        return (node.operand,)
+    if isinstance(node, Function):
+        return (node.arg,)
+    if isinstance(node, Call):
+        return node.args
+    return ()
+
+def _rebuild(node, children):
+    if isinstance(node, BinaryOp):
+        return BinaryOp(children[0], node.op, children[1])
+    if isinstance(node, UnaryOp):
+        return UnaryOp(node.op, children[0])
+    if isinstance(node, Function):
+        return Function(node.name, children[0])
+    return Call(node.name, children)
+
+def _measure(expr, params=()):
+    """Размер дерева с повторами и число вхождений каждого параметра.
+
+    Общие узлы (аргументы, подставленные в несколько мест) обходятся один раз.
+    """
+    sizes = {}
+    uses = {}
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if node is _APPLY:
+            node = stack.pop()
+            children = _children(node)
+            sizes[id(node)] = 1 + sum(sizes[id(child)] for child in children)
+            counts = {}
+            for child in children:
+                for name, count in uses[id(child)].items():
+                    counts[name] = counts.get(name, 0) + count
+            uses[id(node)] = counts
+        elif id(node) in sizes:
+            continue
+        elif isinstance(node, Variable):
+            sizes[id(node)] = 1
+            uses[id(node)] = {node.name: 1} if node.name in params else {}
+        else:
+            children = _children(node)
+            if children:
+                stack += (node, _APPLY, *children)
+            else:
+                sizes[id(node)] = 1
+                uses[id(node)] = {}
+    return sizes[id(expr)], uses[id(expr)]
+
+def _substitution_plan(body, params):
+    """План подстановки аргументов в тело: (константы, шаги, индекс результата).
+
+    Рабочий список при подстановке - аргументы, затем константы, затем
+    результаты шагов. Шаг (узел, индексы детей) пересобирает узел, зависящий
+    от параметров; остальные поддеревья переиспользуются как есть, а аргумент
+    подставляется одним и тем же узлом во все вхождения параметра.
+    """
+    slots = {name: i for i, name in enumerate(params)}
+    refs = {}
+    constants = []
+    steps = []
+
+    def ref(node):
+        # Ссылка на ещё не зависящий от параметров узел делает его константой
+        found = refs.get(id(node))
+        if found is None:
+            found = refs[id(node)] = ('constant', len(constants))
+            constants.append(node)
+        return found
+
+    dependent = {}
+    stack = [body]
+    while stack:
+        node = stack.pop()
+        if node is _APPLY:
+            node = stack.pop()
+            children = _children(node)
+            if any(dependent[id(child)] for child in children):
+                dependent[id(node)] = True
+                steps.append((node, tuple(ref(child) for child in children)))
+                refs[id(node)] = ('step', len(steps) - 1)
+            else:
+                dependent[id(node)] = False
+        elif id(node) in dependent:
+            continue
+        elif isinstance(node, Variable) and node.name in slots:
+            dependent[id(node)] = True
+            refs[id(node)] = ('param', slots[node.name])
+        else:
+            children = _children(node)
+            if children:
+                stack += (node, _APPLY, *children)
+            else:
+                dependent[id(node)] = False
+
+    if not dependent[id(body)]:
+        return (body,), [], len(params)
+    offsets = {'param': 0, 'constant': len(params), 'step': len(params) + len(constants)}
+    steps = [(node, tuple(offsets[kind] + i for kind, i in indices)) for node, indices in steps]
+    kind, i = refs[id(body)]
+    return tuple(constants), steps, offsets[kind] + i
+
+def _check_name(name, kind):
+    if not (name[0].isalpha() or name[0] == '_') or not name.replace('_', 'a').isalnum():
+        raise ValueError(f"Invalid {kind} name: {name}")
+    if name in _RESERVED:
+        raise ValueError(f"Name is reserved: {name}")
+
+class UserFunction:
+    """Функция, заданная формулой: параметры и тело, разобранное один раз.
+
+    size - число узлов тела как дерева, uses - число вхождений каждого
+    параметра, depth - глубина вложенности пользовательских функций
+    (1, если тело их не вызывает).
+    """
+
+    __slots__ = ('name', 'params', 'body', 'size', 'uses', 'depth', 'plan')
+
+    def __init__(self, name, params, body, depth):
+        self.name = name
+        self.params = tuple(params)
+        self.body = body
+        self.size, self.uses = _measure(body, self.params)
+        self.depth = depth
+        self.plan = _substitution_plan(body, self.params)
+
+    def substitute(self, args):
+        """Тело с подставленными аргументами (узлы дерева)."""
+        constants, steps, result = self.plan
+        values = [*args, *constants]
+        for node, indices in steps:
+            values.append(_rebuild(node, [values[i] for i in indices]))
+        return values[result]
+
+class FunctionRegistry:
+    """Пользовательские функции для parse(expression, functions=registry).
+
+    Функция задаётся формулой "f(x, y) = x^2 + y^2" и разбирается один раз.
+    Вызов f(...) в выражении заменяется при разборе телом функции
+    с подставленными аргументами, поэтому вычисление, компиляция и
+    оптимизация работают с обычным деревом. Тело может вызывать
+    встроенные и уже определённые функции; рекурсия запрещена, глубина
+    вложенности определений ограничена max_depth, размер дерева после
+    подстановки - max_nodes. Переопределение функции не меняет уже
+    разобранные выражения.
+    """
+
+    def __init__(self, max_nodes=MAX_NODES, max_depth=MAX_DEPTH):
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self._functions = {}
+
+    def __contains__(self, name):
+        return name in self._functions
+
+    def __getitem__(self, name):
+        return self._functions[name]
+
+    def __iter__(self):
+        return iter(self._functions)
+
+    def __len__(self):
+        return len(self._functions)
+
+    def define(self, definition: str):
+        """Регистрирует функцию из записи "f(x, y) = выражение" и возвращает её."""
+        header, sep, body = definition.partition('=')
+        tokens = tokenize(header) if sep else []
+        inner = tokens[2:-1]
+        if (len(tokens) < 4 or tokens[1] != '(' or tokens[-1] != ')'
+                or len(inner) % 2 == 0 or any(token != ',' for token in inner[1::2])):
+            raise ValueError("Function definition must look like 'f(x, y) = expression'")
+        return self.register(tokens[0], inner[0::2], body)
+
+    def register(self, name, params, body: str):
+        """Регистрирует функцию name с параметрами params и телом body (текст)."""
+        _check_name(name, "function")
+        for param in params:
+            _check_name(param, "parameter")
+            if param == name or param in self._functions:
+                raise ValueError(f"Parameter name is already a function: {param}")
+        if len(set(params)) != len(params):
+            raise ValueError(f"Duplicate parameter in function {name}")
+
+        tokens = tokenize(body)
+        depth = 0
+        for i, token in enumerate(tokens):
+            if token == name and i + 1 < len(tokens) and tokens[i + 1] == '(':
+                raise ValueError(f"Recursive function definition: {name}")
+            if token in self._functions:
+                depth = max(depth, self._functions[token].depth)
+        if depth + 1 > self.max_depth:
+            raise ValueError(f"Function nesting is too deep: {name} (limit {self.max_depth})")
+        function = UserFunction(name, params, parse_tokens(tokens, self), depth + 1)
+        self._functions[name] = function
+        return function
+
+    def remove(self, name):
+        del self._functions[name]
+
+    def inline(self, name, args):
+        """Тело функции name с подставленными аргументами (вызывается парсером)."""
+        try:
+            function = self._functions[name]
+        except KeyError:
+            raise ValueError(f"Unknown function: {name}") from None
+        if len(args) != len(function.params):
+            raise ValueError(f"Function {name} takes {len(function.params)} arguments, got {len(args)}")
+        size = function.size
+        for param, arg in zip(function.params, args):
+            uses = function.uses.get(param, 0)
+            if uses and not isinstance(arg, (Number, Variable)):
+                size += uses * (_measure(arg)[0] - 1)
+        if size > self.max_nodes:
+            raise ValueError(f"Function {name} expands to {size} nodes (limit {self.max_nodes})")
+        return function.substitute(args)
+
+    def parse(self, expression: str):
+        return parse(expression, functions=self)
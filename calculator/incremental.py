@@ -0,0 +1,326 @@
+from bisect import bisect_right
+from itertools import count
+from calculator.parser import parse, UnaryOp, BinaryOp, Function, Variable, Call
+from calculator.evaluator import evaluate
+
+# Префикс имён-заглушек, которыми в тексте группы заменяются вложенные скобки
+PLACEHOLDER_PREFIX = "__group"
+
+class _Group:
+    """Скобочная группа: '(' ... ')' или всё выражение (корень).
+
+    start - позиция '(' относительно начала содержимого родителя,
+    length - длина вместе со скобками. Дерево content разобрано из
+    собственного текста группы, где дочерние группы заменены заглушками.
+    """
+
+    __slots__ = ('name', 'start', 'length', 'parent', 'children', 'content', 'value', 'error')
+
+    def __init__(self, name, start, parent):
+        self.name = name
+        self.start = start
+        self.length = 0
+        self.parent = parent
+        self.children = []
+        self.content = None
+        self.value = None
+        self.error = None
+
+class _Unbalanced(Exception):
+    pass
+
+class _GroupValues:
+    # Переменные для вычисления группы: значения дочерних групп и пользовательские
+    def __init__(self, group, variables):
+        self.children = {child.name: child for child in group.children}
+        self.variables = variables
+
+    def __getitem__(self, name):
+        child = self.children.get(name)
+        if child is None:
+            return self.variables[name]
+        if child.error is not None:
+            raise child.error
+        return child.value
+
+def _common_prefix(a, b):
+    # Двоичный поиск по сравнению срезов: сравнение идёт в C
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_suffix(a, b, limit):
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+class ExpressionSession:
+    """Выражение, которое редактируется по частям.
+
+    После правки заново разбирается только собственный текст самой
+    внутренней скобочной группы, содержащей правку (вложенные группы в нём
+    заменены заглушками), а вычисляются только эта группа и её предки:
+    значения остальных групп запоминаются. Результат и ошибки совпадают
+    с evaluate(parse(text)). Выражение с вызовом функции нескольких
+    аргументов после каждой правки разбирается целиком.
+    """
+
+    def __init__(self, text="", degrees=False, variables=None):
+        self.degrees = degrees
+        self.variables = dict(variables or {})
+        self.text = ""
+        self.reparsed_chars = 0
+        self.evaluated_groups = 0
+        self._names = count()
+        self._root = None
+        self._error = None
+        self.set_text(text)
+
+    def _new_group(self, start, parent):
+        return _Group(f"{PLACEHOLDER_PREFIX}{next(self._names)}", start, parent)
+
+    @property
+    def value(self):
+        if self._error is not None:
+            raise self._error
+        if self._root.error is not None:
+            raise self._root.error
+        return self._root.value
+
+    @property
+    def tree(self):
+        """Полное дерево выражения с подставленными группами."""
+        if self._error is not None:
+            raise self._error
+        return _substitute(self._root)
+
+    def set_variables(self, variables):
+        self.variables = dict(variables)
+        if self._error is None:
+            self._evaluate(_all_groups(self._root))
+
+    def set_text(self, text):
+        if self._root is None or self._error is not None:
+            self.text = text
+            self._rebuild_root()
+            return
+        old = self.text
+        prefix = _common_prefix(old, text)
+        suffix = _common_suffix(old, text, min(len(old), len(text)) - prefix)
+        self.edit(prefix, len(old) - suffix, text[prefix:len(text) - suffix])
+
+    def edit(self, start, end, replacement):
+        """Заменяет text[start:end] на replacement."""
+        if not 0 <= start <= end <= len(self.text):
+            raise ValueError("Edit range is out of bounds")
+        self.text = self.text[:start] + replacement + self.text[end:]
+        if self._error is not None or ',' in self.text:
+            self._rebuild_root()
+            return
+        delta = len(replacement) - (end - start)
+
+        # Самая внутренняя группа, внутри содержимого которой лежит правка
+        group = self._root
+        base = 0
+        path = []
+        while True:
+            starts = [child.start for child in group.children]
+            i = bisect_right(starts, start - base - 1) - 1
+            if i < 0:
+                break
+            child = group.children[i]
+            child_open = base + child.start
+            if not (child_open < start and end <= child_open + child.length - 1):
+                break
+            path.append((group, i))
+            group = child
+            base = child_open + 1
+
+        try:
+            built = self._rebuild(group, base, start, end, delta)
+        except _Unbalanced:
+            self._rebuild_root()
+            return
+        except Exception as e:
+            self._fail(e)
+            return
+
+        # Предкам достаточно сдвинуть позиции: их собственный текст не изменился
+        for parent, index in reversed(path):
+            parent.length += delta
+            for sibling in parent.children[index + 1:]:
+                sibling.start += delta
+        self._root.length = len(self.text) + 2
+
+        dirty = built
+        ancestor = group.parent
+        while ancestor is not None:
+            dirty.append(ancestor)
+            ancestor = ancestor.parent
+        self._evaluate(dirty)
+
+    def _rebuild_root(self):
+        self._root = self._new_group(-1, None)
+        self._root.length = len(self.text) + 2
+        try:
+            if ',' in self.text:
+                # Аргументы функции через запятую нельзя разобрать отдельно от
+                # вызова, поэтому такое выражение разбирается целиком, одной группой
+                self.reparsed_chars += len(self.text)
+                self._root.content = parse(self.text)
+                built = [self._root]
+            else:
+                built = self._rebuild(self._root, 0, 0, len(self.text), 0)
+        except Exception as e:
+            self._fail(e)
+            return
+        self._error = None
+        self._evaluate(built)
+
+    def _fail(self, error):
+        # Локальная ошибка означает, что некорректно всё выражение;
+        # сообщение берём у полного разбора, чтобы оно совпадало с parse()
+        try:
+            parse(self.text)
+        except Exception as e:
+            error = e
+        self._error = error
+
+    def _rebuild(self, group, base, start, end, delta):
+        """Пересобирает группу после правки [start, end) со сдвигом delta.
+
+        Дочерние группы вне правки переиспользуются. Возвращает
+        новые и изменённые группы, дочерние раньше родительских.
+        """
+        text = self.text
+        interior_end = base + group.length - 2 + delta
+        reusable = {}
+        for child in group.children:
+            child_open = base + child.start
+            if child_open + child.length <= start:
+                reusable[child_open] = child
+            elif child_open >= end:
+                reusable[child_open + delta] = child
+
+        group.length += delta
+        group.children = []
+        built = []
+        bases = []
+        stack = [(group, base)]
+        i = base
+        while i < interior_end:
+            char = text[i]
+            if char == '(':
+                parent, parent_base = stack[-1]
+                child = reusable.get(i)
+                if child is not None:
+                    child.parent = parent
+                    child.start = i - parent_base
+                    parent.children.append(child)
+                    i += child.length
+                    continue
+                child = self._new_group(i - parent_base, parent)
+                parent.children.append(child)
+                stack.append((child, i + 1))
+            elif char == ')':
+                if len(stack) == 1:
+                    raise _Unbalanced()
+                child, child_base = stack.pop()
+                child.length = i - child_base + 2
+                built.append(child)
+                bases.append(child_base)
+            i += 1
+        if len(stack) != 1:
+            raise _Unbalanced()
+        built.append(group)
+        bases.append(base)
+
+        for node, node_base in zip(built, bases):
+            self._parse_own_text(node, node_base)
+        return built
+
+    def _parse_own_text(self, group, base):
+        text = self.text
+        pieces = []
+        position = base
+        for child in group.children:
+            child_open = base + child.start
+            pieces.append(text[position:child_open + 1])
+            pieces.append(child.name)
+            position = child_open + child.length - 1
+        pieces.append(text[position:base + group.length - 2])
+        own_text = "".join(pieces)
+        self.reparsed_chars += len(own_text)
+        group.content = parse(own_text)
+
+    def _evaluate(self, groups):
+        for group in groups:
+            self.evaluated_groups += 1
+            try:
+                group.value = evaluate(group.content, self.degrees, _GroupValues(group, self.variables))
+                group.error = None
+            except Exception as e:
+                group.value = None
+                group.error = e
+
+def _substitute(root):
+    trees = {}
+    for group in _all_groups(root):
+        trees[group.name] = _replace_placeholders(group.content, trees)
+    return trees[root.name]
+
+def _all_groups(root):
+    # Все группы, дочерние раньше родительских
+    order = []
+    stack = [root]
+    while stack:
+        group = stack.pop()
+        order.append(group)
+        stack.extend(group.children)
+    order.reverse()
+    return order
+
+_APPLY = object()
+
+def _replace_placeholders(expr, trees):
+    results = []
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if node is _APPLY:
+            node = stack.pop()
+            if isinstance(node, BinaryOp):
+                right = results.pop()
+                results[-1] = BinaryOp(results[-1], node.op, right)
+            elif isinstance(node, Function):
+                results[-1] = Function(node.name, results[-1])
+            elif isinstance(node, Call):
+                count = len(node.args)
+                args = results[-count:]
+                del results[-count:]
+                results.append(Call(node.name, args))
+            else:
+                results[-1] = UnaryOp(node.op, results[-1])
+        elif isinstance(node, BinaryOp):
+            stack += (node, _APPLY, node.right, node.left)
+        elif isinstance(node, UnaryOp):
+            stack += (node, _APPLY, node.operand)
+        elif isinstance(node, Function):
+            stack += (node, _APPLY, node.arg)
+        elif isinstance(node, Call):
+            stack += (node, _APPLY, *reversed(node.args))
+        elif isinstance(node, Variable) and node.name in trees:
+            results.append(trees[node.name])
+        else:
+            results.append(node)
+    return results[0]
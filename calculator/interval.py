@@ -0,0 +1,376 @@
+import math
+from calculator import trig
+from calculator.parser import UnaryOp, BinaryOp, Number, Function, Variable, Call
+from calculator.evaluator import resolve_function, lookup_variable
+
+_INF = math.inf
+_TINY = math.ulp(0.0)
+
+class Interval:
+    """Замкнутый отрезок [lo, hi]; концы могут быть бесконечными."""
+
+    __slots__ = ('lo', 'hi')
+
+    def __init__(self, lo, hi=None):
+        if hi is None:
+            hi = lo
+        if not lo <= hi:
+            raise ValueError(f"Invalid interval: [{lo}, {hi}]")
+        self.lo = lo
+        self.hi = hi
+
+    def __contains__(self, value):
+        return self.lo <= value <= self.hi
+
+    def __eq__(self, other):
+        return isinstance(other, Interval) and self.lo == other.lo and self.hi == other.hi
+
+    def __repr__(self):
+        return f"Interval({self.lo!r}, {self.hi!r})"
+
+    @property
+    def width(self):
+        return self.hi - self.lo
+
+# Виды нарушений области определения
+DIVISION_BY_ZERO = 'division by zero'
+NEGATIVE_BASE = 'negative base'
+LN_DOMAIN = 'ln domain'
+SQRT_DOMAIN = 'sqrt domain'
+OVERFLOW = 'overflow'
+
+_MESSAGES = {
+    DIVISION_BY_ZERO: "division by zero",
+    NEGATIVE_BASE: "negative number raised to a non-integer power",
+    LN_DOMAIN: "ln of a non-positive number",
+    SQRT_DOMAIN: "sqrt of a negative number",
+    OVERFLOW: "result is infinite",
+}
+
+class Issue:
+    """Возможная ошибка вычисления в узле node.
+
+    certain - ошибка будет при любых значениях переменных из диапазонов.
+    """
+
+    __slots__ = ('kind', 'node', 'certain')
+
+    def __init__(self, kind, node, certain=False):
+        self.kind = kind
+        self.node = node
+        self.certain = certain
+
+    @property
+    def message(self):
+        return f"{'Certain' if self.certain else 'Possible'} {_MESSAGES[self.kind]}"
+
+    def __repr__(self):
+        return f"Issue({self.kind!r}, certain={self.certain})"
+
+def _hull(lo, hi):
+    # NaN в конце (inf - inf, inf / inf) означает, что граница неизвестна
+    return Interval(-_INF if lo != lo else lo, _INF if hi != hi else hi)
+
+def _down(x):
+    # Бесконечный конец остаётся: конечный аргумент с бесконечным значением
+    # в evaluate() - всегда OverflowError
+    return math.nextafter(x, -_INF) if math.isfinite(x) else x
+
+def _up(x):
+    return math.nextafter(x, _INF) if math.isfinite(x) else x
+
+def _outward(lo, hi):
+    # Округление наружу для функций libm: их ошибка - до ulp, и монотонность
+    # округлённых значений не гарантирована
+    return _hull(_down(lo), _up(hi))
+
+def _nonnegative(result):
+    # Округление наружу не должно уводить за ноль неотрицательные функции:
+    # x ^ 2 на [-1, 1] должен остаться допустимым аргументом sqrt и ln
+    return Interval(max(result.lo, 0.0), result.hi)
+
+def _product(a, b):
+    # Произведение концов: 0 * inf = 0, как принято в интервальной арифметике
+    if a == 0 or b == 0:
+        return 0.0
+    return a * b
+
+# +, -, *, / в evaluate() округляются правильно, а правильное округление
+# монотонно: значения в углах уже ограничивают все вычисленные значения
+def _add(x, y, node, issues):
+    return _hull(x.lo + y.lo, x.hi + y.hi)
+
+def _subtract(x, y, node, issues):
+    return _hull(x.lo - y.hi, x.hi - y.lo)
+
+def _multiply(x, y, node, issues):
+    products = [_product(a, b) for a in (x.lo, x.hi) for b in (y.lo, y.hi)]
+    return _hull(min(products), max(products))
+
+def _divide(x, y, node, issues):
+    if 0 in y:
+        issues.append(Issue(DIVISION_BY_ZERO, node, y.lo == y.hi == 0))
+        if y.lo == y.hi == 0:
+            return None
+        if y.lo < 0 < y.hi:
+            return Interval(-_INF, _INF)
+        # Ноль на конце делителя: делим на оставшуюся часть, ближайшее
+        # к нулю допустимое значение - наименьшее положительное число
+        y = Interval(_TINY, y.hi) if y.lo == 0 else Interval(y.lo, -_TINY)
+    quotients = [a / b for a in (x.lo, x.hi) for b in (y.lo, y.hi)]
+    return _overflow(_hull(min(quotients), max(quotients)), node, issues, x, y)
+
+def _overflow(result, node, issues, *arguments):
+    # Бесконечная граница результата - возможен OverflowError в evaluate():
+    # в неограниченном аргументе есть и конечные значения, дающие переполнение
+    if not (math.isfinite(result.lo) and math.isfinite(result.hi)):
+        finite = all(math.isfinite(argument.lo) and math.isfinite(argument.hi) for argument in arguments)
+        certain = finite and (result.lo == _INF or result.hi == -_INF)
+        issues.append(Issue(OVERFLOW, node, certain))
+        if certain:
+            return None
+    return result
+
+def _pow(a, b):
+    # Степень концов: переполнение - inf, 0 в отрицательной степени - inf
+    if a == 0 and b < 0:
+        return _INF
+    try:
+        return math.pow(a, b)
+    except OverflowError:
+        return _INF if a > 0 or float(b) % 2 == 0 else -_INF
+
+def _integer_power(x, n):
+    # x ^ n для целого n: монотонные участки по знаку основания
+    if n == 0:
+        return Interval(1.0)
+    values = [_pow(x.lo, n), _pow(x.hi, n)]
+    odd = n % 2 == 1
+    if n < 0 and x.lo < 0 < x.hi:
+        # Полюс в нуле внутри отрезка: ветви уходят в бесконечность
+        return Interval(-_INF, _INF) if odd else _nonnegative(_outward(min(values), _INF))
+    if n < 0 and x.hi == 0 and odd:
+        # 1 / x ^ |n| при x -> -0 уходит в -inf
+        return _outward(-_INF, values[0])
+    if odd:
+        return _outward(min(values), max(values))
+    if x.lo < 0 < x.hi:
+        values.append(0.0)
+    return _nonnegative(_outward(min(values), max(values)))
+
+def _power(x, y, node, issues):
+    if y.lo == y.hi and float(y.lo).is_integer():
+        n = y.lo
+        if n < 0 and 0 in x:
+            issues.append(Issue(DIVISION_BY_ZERO, node, x.lo == x.hi == 0))
+            if x.lo == x.hi == 0:
+                return None
+        return _overflow(_integer_power(x, n), node, issues, x, y)
+
+    # Показатель не целое число: для отрицательных оснований - ошибка
+    if x.lo < 0:
+        issues.append(Issue(NEGATIVE_BASE, node, x.hi < 0 and not _has_integer(y)))
+    results = []
+    if x.hi >= 0:
+        base = Interval(max(x.lo, 0.0), x.hi)
+        if base.lo == 0 and y.lo < 0:
+            issues.append(Issue(DIVISION_BY_ZERO, node, base.hi == 0 and y.hi < 0))
+        corners = [_pow(a, b) for a in (base.lo, base.hi) for b in (y.lo, y.hi)]
+        if base.lo == 0 and y.lo <= 0 <= y.hi:
+            corners.append(1.0)
+        results.append((min(corners), max(corners)))
+    if x.lo < 0 and _has_integer(y):
+        # Целые показатели допустимы и при отрицательном основании:
+        # модуль результата не больше, чем у |x| ^ y
+        magnitude = max(_pow(abs(a), b) for a in (x.lo, min(x.hi, 0.0)) for b in (y.lo, y.hi))
+        results.append((-magnitude, magnitude))
+    if not results:
+        return None
+    lo = min(low for low, _ in results)
+    hi = max(high for _, high in results)
+    result = _outward(lo, hi)
+    return _overflow(result if x.lo < 0 else _nonnegative(result), node, issues, x, y)
+
+def _has_integer(y):
+    return math.floor(y.hi) >= y.lo if math.isfinite(y.hi) else True
+
+BINARY_OPERATORS = {
+    '+': _add,
+    '-': _subtract,
+    '*': _multiply,
+    '/': _divide,
+    '^': _power,
+}
+
+def _contains_periodic(x, offset, period):
+    # Есть ли в x точка offset + k * period; точки у самых концов считаются
+    # попавшими: лишний экстремум только расширяет границы
+    if not (math.isfinite(x.lo) and math.isfinite(x.hi)) or x.hi - x.lo >= period:
+        return True
+    tolerance = 4 * math.ulp(max(abs(x.lo), abs(x.hi), period))
+    k = math.floor((x.hi - offset) / period)
+    return any(x.lo - tolerance <= offset + j * period <= x.hi + tolerance for j in (k - 1, k, k + 1))
+
+def _period(degrees):
+    return 360.0 if degrees else 2 * math.pi
+
+def _endpoint_values(function, x):
+    return [function(x.lo), function(x.hi)]
+
+def _sin_cos(name, x, degrees):
+    period = _period(degrees)
+    if not (math.isfinite(x.lo) and math.isfinite(x.hi)) or x.hi - x.lo >= period:
+        return Interval(-1.0, 1.0)
+    # Максимум sin - в четверти периода, cos - в нуле; минимум - через полпериода
+    peak = period / 4 if name == 'sin' else 0.0
+    values = _endpoint_values(resolve_function(name, degrees), x)
+    if _contains_periodic(x, peak, period):
+        values.append(1.0)
+    if _contains_periodic(x, peak + period / 2, period):
+        values.append(-1.0)
+    result = _outward(min(values), max(values))
+    return Interval(max(result.lo, -1.0), min(result.hi, 1.0))
+
+def _tangent(name, x, node, issues, degrees):
+    half = _period(degrees) / 2
+    # Полюса tg - в четверти периода, ctg - в нуле (по модулю полупериода)
+    pole = half / 2 if name == 'tg' else 0.0
+    function = resolve_function(name, degrees)
+    if _contains_periodic(x, pole, half):
+        # evaluate() выбрасывает ошибку ровно в полюсе только для ctg(0)
+        # и в режиме точных градусов; рядом с полюсом значения огромны
+        raises = (name == 'ctg' and 0 in x) or degrees == trig.EXACT
+        if raises:
+            issues.append(Issue(DIVISION_BY_ZERO, node, x.lo == x.hi))
+            if x.lo == x.hi:
+                return None
+        return Interval(-_INF, _INF)
+    values = _endpoint_values(function, x)
+    return _outward(min(values), max(values))
+
+def _monotonic(function):
+    def apply(x):
+        values = [function(x.lo), function(x.hi)]
+        return _outward(min(values), max(values))
+    return apply
+
+def _sqrt(x, node, issues):
+    if x.lo < 0:
+        issues.append(Issue(SQRT_DOMAIN, node, x.hi < 0))
+        if x.hi < 0:
+            return None
+    return _nonnegative(_outward(math.sqrt(max(x.lo, 0.0)), math.sqrt(x.hi)))
+
+def _ln(x, node, issues):
+    if x.lo <= 0:
+        issues.append(Issue(LN_DOMAIN, node, x.hi <= 0))
+        if x.hi <= 0:
+            return None
+        return _outward(-_INF, math.log(x.hi))
+    return _outward(math.log(x.lo), math.log(x.hi))
+
+def _exp(x, node, issues):
+    lo, hi = (_exp_or_inf(x.lo), _exp_or_inf(x.hi))
+    return _overflow(_nonnegative(_outward(lo, hi)), node, issues, x)
+
+def _exp_or_inf(value):
+    try:
+        return math.exp(value)
+    except OverflowError:
+        return _INF
+
+def _apply_function(name, x, node, issues, degrees):
+    if name in ('sin', 'cos'):
+        return _sin_cos(name, x, degrees)
+    if name in ('tg', 'ctg'):
+        return _tangent(name, x, node, issues, degrees)
+    if name == 'sqrt':
+        return _sqrt(x, node, issues)
+    if name == 'ln':
+        return _ln(x, node, issues)
+    if name == 'exp':
+        return _exp(x, node, issues)
+    # arctg монотонна (в градусах тоже)
+    return _monotonic(resolve_function(name, degrees))(x)
+
+def _hypot(args, node, issues):
+    low = [0.0 if 0 in x else min(abs(x.lo), abs(x.hi)) for x in args]
+    high = [max(abs(x.lo), abs(x.hi)) for x in args]
+    return _overflow(_nonnegative(_outward(math.hypot(*low), math.hypot(*high))), node, issues, *args)
+
+CALL_FUNCTIONS = {
+    'hypot': _hypot,
+    'pow': lambda args, node, issues: _power(args[0], args[1], node, issues),
+    'min': lambda args, node, issues: Interval(min(x.lo for x in args), min(x.hi for x in args)),
+    'max': lambda args, node, issues: Interval(max(x.lo for x in args), max(x.hi for x in args)),
+}
+
+def _as_interval(value):
+    if isinstance(value, Interval):
+        return value
+    if isinstance(value, (tuple, list)):
+        return Interval(float(value[0]), float(value[1]))
+    return Interval(float(value))
+
+# Маркер в стеке обхода: следующий за ним узел готов к применению
+_APPLY = object()
+
+def evaluate_interval(expr, ranges=None, degrees=False):
+    """Границы значений выражения при переменных из диапазонов за один обход.
+
+    ranges сопоставляет имени переменной Interval, пару (lo, hi) или число.
+    Возвращает (Interval или None, список Issue). Границы гарантированы:
+    evaluate() при любых значениях из диапазонов, для которых он не выбросил
+    ошибку, даёт число внутри них (для функций libm концы округляются
+    наружу). Issue
+    отмечает узлы, где возможны деление на ноль, отрицательное основание
+    с нецелым показателем, ln неположительного, sqrt отрицательного числа
+    или переполнение; при certain=True ошибка будет всегда, и границы
+    такого узла и всех его предков - None.
+    """
+    ranges = {name: _as_interval(value) for name, value in (ranges or {}).items()}
+    issues = []
+    values = []
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if node is _APPLY:
+            node = stack.pop()
+            if isinstance(node, BinaryOp):
+                right = values.pop()
+                left = values[-1]
+                if node.op not in BINARY_OPERATORS:
+                    raise ValueError(f"Unknown operator: {node.op}")
+                values[-1] = (None if left is None or right is None
+                              else BINARY_OPERATORS[node.op](left, right, node, issues))
+            elif isinstance(node, Function):
+                arg = values[-1]
+                resolve_function(node.name, degrees)
+                values[-1] = None if arg is None else _apply_function(node.name, arg, node, issues, degrees)
+            elif isinstance(node, Call):
+                count = len(node.args)
+                args = values[-count:]
+                del values[-count:]
+                if node.name not in CALL_FUNCTIONS:
+                    raise ValueError(f"Unsupported function: {node.name}")
+                values.append(None if None in args else CALL_FUNCTIONS[node.name](args, node, issues))
+            else:
+                if node.op != '-':
+                    raise ValueError(f"Unknown unary operator: {node.op}")
+                arg = values[-1]
+                values[-1] = None if arg is None else Interval(-arg.hi, -arg.lo)
+        elif isinstance(node, BinaryOp):
+            stack += (node, _APPLY, node.right, node.left)
+        elif isinstance(node, UnaryOp):
+            stack += (node, _APPLY, node.operand)
+        elif isinstance(node, Function):
+            stack += (node, _APPLY, node.arg)
+        elif isinstance(node, Call):
+            stack += (node, _APPLY, *reversed(node.args))
+        elif isinstance(node, Number):
+            values.append(Interval(node.value))
+        elif isinstance(node, Variable):
+            values.append(lookup_variable(node.name, ranges))
+        else:
+            raise ValueError(f"Unknown node type: {type(node).__name__}")
+    return values[0], issues
@@ -1,18 +1,197 @@
-import argparse
 import sys
+from calculator import profiling
 from calculator.parser import parse
 from calculator.evaluator import evaluate
 
-def main():
+# argparse, пакетный режим и клиент импортируются только при необходимости:
+# при вызове из скрипта запуск интерпретатора дороже самого вычисления
+
+# Сколько ждать подключения и ответа сервера (с), прежде чем вычислить локально
+REMOTE_TIMEOUT = 2.0
+
+def run_batch_mode(args):
+    from calculator.batch import run_batch
+    options = dict(degrees=args.degrees, output_format=args.format, jobs=args.jobs, chunk_size=args.chunk_size)
+    if args.batch == '-':
+        total, failed = run_batch(sys.stdin, sys.stdout, **options)
+    else:
+        with open(args.batch, encoding="utf-8", buffering=1 << 20) as stream:
+            total, failed = run_batch(stream, sys.stdout, **options)
+    sys.stdout.flush()
+    if failed:
+        print(f"Error: {failed} of {total} expressions failed", file=sys.stderr)
+        exit(1)
+
+def run_bulk_mode(args):
+    from calculator.bulk import evaluate_file
+    result = evaluate_file(args.batch, args.npy, degrees=args.degrees, errors_path=args.npy + ".errors.npz")
+    if result.failed:
+        print(f"Error: {result.failed} of {result.total} expressions failed", file=sys.stderr)
+        exit(1)
+
+def run_precompile_mode(args):
+    from calculator.serialize import precompile
+    degrees = args.degrees if args.optimize else None
+    if args.batch == '-':
+        total, errors = precompile(sys.stdin, args.precompile, degrees)
+    else:
+        with open(args.batch, encoding="utf-8", buffering=1 << 20) as stream:
+            total, errors = precompile(stream, args.precompile, degrees)
+    for line_number, message in errors:
+        print(f"Error: line {line_number}: {message}", file=sys.stderr)
+    if errors:
+        print(f"Error: {len(errors)} of {total} lines failed to parse", file=sys.stderr)
+        exit(1)
+
+def evaluate_remote(address, expression, degrees, timeout=None):
+    from calculator.client import Client
+    if timeout is None:
+        timeout = REMOTE_TIMEOUT
+    # None - сервер недоступен или не ответил за timeout, вычисляем локально.
+    # socket.timeout и обрыв соединения - подклассы OSError
+    try:
+        with Client(address, timeout=timeout) as client:
+            return client.evaluate(expression, degrees=degrees)
+    except OSError:
+        return None
+
+def write_profile(profiler, destination):
+    if destination == '-':
+        print(profiler.to_json(indent=2), file=sys.stderr)
+    else:
+        with open(destination, "w", encoding="utf-8") as stream:
+            stream.write(profiler.to_json(indent=2) + "\n")
+
+def fast_arguments(argv):
+    """(выражение, degrees) для вызова вида "ВЫРАЖЕНИЕ [--degrees]", иначе None.
+
+    Такой вызов разбирается без argparse. Аргумент, начинающийся с '-',
+    оставляется argparse: это может быть опция или ошибка в ней.
+    """
+    if len(argv) == 2 and argv[1] == "--degrees":
+        expression = argv[0]
+    elif len(argv) == 2 and argv[0] == "--degrees":
+        expression = argv[1]
+    elif len(argv) == 1:
+        expression = argv[0]
+    else:
+        return None
+    if expression.startswith("-"):
+        return None
+    return expression, len(argv) == 2
+
+def build_parser():
+    import argparse
+    from calculator.batch import FORMATS
+    from calculator.client import DEFAULT_ADDRESS
+
     parser = argparse.ArgumentParser(description="CLI Calculator")
-    parser.add_argument("expression", help="Mathematical expression to evaluate, e.g., 'sin(90)'")
+    parser.add_argument("expression", nargs="?", help="Mathematical expression to evaluate, e.g., 'sin(90)'")
     parser.add_argument("--degrees", action="store_true", help="Interpret angles in degrees")
+    parser.add_argument("--exact-trig", action="store_true",
+                        help="With --degrees, reduce angles exactly: sin(180) is 0 and tg(90) is an error")
+    parser.add_argument("--precision", type=int, metavar="N",
+                        help="Evaluate with N significant digits instead of float64")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="Evaluate one expression per line from FILE (or stdin if omitted)")
+    parser.add_argument("--format", choices=FORMATS, default="plain", help="Output format for --batch")
+    parser.add_argument("--npy", metavar="OUTPUT",
+                        help="Write --batch FILE results as a float64 .npy array to OUTPUT "
+                             "(NaN for errors, error index in OUTPUT.errors.npz)")
+    parser.add_argument("--precompile", metavar="OUTPUT",
+                        help="Parse --batch input and save it as a binary expression library to OUTPUT "
+                             "(load with calculator.serialize.load)")
+    parser.add_argument("--optimize", action="store_true",
+                        help="With --precompile, fold constants for the selected angle mode")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="Evaluate --batch input in N worker processes (0 - one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=1000, metavar="SIZE",
+                        help="Expressions per work item sent to a worker process")
+    parser.add_argument("--serve", nargs="?", const=DEFAULT_ADDRESS, metavar="ADDRESS",
+                        help=f"Run an evaluation server on 'host:port' or 'unix:PATH' (default {DEFAULT_ADDRESS})")
+    parser.add_argument("--workers", type=int, default=None, metavar="N",
+                        help="Worker processes for heavy expressions in --serve mode (0 - evaluate inline)")
+    parser.add_argument("--server", metavar="ADDRESS",
+                        help="Evaluate through a running server, falling back to local evaluation if it is unreachable")
+    parser.add_argument("--profile", nargs="?", const="-", metavar="FILE",
+                        help="Write a JSON profile of parse and evaluate phases to FILE (stderr if omitted)")
+    return parser
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    fast = fast_arguments(argv)
+    if fast is not None:
+        run_expression(*fast)
+        return
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.jobs < 0 or args.chunk_size < 1:
+        parser.error("--jobs must be non-negative and --chunk-size positive")
+    if args.jobs == 0:
+        from calculator.parallel import available_cpus
+        args.jobs = available_cpus()
+    if args.batch is None and args.jobs != 1:
+        parser.error("--jobs requires --batch")
+    if args.precision is not None and (args.precision < 1 or args.batch is not None or args.server is not None):
+        parser.error("--precision must be positive and cannot be combined with --batch or --server")
+    if args.npy is not None and (args.batch in (None, '-') or args.jobs != 1):
+        parser.error("--npy requires --batch FILE and cannot be combined with --jobs")
+    if args.precompile is not None and (args.batch is None or args.npy is not None or args.jobs != 1):
+        parser.error("--precompile requires --batch and cannot be combined with --npy or --jobs")
+    if args.optimize and args.precompile is None:
+        parser.error("--optimize requires --precompile")
+    if args.exact_trig:
+        if not args.degrees or args.precision is not None:
+            parser.error("--exact-trig requires --degrees and cannot be combined with --precision")
+        from calculator.trig import EXACT
+        args.degrees = EXACT
+    if args.profile is not None and args.jobs != 1:
+        # Рабочие процессы профилировщика не видят
+        parser.error("--profile cannot be combined with --jobs")
+
+    profiler = profiling.enable() if args.profile is not None else None
+    try:
+        run(args, parser)
+    finally:
+        if profiler is not None:
+            profiling.disable()
+            write_profile(profiler, args.profile)
 
-    args = parser.parse_args()
+def run(args, parser):
+    if args.serve is not None:
+        from calculator.server import run_server
+        try:
+            run_server(args.serve, workers=args.workers)
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            exit(1)
+        return
+    if args.batch is not None:
+        if args.expression is not None:
+            parser.error("an expression cannot be combined with --batch")
+        if args.precompile is not None:
+            run_precompile_mode(args)
+        elif args.npy is not None:
+            run_bulk_mode(args)
+        else:
+            run_batch_mode(args)
+        return
+    if args.expression is None:
+        parser.error("the following arguments are required: expression")
+    run_expression(args.expression, args.degrees, args.server, args.precision)
 
+def run_expression(expression, degrees=False, server=None, precision=None):
     try:
-        expr = parse(args.expression)
-        result = evaluate(expr, degrees=args.degrees)
+        result = None
+        if server is not None:
+            result = evaluate_remote(server, expression, degrees)
+        if result is None:
+            result = evaluate(parse(expression), degrees=degrees, precision=precision)
         print(result)
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
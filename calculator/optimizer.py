@@ -0,0 +1,313 @@
+import math
+import operator
+from calculator import profiling
+from calculator.parser import UnaryOp, BinaryOp, Number, Function, Variable, Call, CONSTANTS
+from calculator.evaluator import apply_unary, apply_binary, apply_function, apply_call
+
+# Маркер в стеке обхода: следующий за ним узел готов к применению
+_APPLY = object()
+
+# Значащих цифр, до которых свёрнутый литерал сохраняет точную запись
+EXACT_DIGITS = 100
+
+# Операции, результат которых над десятичными литералами часто точен
+_EXACT_OPERATIONS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+}
+
+def _is_number(node, value):
+    return isinstance(node, Number) and node.value == value
+
+def _is_zero(node, negative):
+    # Ноль со знаком: x + (-0.0) и x - 0.0 равны x при любом x, а x + 0.0
+    # для x = -0.0 даёт 0.0
+    return _is_number(node, 0) and (math.copysign(1.0, node.value) < 0) == negative
+
+def _exact_text(operation, *operands):
+    # Точная десятичная запись результата над записями литералов, чтобы
+    # evaluate(precision=...) не терял цифры свёрнутой константы. None -
+    # у операнда нет точной записи (константа, неточная свёртка) или
+    # результат не записывается точно в EXACT_DIGITS цифр
+    import decimal
+
+    texts = [operand.text for operand in operands]
+    if any(text is None or text in CONSTANTS for text in texts):
+        return None
+    context = decimal.Context(prec=EXACT_DIGITS, traps=[decimal.Inexact, decimal.Overflow,
+                                                        decimal.InvalidOperation, decimal.DivisionByZero])
+    try:
+        with decimal.localcontext(context):
+            return str(operation(*map(decimal.Decimal, texts)))
+    except decimal.DecimalException:
+        return None
+
+def _try_fold(compute, strict, exact=None):
+    # Ошибку при свёртке по умолчанию откладываем до вычисления:
+    # поддерево остаётся как есть и выбросит её в evaluate()
+    try:
+        value = compute()
+    except (ArithmeticError, ValueError):
+        if strict:
+            raise
+        return None
+    return Number(value, exact() if exact is not None else None)
+
+def _optimize_binary(node, left, right, strict):
+    op = node.op
+    if isinstance(left, Number) and isinstance(right, Number):
+        operation = _EXACT_OPERATIONS.get(op)
+        exact = None if operation is None else lambda: _exact_text(operation, left, right)
+        folded = _try_fold(lambda: apply_binary(op, left.value, right.value), strict, exact)
+        if folded is not None:
+            return folded
+
+    # Тождества, не меняющие результат (включая знак нуля) и ошибки
+    if op == '+':
+        if _is_zero(right, True):
+            return left
+        if _is_zero(left, True):
+            return right
+    elif op == '-':
+        if _is_zero(right, False):
+            return left
+    elif op == '*':
+        if _is_number(right, 1):
+            return left
+        if _is_number(left, 1):
+            return right
+    elif op == '^':
+        if _is_number(right, 1):
+            return left
+
+    if left is node.left and right is node.right:
+        return node
+    return BinaryOp(left, op, right)
+
+def _optimize_unary(node, operand, strict):
+    if isinstance(operand, Number):
+        folded = _try_fold(lambda: apply_unary(node.op, operand.value), strict,
+                           lambda: _exact_text(operator.neg, operand))
+        if folded is not None:
+            return folded
+    # Двойное отрицание
+    if node.op == '-' and isinstance(operand, UnaryOp) and operand.op == '-':
+        return operand.operand
+    if operand is node.operand:
+        return node
+    return UnaryOp(node.op, operand)
+
+def _optimize_function(node, arg, degrees, strict):
+    if isinstance(arg, Number):
+        folded = _try_fold(lambda: apply_function(node.name, arg.value, degrees), strict)
+        if folded is not None:
+            return folded
+    if arg is node.arg:
+        return node
+    return Function(node.name, arg)
+
+def _optimize_call(node, args, strict):
+    if all(isinstance(arg, Number) for arg in args):
+        folded = _try_fold(lambda: apply_call(node.name, [arg.value for arg in args]), strict)
+        if folded is not None:
+            return folded
+    if all(map(operator.is_, args, node.args)):
+        return node
+    return Call(node.name, args)
+
+def optimize(expr, degrees=False, strict=False):
+    """Сворачивает константные поддеревья в Number и убирает тождества.
+
+    Результат функций зависит от режима углов, поэтому degrees должен
+    совпадать с тем, что будет передан в evaluate(). Свёрнутый литерал
+    хранит точную десятичную запись, если она есть (0.1 + 0.2 -> 0.3);
+    неточные свёртки (1 / 3, sin(2), pi * 2) - только значение float,
+    поэтому для evaluate(precision=...) их лучше не упрощать. Если свёртка
+    поддерева выбрасывает исключение, поддерево сохраняется и ошибка
+    возникнет при вычислении; strict=True выбрасывает её сразу.
+    """
+    if profiling.active is not None:
+        return profiling.active.optimize(_optimize, expr, degrees, strict)
+    return _optimize(expr, degrees, strict)
+
+def _optimize(expr, degrees, strict):
+    results = []
+    stack = [expr]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        node = pop()
+        if node is _APPLY:
+            node = pop()
+            if isinstance(node, BinaryOp):
+                right = results.pop()
+                results[-1] = _optimize_binary(node, results[-1], right, strict)
+            elif isinstance(node, Function):
+                results[-1] = _optimize_function(node, results[-1], degrees, strict)
+            elif isinstance(node, Call):
+                count = len(node.args)
+                args = results[-count:]
+                del results[-count:]
+                results.append(_optimize_call(node, args, strict))
+            else:
+                results[-1] = _optimize_unary(node, results[-1], strict)
+        elif isinstance(node, BinaryOp):
+            push(node)
+            push(_APPLY)
+            push(node.right)
+            push(node.left)
+        elif isinstance(node, UnaryOp):
+            push(node)
+            push(_APPLY)
+            push(node.operand)
+        elif isinstance(node, Function):
+            push(node)
+            push(_APPLY)
+            push(node.arg)
+        elif isinstance(node, Call):
+            push(node)
+            push(_APPLY)
+            stack.extend(reversed(node.args))
+        else:
+            results.append(node)
+    return results[0]
+
+def count_nodes(expr):
+    count = 0
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, BinaryOp):
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node, UnaryOp):
+            stack.append(node.operand)
+        elif isinstance(node, Function):
+            stack.append(node.arg)
+        elif isinstance(node, Call):
+            stack.extend(node.args)
+    return count
+
+def _children(node):
+    if isinstance(node, BinaryOp):
+        return (node.left, node.right)
+    if isinstance(node, UnaryOp):
+        return (node.operand,)
+    if isinstance(node, Function):
+        return (node.arg,)
+    if isinstance(node, Call):
+        return node.args
+    return ()
+
+def _leaf_key(node):
+    if isinstance(node, Number):
+        # repr различает 1 и 1.0, 0.0 и -0.0; text нужен вычислениям с повышенной точностью
+        return (Number, repr(node.value), node.text)
+    if isinstance(node, Variable):
+        return (Variable, node.name)
+    return None
+
+def share(expr):
+    """Превращает дерево в DAG: структурно одинаковые поддеревья становятся одним узлом.
+
+    Узлы неизменяемы, поэтому общий узел безопасно использовать из
+    нескольких мест. Результат вычисляется теми же функциями, что и дерево;
+    evaluate_shared() вычисляет каждый общий узел один раз. optimize()
+    разворачивает DAG обратно, поэтому его применяют до share().
+    """
+    table = {}
+    seen = {}
+    results = []
+    stack = [expr]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        node = pop()
+        if node is _APPLY:
+            node = pop()
+            if isinstance(node, BinaryOp):
+                right = results.pop()
+                left = results[-1]
+                key = (BinaryOp, node.op, id(left), id(right))
+                if key not in table:
+                    same = left is node.left and right is node.right
+                    table[key] = node if same else BinaryOp(left, node.op, right)
+            elif isinstance(node, Function):
+                arg = results[-1]
+                key = (Function, node.name, id(arg))
+                if key not in table:
+                    table[key] = node if arg is node.arg else Function(node.name, arg)
+            elif isinstance(node, Call):
+                count = len(node.args)
+                args = results[-count:]
+                # Последнее место занимает результат, как у остальных узлов
+                del results[len(results) - count + 1:]
+                key = (Call, node.name, *map(id, args))
+                if key not in table:
+                    same = all(map(operator.is_, args, node.args))
+                    table[key] = node if same else Call(node.name, args)
+            else:
+                operand = results[-1]
+                key = (UnaryOp, node.op, id(operand))
+                if key not in table:
+                    table[key] = node if operand is node.operand else UnaryOp(node.op, operand)
+            results[-1] = seen[id(node)] = table[key]
+        elif id(node) in seen:
+            results.append(seen[id(node)])
+        elif isinstance(node, BinaryOp):
+            push(node)
+            push(_APPLY)
+            push(node.right)
+            push(node.left)
+        elif isinstance(node, UnaryOp):
+            push(node)
+            push(_APPLY)
+            push(node.operand)
+        elif isinstance(node, Function):
+            push(node)
+            push(_APPLY)
+            push(node.arg)
+        elif isinstance(node, Call):
+            push(node)
+            push(_APPLY)
+            stack.extend(reversed(node.args))
+        else:
+            key = _leaf_key(node)
+            if key is None:
+                results.append(node)
+            else:
+                results.append(table.setdefault(key, node))
+    return results[0]
+
+def node_statistics(expr):
+    """Размер выражения как дерева и как DAG.
+
+    tree_nodes - число узлов после развёртывания общих поддеревьев
+    (столько обходит evaluate()), unique_nodes - число различных узлов,
+    shared_nodes - сколько из них используются больше одного раза.
+    """
+    references = {}
+    sizes = {}
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if node is _APPLY:
+            node = stack.pop()
+            sizes[id(node)] = 1 + sum(sizes[id(child)] for child in _children(node))
+            continue
+        key = id(node)
+        if key in references:
+            references[key] += 1
+            continue
+        references[key] = 1
+        stack.append(node)
+        stack.append(_APPLY)
+        stack.extend(_children(node))
+    return {
+        'tree_nodes': sizes[id(expr)],
+        'unique_nodes': len(references),
+        'shared_nodes': sum(1 for count in references.values() if count > 1),
+    }
@@ -0,0 +1,80 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from itertools import islice
+from calculator.batch import evaluate_expressions
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _chunked(items, chunk_size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def _evaluate_chunk(chunk, degrees):
+    return list(evaluate_expressions(chunk, degrees=degrees))
+
+def evaluate_parallel(items, degrees=False, jobs=None, chunk_size=1000, ordered=True):
+    """Вычисляет пары (номер строки, выражение) в пуле процессов.
+
+    Результаты те же, что у batch.evaluate_expressions: ошибка в одном
+    выражении не влияет на остальные. Вход читается порциями по chunk_size,
+    и в работе одновременно не больше двух порций на процесс, поэтому
+    память ограничена. При ordered=False результаты отдаются по мере
+    готовности порций. Неверные параметры отвергаются сразу при вызове.
+    """
+    if jobs is None:
+        jobs = available_cpus()
+    if jobs < 1:
+        raise ValueError("Number of jobs must be positive")
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be positive")
+    if jobs == 1:
+        return evaluate_expressions(items, degrees=degrees)
+    return _evaluate_parallel(_chunked(items, chunk_size), degrees, jobs, ordered)
+
+def _evaluate_parallel(chunks, degrees, jobs, ordered):
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for results in map_chunks(executor, partial(_evaluate_chunk, degrees=degrees), chunks, jobs * 2, ordered):
+            yield from results
+
+def map_chunks(executor, function, chunks, max_in_flight, ordered=True):
+    """Результаты function(chunk) для порций, вычисленных в executor.
+
+    Одновременно отправлено не больше max_in_flight порций, поэтому
+    порции можно читать из генератора без ограничения длины. При
+    ordered=False результаты отдаются по мере готовности.
+    """
+    def submit_next():
+        chunk = next(chunks, None)
+        if chunk is None:
+            return None
+        return executor.submit(function, chunk)
+
+    chunks = iter(chunks)
+    if ordered:
+        pending = deque()
+        while len(pending) < max_in_flight and (future := submit_next()) is not None:
+            pending.append(future)
+        while pending:
+            yield pending.popleft().result()
+            if (future := submit_next()) is not None:
+                pending.append(future)
+    else:
+        pending = set()
+        while len(pending) < max_in_flight and (future := submit_next()) is not None:
+            pending.add(future)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for finished in done:
+                yield finished.result()
+                if (future := submit_next()) is not None:
+                    pending.add(future)
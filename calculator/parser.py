@@ -1,27 +1,63 @@
-import re
+import sys
+from calculator import profiling
 
 class Expression:
-    pass
+    # Узлы неизменяемы: готовое дерево можно кэшировать и разделять между потоками.
+    # __slots__ вместо __dict__ экономит память на больших деревьях.
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+_set = object.__setattr__
 
 class Number(Expression):
-    def __init__(self, value: float):
-        self.value = value
+    # text - исходная запись литерала или имя константы, если известна;
+    # нужна вычислениям с повышенной точностью, которым мало float
+    __slots__ = ('value', 'text')
+
+    def __init__(self, value: float, text: str = None):
+        _set(self, 'value', value)
+        _set(self, 'text', text)
 
 class BinaryOp(Expression):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left: Expression, op: str, right: Expression):
-        self.left = left
-        self.op = op
-        self.right = right
+        _set(self, 'left', left)
+        _set(self, 'op', op)
+        _set(self, 'right', right)
 
 class UnaryOp(Expression):
+    __slots__ = ('op', 'operand')
+
     def __init__(self, op: str, operand: Expression):
-        self.op = op
-        self.operand = operand
+        _set(self, 'op', op)
+        _set(self, 'operand', operand)
 
 class Function(Expression):
+    __slots__ = ('name', 'arg')
+
     def __init__(self, name: str, arg: Expression):
-        self.name = name
-        self.arg = arg
+        _set(self, 'name', sys.intern(name))
+        _set(self, 'arg', arg)
+
+class Call(Expression):
+    # Вызов функции нескольких аргументов; args - кортеж деревьев
+    __slots__ = ('name', 'args')
+
+    def __init__(self, name: str, args):
+        _set(self, 'name', sys.intern(name))
+        _set(self, 'args', tuple(args))
+
+class Variable(Expression):
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        _set(self, 'name', sys.intern(name))
 
 CONSTANTS = {
     'pi': 3.141592653589793,
@@ -30,106 +66,288 @@ CONSTANTS = {
 
 FUNCTIONS = {'sqrt', 'sin', 'cos', 'tg', 'ctg', 'ln', 'exp', 'arctg'}
 
-def tokenize(expression: str):
-    token_pattern = re.compile(r'\d+\.\d+(e[+-]?\d+)?|\d+(e[+-]?\d+)?|[+\-*/^()]|[a-zA-Z_][a-zA-Z_0-9]*')
-    pos = 0
-    tokens = []
+# Встроенные функции нескольких аргументов: имя -> число аргументов (None - любое)
+CALL_FUNCTIONS = {'hypot': None, 'pow': 2, 'min': None, 'max': None}
+
+PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '^': 3}
+
+# Группы: 1 - число, 2 - оператор, 3 - скобка или запятая, 4 - имя, 5 - недопустимый символ
+_TOKEN_PATTERN = (
+    r'(?s)(\d+\.\d+(?:e[+-]?\d+)?|\d+(?:e[+-]?\d+)?)'
+    r'|([+\-*/^])'
+    r'|([(),])'
+    r'|([a-zA-Z_][a-zA-Z_0-9]*)'
+    r'|(.)'
+)
+_SPACED_NUMBERS_PATTERN = r'\d+ \d+'
+# Имена поглощают цифры (x12), поэтому литералом считается только число вне имени
+_LITERAL_PATTERN = r'[a-zA-Z_][a-zA-Z_0-9]*|(\d+\.\d+(?:e[+-]?\d+)?|\d+(?:e[+-]?\d+)?)'
+# Обозначение места литерала в форме выражения
+SLOT = '#'
+# Те же лексемы для байтовых буферов (bytes, mmap, memoryview)
+_TOKEN_BYTES_PATTERN = _TOKEN_PATTERN.encode()
+
+# Скомпилированные выражения. Модуль re и компиляция заметны при запуске
+# CLI, поэтому выражения компилируются при первом разборе, а не при импорте
+_TOKEN_RE = _SPACED_NUMBERS_RE = _LITERAL_RE = _TOKEN_BYTES_RE = None
+
+def _compile_patterns():
+    global _TOKEN_RE, _SPACED_NUMBERS_RE, _LITERAL_RE, _TOKEN_BYTES_RE
+    import re
+    _SPACED_NUMBERS_RE = re.compile(_SPACED_NUMBERS_PATTERN)
+    _LITERAL_RE = re.compile(_LITERAL_PATTERN)
+    _TOKEN_BYTES_RE = re.compile(_TOKEN_BYTES_PATTERN)
+    _TOKEN_RE = re.compile(_TOKEN_PATTERN)
+
+_OPERATOR_GROUP = 2
+_INVALID_GROUP = 5
+
+# Виды открытых скобок в стеке парсера
+_GROUP = 0
+_FUNCTION = 1
+_NEGATION = 2
+_CALL = 3
+
+_MISSING_CLOSE = {
+    _GROUP: "Missing closing parenthesis",
+    _FUNCTION: "Missing closing parenthesis after function argument",
+    _NEGATION: "Missing closing parenthesis after unary minus",
+    _CALL: "Missing closing parenthesis after function arguments",
+}
+
+def normalize_expression(expression: str):
+    # Пробелы между лексемами незначимы, кроме пробела между числами:
+    # такое выражение некорректно, для него нормальной формы нет
+    if _TOKEN_RE is None:
+        _compile_patterns()
+    if _SPACED_NUMBERS_RE.search(expression):
+        return None
+    return expression.replace(" ", "")
+
+def canonicalize(expression: str):
+    """Форма выражения и его литералы: '3.2*sin(0.5)+1' -> ('#*sin(#)+#', [3.2, 0.5, 1.0]).
 
-    matches = re.findall(r'\d+ \d+', expression)
-    if matches:
+    Выражения одной формы разбираются одинаково и отличаются только
+    значениями литералов. Возвращает None, если форму построить нельзя
+    (такое выражение в любом случае некорректно): пробел между числами,
+    символ SLOT или точка вне числа.
+    """
+    text = normalize_expression(expression)
+    if text is None or SLOT in text:
+        return None
+    literals = []
+    pieces = []
+    position = 0
+    for match in _LITERAL_RE.finditer(text):
+        literal = match.group(1)
+        if literal is not None:
+            pieces.append(text[position:match.start()])
+            pieces.append(SLOT)
+            literals.append(float(literal))
+            position = match.end()
+    pieces.append(text[position:])
+    shape = "".join(pieces)
+    # Точка вне числа недопустима, а рядом со SLOT склеила бы подставленные литералы
+    if '.' in shape:
+        return None
+    return shape, literals
+
+def tokenize(expression: str):
+    if _TOKEN_RE is None:
+        _compile_patterns()
+    if _SPACED_NUMBERS_RE.search(expression):
         raise ValueError("Unexpected expression: there should be no spaces between the numbers.")
 
     expression = expression.replace(" ", "")
-    while pos < len(expression):
-        match = token_pattern.match(expression, pos)
-        if match:
-            tokens.append(match.group())
-            pos = match.end()
+    tokens = []
+    append = tokens.append
+    prev_is_operator = False
+    # Один проход: разбиение на лексемы и проверка двух операторов подряд
+    for match in _TOKEN_RE.finditer(expression):
+        kind = match.lastindex
+        token = match.group()
+        if kind == _OPERATOR_GROUP:
+            if prev_is_operator:
+                raise ValueError(f"Two operators in a row: '{tokens[-1]}{token}'")
+            prev_is_operator = True
+        elif kind == _INVALID_GROUP:
+            raise ValueError(f"Unexpected character: {token}")
         else:
-            raise ValueError(f"Unexpected character: {expression[pos]}")
-    for i in range(1, len(tokens)):
-        if tokens[i] in '+-*/^' and tokens[i-1] in '+-*/^':
-            raise ValueError(f"Two operators in a row: '{tokens[i-1]}{tokens[i]}'")
+            prev_is_operator = False
+        append(token)
 
     return tokens
 
-def parse(expression: str) -> Expression:
-    tokens = tokenize(expression)
-    if not tokens:
-        raise ValueError("Empty or invalid expression")
+def tokenize_buffer(buffer, start=0, end=None):
+    """tokenize() для байтов buffer[start:end] в UTF-8 без копирования строки.
 
-    def parse_expr(tokens):
-        precedence = {'+': 1, '-': 1, '*': 2, '/': 2, '^': 3}
-
-        def parse_term():
-            if not tokens:
-                raise ValueError("Unexpected end of expression")
-            token = tokens.pop(0)
-            
-            if token in FUNCTIONS:
-                if not tokens or tokens.pop(0) != '(':
-                    raise ValueError("Expected '(' after function name")
-                arg = parse_expr(tokens)
-                if not tokens or tokens.pop(0) != ')':
-                    raise ValueError("Missing closing parenthesis after function argument")
-                return Function(token, arg)
-
-            elif token in CONSTANTS:
-                return Number(CONSTANTS[token])
-            if token == '-':
-                if not tokens:
-                    raise ValueError("Invalid syntax after unary minus")
-                if tokens[0] == '(':
-                    tokens.pop(0)
-                    expr = parse_expr(tokens)
-                    if not tokens or tokens.pop(0) != ')':
-                        raise ValueError("Missing closing parenthesis after unary minus")
-                    return UnaryOp('-', expr)
-                elif re.match(r'\d+(\.\d+)?(e[+-]?\d+)?', tokens[0]):
-                    return UnaryOp('-', Number(float(tokens.pop(0))))
-                else:
-                    raise ValueError("Invalid token after unary minus")
-
-            if token == '(':
-                if tokens and tokens[0] in '+*/^':
-                    raise ValueError(f"Unexpected operator '{tokens[0]}' after '(' — expected number or unary minus in parentheses")
-                expr = parse_expr(tokens)
-                if not tokens or tokens.pop(0) != ')':
-                    raise ValueError("Missing closing parenthesis")
-                return expr
+    Лексемы берутся регулярным выражением прямо из буфера. Пробел, символ
+    вне ASCII или ошибка передают строку целиком в tokenize(): удаление
+    пробелов может склеить лексемы, а сообщения об ошибках должны совпадать.
+    """
+    if end is None:
+        end = len(buffer)
+    if _TOKEN_RE is None:
+        _compile_patterns()
+    tokens = []
+    append = tokens.append
+    prev_is_operator = False
+    for match in _TOKEN_BYTES_RE.finditer(buffer, start, end):
+        kind = match.lastindex
+        if kind == _INVALID_GROUP:
+            break
+        if kind == _OPERATOR_GROUP:
+            if prev_is_operator:
+                break
+            prev_is_operator = True
+        else:
+            prev_is_operator = False
+        append(match.group().decode('ascii'))
+    else:
+        return tokens
+    return tokenize(str(memoryview(buffer)[start:end], 'utf-8'))
 
+def _reduce(operands, operators, min_prec):
+    # Все операторы левоассоциативны: сворачиваем, пока приоритет не ниже min_prec
+    while operators and PRECEDENCE[operators[-1]] >= min_prec:
+        op = operators.pop()
+        right = operands.pop()
+        operands[-1] = BinaryOp(operands[-1], op, right)
 
-            if re.match(r'\d+(\.\d+)?(e[+-]?\d+)?', token):
-                return Number(float(token))
+def _call(name, args, functions):
+    # Встроенная функция остаётся узлом Call, пользовательская подставляется
+    if name in CALL_FUNCTIONS:
+        arity = CALL_FUNCTIONS[name]
+        if arity is not None and len(args) != arity:
+            raise ValueError(f"Function {name} takes {arity} arguments, got {len(args)}")
+        return Call(name, args)
+    return functions.inline(name, args)
 
-            raise ValueError(f"Unexpected token: {token}")
+def parse(expression: str, functions=None) -> Expression:
+    """Разбирает выражение в дерево.
+
+    functions - реестр пользовательских функций (functions.FunctionRegistry):
+    их вызовы подставляются в дерево при разборе.
+    """
+    if profiling.active is not None:
+        if functions is None:
+            return profiling.active.parse(expression, tokenize, parse_tokens)
+        return profiling.active.parse(expression, tokenize, lambda tokens: parse_tokens(tokens, functions))
+    return parse_tokens(tokenize(expression), functions)
+
+def parse_tokens(tokens, functions=None) -> Expression:
+    if not tokens:
+        raise ValueError("Empty or invalid expression")
 
-        def parse_binop_rhs(lhs, min_prec):
-            while tokens and tokens[0] in precedence:
-                op = tokens[0]
-                prec = precedence[op]
-                if prec < min_prec:
-                    break
-                tokens.pop(0)
-                rhs = parse_term()
-                next_min_prec = prec + 1 if op == '^' else prec
-                while tokens and tokens[0] in precedence and precedence[tokens[0]] > next_min_prec:
-                    rhs = parse_binop_rhs(rhs, precedence[tokens[0]])
+    n = len(tokens)
+    pos = 0
+    # Каждый уровень скобок: (вид, имя функции, операнды, операторы).
+    # Явный стек вместо рекурсии, поэтому глубина вложенности не ограничена.
+    operands = []
+    operators = []
+    groups = []
+    # Узлы неизменяемы, поэтому одинаковые литералы разделяют один Number
+    literals = {}
 
-                lhs = BinaryOp(lhs, op, rhs)
-            return lhs
+    def literal(text):
+        node = literals.get(text)
+        if node is None:
+            node = literals[text] = Number(float(text), text)
+        return node
 
-        lhs = parse_term()
+    while True:
+        # Разбор терма
+        if pos >= n:
+            raise ValueError("Unexpected end of expression")
+        token = tokens[pos]
+        pos += 1
+        term = None
 
-        if tokens and re.match(r'\d+(\.\d+)?(e[+-]?\d+)?', tokens[0]):
-            raise ValueError(f"Missing operator before: {tokens[0]}")
-        
-        expr = parse_binop_rhs(lhs, 0)
-        return expr
+        if token in FUNCTIONS:
+            if pos >= n or tokens[pos] != '(':
+                raise ValueError("Expected '(' after function name")
+            pos += 1
+            groups.append((_FUNCTION, token, operands, operators))
+            operands, operators = [], []
+            continue
+        elif token in CALL_FUNCTIONS or functions is not None and token in functions:
+            if pos >= n or tokens[pos] != '(':
+                raise ValueError("Expected '(' after function name")
+            pos += 1
+            # Вместо имени - имя и список уже разобранных аргументов
+            groups.append((_CALL, (token, []), operands, operators))
+            operands, operators = [], []
+            continue
+        elif token in CONSTANTS:
+            term = literals.get(token)
+            if term is None:
+                term = literals[token] = Number(CONSTANTS[token], token)
+        elif token == '-':
+            if pos >= n:
+                raise ValueError("Invalid syntax after unary minus")
+            following = tokens[pos]
+            if following == '(':
+                pos += 1
+                groups.append((_NEGATION, None, operands, operators))
+                operands, operators = [], []
+                continue
+            elif following[0].isdigit():
+                pos += 1
+                term = UnaryOp('-', literal(following))
+            else:
+                raise ValueError("Invalid token after unary minus")
+        elif token == '(':
+            if pos < n and tokens[pos] in '+*/^':
+                raise ValueError(f"Unexpected operator '{tokens[pos]}' after '(' — expected number or unary minus in parentheses")
+            groups.append((_GROUP, None, operands, operators))
+            operands, operators = [], []
+            continue
+        elif token[0].isdigit():
+            term = literal(token)
+        elif token[0].isalpha() or token[0] == '_':
+            # Свободная переменная: любое имя, кроме функций и констант
+            term = Variable(token)
+        else:
+            raise ValueError(f"Unexpected token: {token}")
 
-    expr = parse_expr(tokens)
+        while True:
+            # Первый терм выражения не может сразу продолжаться числом
+            if not operands and pos < n and tokens[pos][0].isdigit():
+                raise ValueError(f"Missing operator before: {tokens[pos]}")
+            operands.append(term)
 
-    if tokens:
-        raise ValueError(f"Unexpected tokens remaining: {tokens}")
+            if pos < n and tokens[pos] in PRECEDENCE:
+                op = tokens[pos]
+                pos += 1
+                _reduce(operands, operators, PRECEDENCE[op])
+                operators.append(op)
+                break
+
+            # Конец текущего выражения
+            _reduce(operands, operators, 0)
+            expr = operands[0]
+            if not groups:
+                if pos < n:
+                    raise ValueError(f"Unexpected tokens remaining: {tokens[pos:]}")
+                return expr
 
-    return expr
+            kind, name, operands, operators = groups.pop()
+            if kind == _CALL and pos < n and tokens[pos] == ',':
+                # Следующий аргумент разбирается в том же уровне скобок
+                name[1].append(expr)
+                pos += 1
+                groups.append((kind, name, operands, operators))
+                operands, operators = [], []
+                break
+            if pos >= n or tokens[pos] != ')':
+                raise ValueError(_MISSING_CLOSE[kind])
+            pos += 1
+            if kind == _FUNCTION:
+                term = Function(name, expr)
+            elif kind == _CALL:
+                name[1].append(expr)
+                term = _call(name[0], name[1], functions)
+            elif kind == _NEGATION:
+                term = UnaryOp('-', expr)
+            else:
+                term = expr
@@ -0,0 +1,266 @@
+import decimal
+from decimal import Decimal
+from functools import lru_cache
+from calculator.parser import UnaryOp, BinaryOp, Number, Function, Variable, Call, CONSTANTS
+
+# Запасные знаки для промежуточных вычислений
+GUARD_DIGITS = 10
+
+# Наибольший десятичный порядок аргумента sin, cos, tg и ctg: сведение
+# аргумента требует pi с лишними знаками по числу цифр целой части
+MAX_ARGUMENT_EXPONENT = 1000
+
+def _context(digits):
+    return decimal.Context(
+        prec=digits,
+        Emax=decimal.MAX_EMAX,
+        Emin=decimal.MIN_EMIN,
+        traps=[decimal.InvalidOperation, decimal.DivisionByZero, decimal.Overflow],
+    )
+
+def _atan_inverse(n, scale):
+    # atan(1/n) * scale в целых числах с фиксированной точкой
+    power = scale // n
+    total = power
+    n_squared = n * n
+    k = 3
+    sign = -1
+    while power:
+        power //= n_squared
+        total += sign * (power // k)
+        sign = -sign
+        k += 2
+    return total
+
+@lru_cache(maxsize=32)
+def pi(digits):
+    # Формула Мэчина: pi = 16 atan(1/5) - 4 atan(1/239)
+    extra = digits + GUARD_DIGITS
+    scale = 10 ** extra
+    value = 16 * _atan_inverse(5, scale) - 4 * _atan_inverse(239, scale)
+    return Decimal(value).scaleb(-extra, _context(digits))
+
+@lru_cache(maxsize=32)
+def e(digits):
+    return _context(digits).exp(Decimal(1))
+
+def to_decimal(value):
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        # Кратчайшая запись float - то, что имел в виду пользователь
+        return Decimal(repr(value))
+    return Decimal(value)
+
+def _literal(node, digits):
+    if node.text in CONSTANTS:
+        return pi(digits) if node.text == 'pi' else e(digits)
+    if node.text is not None:
+        return Decimal(node.text)
+    return to_decimal(node.value)
+
+def _sin_cos_series(x):
+    ctx = decimal.getcontext()
+    epsilon = Decimal(1).scaleb(-ctx.prec - 2)
+    x_squared = x * x
+    sin_term = sin_sum = x
+    cos_term = cos_sum = Decimal(1)
+    n = 1
+    while abs(sin_term) > epsilon or abs(cos_term) > epsilon:
+        cos_term = -cos_term * x_squared / ((n + 1) * n)
+        cos_sum += cos_term
+        sin_term = -sin_term * x_squared / ((n + 2) * (n + 1))
+        sin_sum += sin_term
+        n += 2
+    return sin_sum, cos_sum
+
+def sin_cos(x):
+    """sin(x) и cos(x) в текущем контексте decimal."""
+    ctx = decimal.getcontext()
+    digits = ctx.prec
+    if x.is_finite() and x.adjusted() > MAX_ARGUMENT_EXPONENT:
+        raise ValueError(f"Trigonometric argument is too large (over 1e{MAX_ARGUMENT_EXPONENT})")
+    # Для большого аргумента нужны дополнительные знаки pi
+    extra = max(0, x.adjusted()) + GUARD_DIGITS
+    with decimal.localcontext(_context(digits + extra)):
+        half_pi = pi(digits + extra) / 2
+        quadrant = (x / half_pi).to_integral_value(decimal.ROUND_HALF_EVEN)
+        reduced = x - quadrant * half_pi
+        sin, cos = _sin_cos_series(reduced)
+    match int(quadrant) % 4:
+        case 0:
+            result = sin, cos
+        case 1:
+            result = cos, -sin
+        case 2:
+            result = -sin, -cos
+        case 3:
+            result = -cos, sin
+    return +result[0], +result[1]
+
+def atan(x):
+    ctx = decimal.getcontext()
+    digits = ctx.prec
+    with decimal.localcontext(_context(digits + GUARD_DIGITS)):
+        if abs(x) > 1:
+            result = pi(digits + GUARD_DIGITS) / 2 - atan(1 / abs(x))
+            return +(result if x > 0 else -result)
+        # atan(x) = 2 atan(x / (1 + sqrt(1 + x^2))) сокращает аргумент
+        halvings = 8
+        for _ in range(halvings):
+            x = x / (1 + (1 + x * x).sqrt())
+        epsilon = Decimal(1).scaleb(-digits - GUARD_DIGITS)
+        x_squared = x * x
+        power = total = x
+        k = 1
+        while abs(power) > epsilon * k:
+            power = -power * x_squared
+            k += 2
+            total += power / k
+        total *= 2 ** halvings
+    return +total
+
+def _divide(left, right):
+    if right == 0:
+        raise ZeroDivisionError("Division by zero")
+    return left / right
+
+def _power(left, right):
+    if left < 0 and right != right.to_integral_value():
+        raise ValueError("A negative number cannot be raised to a non-integer power")
+    if left == 0:
+        if right < 0:
+            raise ZeroDivisionError("0.0 cannot be raised to a negative power")
+        if right == 0:
+            return Decimal(1)
+    return left ** right
+
+def _sqrt(x):
+    if x < 0:
+        raise ValueError("math domain error")
+    return x.sqrt()
+
+def _ln(x):
+    if x <= 0:
+        raise ValueError("math domain error")
+    return x.ln()
+
+def _tan(x):
+    sin, cos = sin_cos(x)
+    return _divide(sin, cos)
+
+def _ctg(x):
+    sin, cos = sin_cos(x)
+    return _divide(cos, sin)
+
+BINARY_OPERATORS = {
+    '+': lambda left, right: left + right,
+    '-': lambda left, right: left - right,
+    '*': lambda left, right: left * right,
+    '/': _divide,
+    '^': _power,
+}
+
+FUNCTIONS = {
+    'sqrt': _sqrt,
+    'sin': lambda x: sin_cos(x)[0],
+    'cos': lambda x: sin_cos(x)[1],
+    'tg': _tan,
+    'ctg': _ctg,
+    'ln': _ln,
+    'exp': lambda x: x.exp(),
+    'arctg': atan,
+}
+
+CALL_FUNCTIONS = {
+    'hypot': lambda *args: _sqrt(sum(x * x for x in args)),
+    'pow': _power,
+    'min': lambda *args: min(args),
+    'max': lambda *args: max(args),
+}
+
+_TRIGONOMETRIC = {'sin', 'cos', 'tg', 'ctg'}
+
+def _apply_function(name, arg, degrees, digits):
+    if name not in FUNCTIONS:
+        raise ValueError(f"Unsupported function: {name}")
+    if degrees and name in _TRIGONOMETRIC:
+        arg = arg * pi(digits) / 180
+    result = FUNCTIONS[name](arg)
+    if degrees and name == 'arctg':
+        result = result * 180 / pi(digits)
+    return result
+
+# Маркер в стеке обхода: следующий за ним узел готов к применению
+_APPLY = object()
+
+def evaluate_precise(expr, precision=50, degrees=False, variables=None):
+    """Вычисляет выражение в Decimal с precision значащими цифрами.
+
+    Литералы берутся из исходной записи без потерь через float, константы
+    pi и e вычисляются с нужной точностью. Ошибки области определения и
+    деления на ноль те же, что у evaluate(), но диапазон не ограничен
+    float: 10^400 или exp(1000) - обычные числа, а не OverflowError.
+    OverflowError возникает только за пределами порядков Decimal.
+    Аргумент тригонометрических функций с порядком больше MAX_ARGUMENT_EXPONENT
+    отвергается (ValueError): его сведение стоило бы неограниченно дорого.
+    """
+    if precision < 1:
+        raise ValueError("Precision must be positive")
+    digits = precision + GUARD_DIGITS
+    values = []
+    stack = [expr]
+    push = stack.append
+    pop = stack.pop
+    try:
+        with decimal.localcontext(_context(digits)):
+            while stack:
+                node = pop()
+                if node is _APPLY:
+                    node = pop()
+                    if isinstance(node, BinaryOp):
+                        right = values.pop()
+                        values[-1] = BINARY_OPERATORS[node.op](values[-1], right)
+                    elif isinstance(node, Function):
+                        values[-1] = _apply_function(node.name, values[-1], degrees, digits)
+                    elif isinstance(node, Call):
+                        count = len(node.args)
+                        result = CALL_FUNCTIONS[node.name](*values[-count:])
+                        del values[-count:]
+                        values.append(result)
+                    else:
+                        values[-1] = -values[-1]
+                elif isinstance(node, Number):
+                    values.append(_literal(node, digits))
+                elif isinstance(node, Variable):
+                    if not variables or node.name not in variables:
+                        raise ValueError(f"Unknown variable: {node.name}")
+                    values.append(to_decimal(variables[node.name]))
+                elif isinstance(node, BinaryOp):
+                    if node.op not in BINARY_OPERATORS:
+                        raise ValueError(f"Unknown operator: {node.op}")
+                    push(node)
+                    push(_APPLY)
+                    push(node.right)
+                    push(node.left)
+                elif isinstance(node, UnaryOp):
+                    if node.op != '-':
+                        raise ValueError(f"Unknown unary operator: {node.op}")
+                    push(node)
+                    push(_APPLY)
+                    push(node.operand)
+                elif isinstance(node, Function):
+                    push(node)
+                    push(_APPLY)
+                    push(node.arg)
+                elif isinstance(node, Call):
+                    if node.name not in CALL_FUNCTIONS:
+                        raise ValueError(f"Unsupported function: {node.name}")
+                    push(node)
+                    push(_APPLY)
+                    stack.extend(reversed(node.args))
+                else:
+                    raise TypeError("Invalid expression type")
+    except decimal.Overflow:
+        raise OverflowError("Result is infinite") from None
+    return _context(precision).plus(values[0])
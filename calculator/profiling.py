@@ -0,0 +1,182 @@
+import time
+
+# json, threading и collections импортируются при первом использовании:
+# parser и evaluator импортируют этот модуль при каждом запуске CLI
+
+# Включённый профилировщик; parse(), optimize() и evaluate() проверяют его
+# один раз за вызов, поэтому выключенное профилирование почти ничего не стоит
+active = None
+
+PHASES = ('tokenize', 'parse', 'optimize', 'evaluate')
+
+# Сколько последних деревьев помнить вместе с исходным текстом и статистикой
+_SOURCES_SIZE = 1024
+
+def _bucket(n):
+    # Корзины гистограммы - степени двойки: 1, 2, 4, 8, ...
+    return 1 << (n - 1).bit_length()
+
+def tree_statistics(expr):
+    """Размер, глубина и число операций каждого вида в дереве."""
+    from collections import Counter
+    from calculator.parser import BinaryOp, UnaryOp, Function, Call
+
+    calls = Counter()
+    size = depth = 0
+    stack = [(expr, 1)]
+    while stack:
+        node, level = stack.pop()
+        size += 1
+        if level > depth:
+            depth = level
+        if isinstance(node, BinaryOp):
+            calls[node.op] += 1
+            stack.append((node.left, level + 1))
+            stack.append((node.right, level + 1))
+        elif isinstance(node, UnaryOp):
+            calls['unary ' + node.op] += 1
+            stack.append((node.operand, level + 1))
+        elif isinstance(node, Function):
+            calls[node.name] += 1
+            stack.append((node.arg, level + 1))
+        elif isinstance(node, Call):
+            calls[node.name] += 1
+            stack.extend((arg, level + 1) for arg in node.args)
+    return size, depth, calls
+
+class Profiler:
+    """Счётчики и таймеры фаз разбора и вычисления.
+
+    Включается через enable() или как контекстный менеджер. Собирает время
+    фаз (tokenize, parse, optimize, evaluate), число вызовов операторов и
+    функций при вычислении, гистограммы размера и глубины разобранных
+    деревьев и журнал выражений, фаза которых заняла больше slow_threshold
+    секунд. snapshot() возвращает всё это словарём для JSON.
+    """
+
+    def __init__(self, slow_threshold=0.01, slow_log_size=100):
+        import threading
+        self.slow_threshold = slow_threshold
+        self._lock = threading.Lock()
+        self._slow_log_size = slow_log_size
+        self._previous = None
+        self.reset()
+
+    def reset(self):
+        from collections import Counter, OrderedDict, deque
+        with self._lock:
+            self.phases = {phase: {'calls': 0, 'errors': 0, 'total': 0.0, 'max': 0.0} for phase in PHASES}
+            self.calls = Counter()
+            self.size_histogram = Counter()
+            self.depth_histogram = Counter()
+            self.slow = deque(maxlen=self._slow_log_size)
+            self._sources = OrderedDict()
+
+    def _record(self, phase, elapsed, failed, expression):
+        stats = self.phases[phase]
+        stats['calls'] += 1
+        stats['errors'] += failed
+        stats['total'] += elapsed
+        if elapsed > stats['max']:
+            stats['max'] = elapsed
+        if elapsed >= self.slow_threshold:
+            self.slow.append({'phase': phase, 'seconds': elapsed, 'expression': expression})
+
+    def _remember(self, expr, text):
+        # Дерево хранится вместе с id, чтобы id не достался другому объекту
+        entry = self._sources.get(id(expr))
+        if entry is None:
+            size, depth, calls = tree_statistics(expr)
+            entry = self._sources[id(expr)] = (expr, text, size, depth, calls)
+            if len(self._sources) > _SOURCES_SIZE:
+                self._sources.popitem(last=False)
+        else:
+            self._sources.move_to_end(id(expr))
+        return entry
+
+    def parse(self, expression, tokenize, parse_tokens):
+        start = time.perf_counter()
+        failed = True
+        try:
+            tokens = tokenize(expression)
+            failed = False
+        finally:
+            middle = time.perf_counter()
+            with self._lock:
+                self._record('tokenize', middle - start, failed, expression)
+        failed = True
+        try:
+            expr = parse_tokens(tokens)
+            failed = False
+        finally:
+            elapsed = time.perf_counter() - middle
+            with self._lock:
+                self._record('parse', elapsed, failed, expression)
+        with self._lock:
+            _, _, size, depth, _ = self._remember(expr, expression)
+            self.size_histogram[_bucket(size)] += 1
+            self.depth_histogram[_bucket(depth)] += 1
+        return expr
+
+    def optimize(self, optimize, expr, degrees, strict):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = optimize(expr, degrees, strict)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                text = self._remember(expr, None)[1]
+                self._record('optimize', elapsed, failed, text)
+
+    def evaluate(self, evaluate, expr, degrees, variables, precision):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = evaluate(expr, degrees, variables, precision)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                _, text, _, _, calls = self._remember(expr, None)
+                self._record('evaluate', elapsed, failed, text)
+                if not failed:
+                    self.calls.update(calls)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'phases': {phase: dict(stats) for phase, stats in self.phases.items()},
+                'calls': dict(self.calls.most_common()),
+                'size_histogram': {str(k): v for k, v in sorted(self.size_histogram.items())},
+                'depth_histogram': {str(k): v for k, v in sorted(self.depth_histogram.items())},
+                'slow_threshold': self.slow_threshold,
+                'slow': list(self.slow),
+            }
+
+    def to_json(self, indent=None):
+        import json
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def __enter__(self):
+        self._previous = active
+        enable(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        global active
+        active = self._previous
+        self._previous = None
+
+def enable(profiler=None):
+    """Включает профилировщик (новый, если не передан) и возвращает его."""
+    global active
+    active = profiler if profiler is not None else Profiler()
+    return active
+
+def disable():
+    global active
+    active = None
@@ -0,0 +1,406 @@
+import gc
+import struct
+import zlib
+from decimal import Decimal, InvalidOperation
+from calculator.trig import EXACT
+from calculator.parser import UnaryOp, BinaryOp, Number, Function, Variable, Call, FUNCTIONS, parse
+
+# Двоичный формат библиотеки выражений (числа little-endian):
+#
+#   заголовок   MAGIC, версия (u16), режим углов (u16), длина и CRC32 данных (u32)
+#   строки      varint число, затем varint длина + UTF-8 (имена, записи литералов)
+#   литералы    varint число, затем значения float64 подряд
+#   узлы        varint длина потока, затем узлы в обратном порядке обхода:
+#               байт операции, её varint-аргументы и ссылки на детей
+#   корни       varint число выражений, на выражение varint номер узла + 1 (0 - нет)
+#
+# Ссылка на ребёнка - varint n - i, где n - число уже прочитанных узлов, i -
+# номер ребёнка; ребёнок обычно записан прямо перед родителем, и ссылка
+# занимает один байт. Одинаковые поддеревья (в том числе из разных выражений)
+# записываются один раз и при загрузке остаются одним объектом.
+MAGIC = b'CALX'
+VERSION = 1
+_HEADER = struct.Struct('<4sHHII')
+
+# Режимы углов, для которых выражения упрощены optimize(); None - дерево
+# не зависит от режима (результат parse)
+ANGLE_MODES = (None, False, True, EXACT)
+
+# Коды операций
+_BINARY_OPS = ('+', '-', '*', '/', '^')
+_BINARY_CODES = {op: code for code, op in enumerate(_BINARY_OPS)}
+_NEGATE = 5
+_NUMBER = 6          # следующий литерал, без записи
+_NUMBER_TEXT = 7     # следующий литерал, varint номер записи
+_VARIABLE = 8        # varint номер имени
+_CALL = 9            # varint номер имени, число аргументов, ссылки
+_FUNCTION = 10       # varint номер имени, ссылка
+# Встроенные функции одного аргумента - своим кодом, без имени
+_FUNCTION_NAMES = tuple(sorted(FUNCTIONS))
+_FUNCTION_BASE = 16
+_FUNCTION_CODES = {name: _FUNCTION_BASE + code for code, name in enumerate(_FUNCTION_NAMES)}
+
+# Дальше этого лист записывается заново, а не ссылкой: ссылка длиннее
+# двух байт читается медленнее, чем создаётся новый лист. Поддеревья
+# с таким листом всё равно остаются общими: ключ узла - постоянные номера
+# детей, а не их места в потоке
+_NEAR = 1 << 14
+
+def _write_varint(out, value):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def _needs_text(node):
+    # Запись литерала нужна evaluate(precision=...), только если она точнее
+    # кратчайшей записи float (длинные литералы) или это имя константы
+    text = node.text
+    if text is None or text == repr(node.value) or text.isdigit() and len(text) < 16:
+        return False
+    try:
+        return Decimal(node.text) != Decimal(repr(float(node.value)))
+    except InvalidOperation:
+        return True
+
+class _Encoder:
+    __slots__ = ('strings', 'string_index', 'values', 'table', 'latest', 'seen', 'kept', 'count', 'stream')
+
+    def __init__(self):
+        self.strings = []
+        self.string_index = {}
+        self.values = []
+        # Структура узла (дети - их постоянные номера) -> постоянный номер;
+        # постоянный номер -> номер последней записанной копии в потоке
+        self.table = {}
+        self.latest = []
+        # id узла -> постоянный номер
+        self.seen = {}
+        # Записанные узлы живут до конца записи: иначе id освобождённого
+        # дерева мог бы достаться новому узлу
+        self.kept = []
+        self.count = 0
+        self.stream = bytearray()
+
+    def string(self, text):
+        index = self.string_index.get(text)
+        if index is None:
+            index = self.string_index[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+
+    def emit(self, node, key, children):
+        """Постоянный номер узла; новый узел записывается в поток после своих детей."""
+        latest = self.latest
+        number = self.table.get(key)
+        if number is None:
+            number = self.table[key] = len(latest)
+            latest.append(None)
+        elif children or self.count - latest[number] < _NEAR:
+            self.seen[id(node)] = number
+            self.kept.append(node)
+            return number
+        stream = self.stream
+        if isinstance(node, BinaryOp):
+            stream.append(_BINARY_CODES[node.op])
+        elif isinstance(node, UnaryOp):
+            stream.append(_NEGATE)
+        elif isinstance(node, Function):
+            code = _FUNCTION_CODES.get(node.name)
+            if code is None:
+                stream.append(_FUNCTION)
+                _write_varint(stream, self.string(node.name))
+            else:
+                stream.append(code)
+        elif isinstance(node, Call):
+            stream.append(_CALL)
+            _write_varint(stream, self.string(node.name))
+            _write_varint(stream, len(children))
+        elif isinstance(node, Variable):
+            stream.append(_VARIABLE)
+            _write_varint(stream, self.string(node.name))
+        else:
+            # Ключ литерала: (Number, repr значения, нужная запись или None)
+            self.values.append(float(node.value))
+            if key[2] is None:
+                stream.append(_NUMBER)
+            else:
+                stream.append(_NUMBER_TEXT)
+                _write_varint(stream, self.string(key[2]))
+        for child in children:
+            _write_varint(stream, self.count - latest[child])
+        latest[number] = self.count
+        self.count += 1
+        self.seen[id(node)] = number
+        self.kept.append(node)
+        return number
+
+    def add(self, expr):
+        """Записывает дерево, возвращает номер корня в потоке."""
+        seen = self.seen
+        results = []
+        stack = [expr]
+        while stack:
+            node = stack.pop()
+            if node is _APPLY:
+                node = stack.pop()
+                if isinstance(node, BinaryOp):
+                    if node.op not in _BINARY_CODES:
+                        raise ValueError(f"Unknown operator: {node.op}")
+                    right = results.pop()
+                    children = (results[-1], right)
+                    key = (BinaryOp, node.op, *children)
+                elif isinstance(node, UnaryOp):
+                    if node.op != '-':
+                        raise ValueError(f"Unknown unary operator: {node.op}")
+                    children = (results[-1],)
+                    key = (UnaryOp, *children)
+                elif isinstance(node, Function):
+                    children = (results[-1],)
+                    key = (Function, node.name, *children)
+                else:
+                    count = len(node.args)
+                    children = tuple(results[len(results) - count:])
+                    # Последнее место занимает результат, как у остальных узлов
+                    del results[len(results) - count + 1:]
+                    key = (Call, node.name, *children)
+                results[-1] = self.emit(node, key, children)
+            elif id(node) in seen:
+                results.append(seen[id(node)])
+            elif isinstance(node, BinaryOp):
+                stack += (node, _APPLY, node.right, node.left)
+            elif isinstance(node, UnaryOp):
+                stack += (node, _APPLY, node.operand)
+            elif isinstance(node, Function):
+                stack += (node, _APPLY, node.arg)
+            elif isinstance(node, Call):
+                if not node.args:
+                    raise ValueError(f"Function {node.name} has no arguments")
+                stack += (node, _APPLY, *reversed(node.args))
+            elif isinstance(node, Number):
+                text = node.text if _needs_text(node) else None
+                # repr различает 0.0 и -0.0
+                results.append(self.emit(node, (Number, repr(float(node.value)), text), ()))
+            elif isinstance(node, Variable):
+                results.append(self.emit(node, (Variable, node.name), ()))
+            else:
+                raise ValueError(f"Unknown node type: {type(node).__name__}")
+        return self.latest[results[0]]
+
+    def payload(self, roots):
+        out = bytearray()
+        _write_varint(out, len(self.strings))
+        for text in self.strings:
+            encoded = text.encode()
+            _write_varint(out, len(encoded))
+            out += encoded
+        _write_varint(out, len(self.values))
+        out += struct.pack(f'<{len(self.values)}d', *self.values)
+        _write_varint(out, len(self.stream))
+        out += self.stream
+        _write_varint(out, len(roots))
+        for root in roots:
+            _write_varint(out, 0 if root is None else root + 1)
+        return out
+
+# Маркер в стеке обхода: следующий за ним узел готов к записи
+_APPLY = object()
+
+def dumps(expressions, degrees=None):
+    """Библиотека выражений в двоичном виде.
+
+    expressions - деревья (None на месте строк, которые не разобрались).
+    degrees - режим углов, для которого деревья упрощены optimize():
+    loads() откажется загружать их для другого режима; деревья после
+    parse() от режима не зависят (degrees=None). Литералы хранятся как
+    float64, запись литерала - только если она точнее float (для
+    evaluate(precision=...)).
+    """
+    if degrees not in ANGLE_MODES:
+        raise ValueError(f"Unknown angle mode: {degrees!r}")
+    encoder = _Encoder()
+    roots = [None if expr is None else encoder.add(expr) for expr in expressions]
+    payload = encoder.payload(roots)
+    header = _HEADER.pack(MAGIC, VERSION, ANGLE_MODES.index(degrees), len(payload), zlib.crc32(payload))
+    return header + payload
+
+def read_header(data):
+    """Режим углов библиотеки; проверяет заголовок, длину и контрольную сумму."""
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated expression library")
+    magic, version, mode, length, checksum = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not an expression library")
+    if version != VERSION:
+        raise ValueError(f"Unsupported expression library version: {version} (expected {VERSION})")
+    if mode >= len(ANGLE_MODES):
+        raise ValueError(f"Unknown angle mode code: {mode}")
+    if len(data) != _HEADER.size + length:
+        raise ValueError("Truncated expression library")
+    if zlib.crc32(memoryview(data)[_HEADER.size:]) != checksum:
+        raise ValueError("Expression library checksum mismatch")
+    return ANGLE_MODES[mode]
+
+def loads(data, degrees=None):
+    """Выражения из результата dumps(): список деревьев и None.
+
+    data - bytes или другой буфер (mmap). degrees - режим, в котором
+    выражения будут вычисляться: если библиотека упрощена для другого
+    режима, выбрасывается ValueError. Одинаковые поддеревья в результате -
+    один объект, как после optimizer.share().
+    """
+    mode = read_header(data)
+    if mode is not None and degrees is not None and mode != degrees:
+        raise ValueError(f"Expression library is optimized for degrees={mode!r}, not {degrees!r}")
+    # Деревья без циклов: сборщик мусора, запускаемый по числу новых
+    # объектов, только замедлил бы загрузку
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _decode(data, _HEADER.size)
+    except (IndexError, StopIteration, struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Corrupted expression library: {type(e).__name__}") from None
+    finally:
+        if enabled:
+            gc.enable()
+
+def _decode(data, pos):
+    count, pos = _read_varint(data, pos)
+    strings = []
+    for _ in range(count):
+        length, pos = _read_varint(data, pos)
+        strings.append(bytes(data[pos:pos + length]).decode())
+        pos += length
+    count, pos = _read_varint(data, pos)
+    values = iter(struct.unpack_from(f'<{count}d', data, pos))
+    pos += 8 * count
+    length, pos = _read_varint(data, pos)
+    end = pos + length
+    # Поток узлов копируется одним куском: индексация bytes быстрее, чем mmap
+    stream = bytes(data[pos:end])
+    nodes = []
+    _decode_nodes(stream, strings, values, nodes)
+
+    count, pos = _read_varint(data, end)
+    expressions = []
+    for _ in range(count):
+        root, pos = _read_varint(data, pos)
+        expressions.append(nodes[root - 1] if root else None)
+    if pos != len(data):
+        raise ValueError("Trailing data after expression library")
+    return expressions
+
+def _decode_nodes(stream, strings, values, nodes):
+    append = nodes.append
+    ops = _BINARY_OPS
+    functions = _FUNCTION_NAMES
+    next_value = values.__next__
+    end = len(stream)
+    i = 0
+    # Горячий цикл: ссылки до двух байт читаются без вызова _read_varint
+    while i < end:
+        op = stream[i]
+        if op < _NEGATE:
+            ref = stream[i + 1]
+            if ref < 0x80:
+                i += 2
+            elif stream[i + 2] < 0x80:
+                ref = ref & 0x7f | stream[i + 2] << 7
+                i += 3
+            else:
+                ref, i = _read_varint(stream, i + 1)
+            left = nodes[-ref]
+            ref = stream[i]
+            if ref < 0x80:
+                i += 1
+            elif stream[i + 1] < 0x80:
+                ref = ref & 0x7f | stream[i + 1] << 7
+                i += 2
+            else:
+                ref, i = _read_varint(stream, i)
+            append(BinaryOp(left, ops[op], nodes[-ref]))
+        elif op == _NUMBER:
+            i += 1
+            append(Number(next_value()))
+        elif op >= _FUNCTION_BASE:
+            ref = stream[i + 1]
+            if ref < 0x80:
+                i += 2
+            elif stream[i + 2] < 0x80:
+                ref = ref & 0x7f | stream[i + 2] << 7
+                i += 3
+            else:
+                ref, i = _read_varint(stream, i + 1)
+            append(Function(functions[op - _FUNCTION_BASE], nodes[-ref]))
+        elif op == _VARIABLE:
+            name, i = _read_varint(stream, i + 1)
+            append(Variable(strings[name]))
+        elif op == _NEGATE:
+            ref, i = _read_varint(stream, i + 1)
+            append(UnaryOp('-', nodes[-ref]))
+        elif op == _NUMBER_TEXT:
+            text, i = _read_varint(stream, i + 1)
+            append(Number(next_value(), strings[text]))
+        elif op == _FUNCTION:
+            name, i = _read_varint(stream, i + 1)
+            ref, i = _read_varint(stream, i)
+            append(Function(strings[name], nodes[-ref]))
+        elif op == _CALL:
+            name, i = _read_varint(stream, i + 1)
+            argc, i = _read_varint(stream, i)
+            args = []
+            for _ in range(argc):
+                ref, i = _read_varint(stream, i)
+                args.append(nodes[-ref])
+            append(Call(strings[name], args))
+        else:
+            raise ValueError(f"Unknown opcode: {op}")
+    if i != end:
+        raise ValueError("Node stream overruns its length")
+
+def dump(expressions, path, degrees=None):
+    with open(path, "wb") as stream:
+        stream.write(dumps(expressions, degrees))
+
+def load(path, degrees=None):
+    """Выражения из файла dump(): файл читается целиком одним вызовом."""
+    with open(path, "rb") as stream:
+        return loads(stream.read(), degrees)
+
+def precompile(stream, path, degrees=None):
+    """Разбирает выражения из stream (по одному в строке) и сохраняет библиотеку в path.
+
+    Элемент i библиотеки соответствует строке i; пустым строкам и строкам
+    с ошибкой разбора соответствует None. При degrees не None деревья
+    упрощаются optimize() для этого режима углов. Возвращает пару
+    (число строк, список (номер строки, сообщение) для ошибок).
+    """
+    if degrees is not None:
+        from calculator.optimizer import optimize
+    expressions = []
+    errors = []
+    for line_number, line in enumerate(stream, start=1):
+        expression = line.strip()
+        if not expression:
+            expressions.append(None)
+            continue
+        try:
+            expr = parse(expression)
+        except Exception as e:
+            errors.append((line_number, str(e)))
+            expressions.append(None)
+            continue
+        expressions.append(expr if degrees is None else optimize(expr, degrees))
+    dump(expressions, path, degrees)
+    return len(expressions), errors
@@ -0,0 +1,152 @@
+import asyncio
+import errno
+import json
+import os
+import socket
+import stat
+from concurrent.futures import ProcessPoolExecutor
+from calculator.parser import parse
+from calculator.evaluator import evaluate
+from calculator.trig import EXACT
+from calculator.cache import ParseCache
+from calculator.client import DEFAULT_ADDRESS, parse_address, encode_number, decode_number
+
+# Ограничение длины одной строки запроса (по умолчанию у asyncio - 64 КиБ)
+MAX_LINE = 1 << 24
+
+def _remove_stale_socket(path):
+    # Заменяется только оставшийся от прошлого запуска сокет, не любой файл
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(errno.EEXIST, "File exists and is not a socket", path)
+    os.unlink(path)
+
+def _reject_constant(name):
+    # Infinity и NaN - не JSON; в протоколе такие числа передаются строками
+    raise ValueError(f"Invalid JSON constant: {name}")
+
+def _validate(request):
+    if not isinstance(request, dict) or not isinstance(request.get("expression"), str):
+        raise ValueError("Invalid request: expected an object with an 'expression' string")
+    variables = request.get("variables") or {}
+    if not isinstance(variables, dict):
+        raise ValueError("Invalid request: 'variables' must be an object")
+    variables = {name: decode_number(value) for name, value in variables.items()}
+    degrees = request.get("degrees", False)
+    if degrees != EXACT:
+        degrees = bool(degrees)
+    return request["expression"], degrees, variables
+
+def handle_request(request, cache=None):
+    """Вычисляет один разобранный JSON-запрос и возвращает словарь ответа."""
+    response = {}
+    if isinstance(request, dict) and "id" in request:
+        response["id"] = request["id"]
+    try:
+        expression, degrees, variables = _validate(request)
+        expr = cache.parse(expression) if cache is not None else parse(expression)
+        response["result"] = encode_number(evaluate(expr, degrees=degrees, variables=variables))
+    except Exception as e:
+        response["error"] = str(e)
+        response["type"] = type(e).__name__
+    return response
+
+class CalculatorServer:
+    """Резидентный сервер вычислений с построчным JSON-протоколом.
+
+    Запросы одного соединения обрабатываются конвейером, ответы пишутся
+    в порядке запросов. Кэш разбора общий для всех соединений. Выражения
+    длиннее heavy_threshold символов вычисляются в пуле процессов, чтобы
+    не блокировать цикл событий; workers=0 отключает пул.
+    """
+
+    def __init__(self, cache_size=1024, workers=None, heavy_threshold=10_000, max_pipeline=128):
+        self.cache = ParseCache(capacity=cache_size)
+        self.workers = workers
+        self.heavy_threshold = heavy_threshold
+        self.max_pipeline = max_pipeline
+        self._executor = None
+        self._server = None
+        self._connections = set()
+
+    async def _respond(self, line):
+        try:
+            request = json.loads(line, parse_constant=_reject_constant)
+        except ValueError:
+            return {"error": "Invalid request: malformed JSON", "type": "ValueError"}
+        expression = request.get("expression") if isinstance(request, dict) else None
+        if self.workers != 0 and isinstance(expression, str) and len(expression) > self.heavy_threshold:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, handle_request, request)
+        return handle_request(request, self.cache)
+
+    async def _write_responses(self, pending, writer):
+        while True:
+            task = await pending.get()
+            if task is None:
+                return
+            writer.write(json.dumps(await task, allow_nan=False).encode() + b"\n")
+            if pending.empty():
+                await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        connection.add_done_callback(self._connections.discard)
+        pending = asyncio.Queue(maxsize=self.max_pipeline)
+        responder = asyncio.create_task(self._write_responses(pending, writer))
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    await pending.put(asyncio.create_task(self._respond(line)))
+        except (ConnectionError, ValueError):
+            # ValueError: строка длиннее MAX_LINE
+            pass
+        except asyncio.CancelledError:
+            responder.cancel()
+            writer.close()
+            raise
+        await pending.put(None)
+        try:
+            await responder
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def start(self, address=DEFAULT_ADDRESS):
+        family, target = parse_address(address)
+        if family == socket.AF_UNIX:
+            _remove_stale_socket(target)
+            self._server = await asyncio.start_unix_server(self.handle_connection, target, limit=MAX_LINE)
+        else:
+            host, port = target
+            self._server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE)
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        connections = list(self._connections)
+        for connection in connections:
+            connection.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def serve_forever(self, address=DEFAULT_ADDRESS):
+        server = await self.start(address)
+        try:
+            await server.serve_forever()
+        finally:
+            await self.close()
+
+def run_server(address=DEFAULT_ADDRESS, **options):
+    asyncio.run(CalculatorServer(**options).serve_forever(address))
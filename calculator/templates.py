@@ -0,0 +1,181 @@
+from itertools import count
+from calculator.parser import UnaryOp, BinaryOp, Number, Function, Variable, Call, SLOT, parse, canonicalize
+from calculator.evaluator import evaluate
+from calculator.compiler import compile
+from calculator.cache import ParseCache
+
+# Меньшие группы одной формы вычисляются по одному: NumPy окупается не сразу
+MIN_VECTOR_GROUP = 16
+
+def slot_name(index):
+    # Имя переменной слота; парсер такое имя не создаст, поэтому совпадений нет
+    return f"{SLOT}{index}"
+
+# Маркер в стеке обхода: следующий за ним узел готов к применению
+_APPLY = object()
+
+def _slots_to_variables(expr):
+    # При разборе формы k-й слот записан литералом "k"; заменяем его переменной слота
+    results = []
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if node is _APPLY:
+            node = stack.pop()
+            if isinstance(node, BinaryOp):
+                right = results.pop()
+                results[-1] = BinaryOp(results[-1], node.op, right)
+            elif isinstance(node, Function):
+                results[-1] = Function(node.name, results[-1])
+            elif isinstance(node, Call):
+                count = len(node.args)
+                args = results[-count:]
+                del results[-count:]
+                results.append(Call(node.name, args))
+            else:
+                results[-1] = UnaryOp(node.op, results[-1])
+        elif isinstance(node, BinaryOp):
+            stack += (node, _APPLY, node.right, node.left)
+        elif isinstance(node, UnaryOp):
+            stack += (node, _APPLY, node.operand)
+        elif isinstance(node, Function):
+            stack += (node, _APPLY, node.arg)
+        elif isinstance(node, Call):
+            stack += (node, _APPLY, *reversed(node.args))
+        elif isinstance(node, Number) and node.text.isdigit():
+            results.append(Variable(slot_name(int(node.text))))
+        else:
+            results.append(node)
+    return results[0]
+
+class Template:
+    """Разобранная форма выражения: литералы заменены переменными слотов.
+
+    Экземпляр формы вычисляется подстановкой вектора литералов без
+    повторного разбора; программа для каждого режима углов компилируется
+    один раз.
+    """
+
+    def __init__(self, shape):
+        slots = count()
+        # Подставляем вместо слотов разные целые литералы: разбор зависит только
+        # от того, что на этом месте число, а разный текст не даёт парсеру их объединить
+        text = "".join(part if i == 0 else f"{next(slots)}{part}"
+                       for i, part in enumerate(shape.split(SLOT)))
+        self.shape = shape
+        self.slots = [slot_name(i) for i in range(next(slots))]
+        self.tree = _slots_to_variables(parse(text))
+        self._compiled = {}
+
+    def bind(self, literals, variables=None):
+        values = dict(variables) if variables else {}
+        values.update(zip(self.slots, literals))
+        return values
+
+    def evaluate(self, literals, degrees=False, variables=None):
+        compiled = self._compiled.get(degrees)
+        if compiled is None:
+            compiled = self._compiled[degrees] = compile(self.tree, degrees=degrees)
+        return compiled(self.bind(literals, variables))
+
+    def evaluate_batch(self, literal_rows, degrees=False, variables=None):
+        """Значения для многих векторов литералов сразу (NumPy, ошибки -> NaN)."""
+        values, failed = self.evaluate_batch_masked(literal_rows, degrees, variables)
+        values[failed] = float('nan')
+        return values
+
+    def evaluate_batch_masked(self, literal_rows, degrees=False, variables=None):
+        """(значения, маска ошибок) для многих векторов литералов сразу."""
+        import numpy as np
+        from calculator.vectorized import evaluate_batch_masked
+
+        matrix = np.asarray(literal_rows, dtype=np.float64).reshape(len(literal_rows), len(self.slots))
+        arrays = dict(variables) if variables else {}
+        arrays.update((name, matrix[:, i]) for i, name in enumerate(self.slots))
+        if not self.slots:
+            arrays[slot_name(0)] = np.zeros(len(literal_rows))
+        return evaluate_batch_masked(self.tree, arrays, degrees=degrees)
+
+class TemplateCache(ParseCache):
+    """LRU-кэш разобранных форм выражений.
+
+    Выражения, отличающиеся только числами, разбираются один раз:
+    для нового экземпляра строится лишь вектор литералов. stats()
+    показывает долю попаданий в кэш форм.
+    """
+
+    def template(self, shape):
+        template = self._get(shape)
+        if template is None:
+            template = Template(shape)
+            self._put(shape, template)
+        return template
+
+    def evaluate(self, expression, degrees=False, variables=None):
+        canonical = canonicalize(expression)
+        if canonical is not None:
+            shape, literals = canonical
+            try:
+                template = self.template(shape)
+            except ValueError:
+                # Ошибку разбора сообщает parse() исходного выражения
+                pass
+            else:
+                return template.evaluate(literals, degrees, variables)
+        return _evaluate_text(expression, degrees, variables)
+
+    def evaluate_many(self, expressions, degrees=False, variables=None):
+        """Вычисляет выражения, группируя их по форме.
+
+        Возвращает список пар (результат, сообщение об ошибке или None)
+        в порядке входа. Большие группы одной формы вычисляются NumPy
+        одним пакетом; результаты совпадают с evaluate() с точностью до
+        округления в функциях NumPy, ошибки - те же.
+        """
+        results = [None] * len(expressions)
+        groups = {}
+        for i, expression in enumerate(expressions):
+            canonical = canonicalize(expression)
+            if canonical is None:
+                results[i] = _outcome(_evaluate_text, expression, degrees, variables)
+                continue
+            shape, literals = canonical
+            group = groups.get(shape)
+            if group is None:
+                group = groups[shape] = ([], [])
+            group[0].append(i)
+            group[1].append(literals)
+
+        for shape, (indices, rows) in groups.items():
+            try:
+                template = self.template(shape)
+            except ValueError:
+                for i in indices:
+                    results[i] = _outcome(_evaluate_text, expressions[i], degrees, variables)
+                continue
+            if len(indices) < MIN_VECTOR_GROUP:
+                for i, literals in zip(indices, rows):
+                    results[i] = _outcome(template.evaluate, literals, degrees, variables)
+                continue
+            try:
+                values, failed = template.evaluate_batch_masked(rows, degrees, variables)
+                values, failed = values.tolist(), failed.tolist()
+            except ValueError:
+                # Ошибка всего пакета (например, неизвестная переменная)
+                values, failed = [None] * len(indices), [True] * len(indices)
+            for i, literals, value, error in zip(indices, rows, values, failed):
+                if error:
+                    # Текст ошибки даёт скалярное вычисление
+                    results[i] = _outcome(template.evaluate, literals, degrees, variables)
+                else:
+                    results[i] = (value, None)
+        return results
+
+def _evaluate_text(expression, degrees=False, variables=None):
+    return evaluate(parse(expression), degrees=degrees, variables=variables)
+
+def _outcome(function, *args):
+    try:
+        return function(*args), None
+    except Exception as e:
+        return None, str(e)
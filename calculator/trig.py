@@ -0,0 +1,115 @@
+from math import fmod, radians, degrees, atan, sin as _sin, tan as _tan
+
+# Режим углов для evaluate(..., degrees=EXACT): градусы с точной редукцией
+# аргумента и точными значениями в особых углах
+EXACT = 'exact'
+
+# Правильно округлённые значения в особых углах
+SQRT_HALF = 0.7071067811865476
+SQRT3 = 1.7320508075688772
+SQRT3_HALF = 0.8660254037844386
+TAN30 = 0.5773502691896257
+
+# sin угла из [0, 90]; 0 и 90 libm даёт точно
+SIN_SPECIAL = {30.0: 0.5, 45.0: SQRT_HALF, 60.0: SQRT3_HALF}
+# tg и ctg угла из [0, 45]
+TAN_SPECIAL = {30.0: TAN30, 45.0: 1.0}
+COT_SPECIAL = {30.0: SQRT3, 45.0: 1.0}
+ARCTG_SPECIAL = {1.0: 45.0, SQRT3: 60.0, TAN30: 30.0}
+
+# Значений в памяти одной функции; при переполнении память очищается
+MEMO_SIZE = 1 << 16
+
+def reduce(x):
+    """Точная редукция |x| градусов: (90q, t), где |x| = 360k + 90q + t, 0 <= t < 90.
+
+    fmod и вычитание выполняются без округления, поэтому t - точный
+    остаток и для очень больших углов. Для inf fmod выбрасывает
+    ValueError("math domain error"), как math.sin.
+    """
+    r = fmod(abs(x), 360.0)
+    t = fmod(r, 90.0)
+    return r - t, t
+
+def _sin_first(v):
+    # v в [0, 90]; при v > 45 аргумент libm - точный остаток, а не 90 - v
+    special = SIN_SPECIAL.get(v)
+    if special is not None:
+        return special
+    return _sin(radians(v))
+
+def _tan_first(t, inverse):
+    # tg(t) или 1/tg(t) для t в [0, 90): большие углы сводятся к 90 - t,
+    # которое вычисляется точно, вместо tg около полюса
+    high = t > 45.0
+    u = 90.0 - t if high else t
+    if inverse != high:
+        special = COT_SPECIAL.get(u)
+        if special is not None:
+            return special
+        tangent = _tan(radians(u))
+        if not tangent:
+            raise ZeroDivisionError("float division by zero")
+        return 1 / tangent
+    special = TAN_SPECIAL.get(u)
+    if special is not None:
+        return special
+    return _tan(radians(u))
+
+def sin(x):
+    q, t = reduce(x)
+    value = _sin_first(90.0 - t if q == 90.0 or q == 270.0 else t)
+    # Ноль всегда положительный: sin(-180) == 0.0, а не -0.0
+    return -value if (q >= 180.0) != (x < 0) and value else value
+
+def cos(x):
+    q, t = reduce(x)
+    value = _sin_first(t if q == 90.0 or q == 270.0 else 90.0 - t)
+    return -value if (q == 90.0 or q == 180.0) and value else value
+
+def tg(x):
+    q, t = reduce(x)
+    odd = q == 90.0 or q == 270.0
+    value = _tan_first(t, odd)
+    return -value if odd != (x < 0) and value else value
+
+def ctg(x):
+    q, t = reduce(x)
+    odd = q == 90.0 or q == 270.0
+    value = _tan_first(t, not odd)
+    return -value if odd != (x < 0) and value else value
+
+def arctg(x):
+    special = ARCTG_SPECIAL.get(abs(x))
+    if special is not None:
+        return special if x > 0 else -special
+    return degrees(atan(x))
+
+class _Memo(dict):
+    # Значения функции по аргументу: попадание - обращение к dict из C,
+    # без вызова функции Python. Ошибки не запоминаются
+    __slots__ = ('function',)
+
+    def __init__(self, function):
+        super().__init__()
+        self.function = function
+
+    def __missing__(self, x):
+        value = self.function(x)
+        # NaN не равен себе: каждый вызов добавлял бы новую запись; 0.0 == -0.0,
+        # и запомненный ноль одного знака отвечал бы за другой (arctg(-0.0) = -0.0)
+        if x == x and x != 0:
+            if len(self) >= MEMO_SIZE:
+                self.clear()
+            self[x] = value
+        return value
+
+MEMOS = {function.__name__: _Memo(function) for function in (sin, cos, tg, ctg, arctg)}
+
+# Функции режима EXACT для evaluator: сетки углов (целые градусы и т. п.)
+# после первого прохода вычисляются поиском в памяти
+FUNCTIONS = {name: memo.__getitem__ for name, memo in MEMOS.items()}
+
+def clear_memos():
+    for memo in MEMOS.values():
+        memo.clear()
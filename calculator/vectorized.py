@@ -0,0 +1,478 @@
+from functools import reduce
+import numpy as np
+from calculator import trig
+from calculator.parser import UnaryOp, BinaryOp, Number, Function, Variable, Call
+
+ERROR_POLICIES = {'raise', 'nan'}
+
+def _check(result, mask, error, message, failed):
+    # Поэлементная проверка: те же исключения, что и у скалярного evaluate().
+    # failed - None (исключение для всего пакета) либо булев массив формы
+    # пакета, в котором отмечаются ошибочные позиции. Маска применяется к
+    # результату только в конце: NaN, записанный сразу, скрыли бы дальнейшие
+    # операции (nan^0 = 1, hypot(nan, inf) = inf)
+    if not np.any(mask):
+        return result
+    if failed is None:
+        raise error(message)
+    np.logical_or(failed, mask, out=failed)
+    return result
+
+def _divide(left, right, failed):
+    zero = right == 0
+    result = np.divide(left, np.where(zero, 1.0, right))
+    result = _check(result, zero, ZeroDivisionError, "Division by zero", failed)
+    return _check(result, np.isinf(result), OverflowError, "Result is infinite", failed)
+
+def _power(left, right, failed):
+    non_integer = ~(np.isfinite(right) & (right == np.floor(right)))
+    result = np.power(left, right)
+    result = _check(result, (left < 0) & non_integer, ValueError,
+                    "A negative number cannot be raised to a non-integer power", failed)
+    result = _check(result, (left == 0) & (right < 0), ZeroDivisionError,
+                    "0.0 cannot be raised to a negative power", failed)
+    overflow = np.isinf(result) & np.isfinite(left) & np.isfinite(right)
+    return _check(result, overflow, OverflowError, "Result is infinite", failed)
+
+def _sqrt(x, failed):
+    return _check(np.sqrt(x), x < 0, ValueError, "math domain error", failed)
+
+def _ln(x, failed):
+    return _check(np.log(x), x <= 0, ValueError, "math domain error", failed)
+
+def _exp(x, failed):
+    result = np.exp(x)
+    return _check(result, np.isinf(result) & np.isfinite(x), OverflowError, "math range error", failed)
+
+def _trig(ufunc):
+    def kernel(x, failed):
+        return _check(ufunc(x), np.isinf(x), ValueError, "math domain error", failed)
+    return kernel
+
+def _ctg(x, failed):
+    tan = _trig(np.tan)(x, failed)
+    zero = tan == 0
+    result = np.divide(1.0, np.where(zero, 1.0, tan))
+    return _check(result, zero, ZeroDivisionError, "float division by zero", failed)
+
+def _arctg(x, failed):
+    return np.arctan(x)
+
+def _in_degrees(kernel):
+    def converted(x, failed):
+        return kernel(np.radians(x), failed)
+    return converted
+
+BINARY_KERNELS = {
+    '+': lambda left, right, failed: np.add(left, right),
+    '-': lambda left, right, failed: np.subtract(left, right),
+    '*': lambda left, right, failed: np.multiply(left, right),
+    '/': _divide,
+    '^': _power,
+}
+
+RADIAN_KERNELS = {
+    'sqrt': _sqrt,
+    'sin': _trig(np.sin),
+    'cos': _trig(np.cos),
+    'tg': _trig(np.tan),
+    'ctg': _ctg,
+    'ln': _ln,
+    'exp': _exp,
+    'arctg': _arctg,
+}
+
+DEGREE_KERNELS = {
+    **RADIAN_KERNELS,
+    'sin': _in_degrees(RADIAN_KERNELS['sin']),
+    'cos': _in_degrees(RADIAN_KERNELS['cos']),
+    'tg': _in_degrees(RADIAN_KERNELS['tg']),
+    'ctg': _in_degrees(RADIAN_KERNELS['ctg']),
+    'arctg': lambda x, failed: np.degrees(np.arctan(x)),
+}
+
+def _reduce_degrees(x):
+    # Как trig.reduce: |x| = 360k + 90q + t без округлений; q - float, чтобы
+    # NaN и inf не приводились к целому
+    r = np.fmod(np.abs(x), 360.0)
+    t = np.fmod(r, 90.0)
+    return (r - t) / 90.0, t
+
+def _special(values, arguments, table):
+    for angle, exact in table.items():
+        values = np.where(arguments == angle, exact, values)
+    return values
+
+def _exact_sin_cos(cosine):
+    def kernel(x, failed):
+        q, t = _reduce_degrees(x)
+        odd = (q == 1) | (q == 3)
+        # Аргумент libm - остаток t или 90 - t, как в trig.sin и trig.cos;
+        # разность точна только при t >= 45, иначе округляется (ошибка до 2 ulp)
+        v = np.where(odd != cosine, 90.0 - t, t)
+        value = _special(np.sin(np.radians(v)), v, trig.SIN_SPECIAL)
+        negative = ((q == 1) | (q == 2)) if cosine else ((q >= 2) != (x < 0))
+        # + 0.0 убирает отрицательный ноль
+        result = np.where(negative, -value, value) + 0.0
+        return _check(result, np.isinf(x), ValueError, "math domain error", failed)
+    return kernel
+
+def _exact_tan(cotangent):
+    def kernel(x, failed):
+        q, t = _reduce_degrees(x)
+        odd = (q == 1) | (q == 3)
+        high = t > 45.0
+        u = np.where(high, 90.0 - t, t)
+        tangent = np.tan(np.radians(u))
+        inverse = (odd != cotangent) != high
+        pole = inverse & (tangent == 0)
+        value = np.where(inverse,
+                         _special(np.divide(1.0, np.where(pole, 1.0, tangent)), u, trig.COT_SPECIAL),
+                         _special(tangent, u, trig.TAN_SPECIAL))
+        result = np.where(odd != (x < 0), -value, value) + 0.0
+        result = _check(result, np.isinf(x), ValueError, "math domain error", failed)
+        return _check(result, pole, ZeroDivisionError, "float division by zero", failed)
+    return kernel
+
+def _exact_arctg(x, failed):
+    value = np.degrees(np.arctan(x))
+    for argument, exact in trig.ARCTG_SPECIAL.items():
+        value = np.where(np.abs(x) == argument, np.copysign(exact, x), value)
+    return value
+
+EXACT_DEGREE_KERNELS = {
+    **RADIAN_KERNELS,
+    'sin': _exact_sin_cos(False),
+    'cos': _exact_sin_cos(True),
+    'tg': _exact_tan(False),
+    'ctg': _exact_tan(True),
+    'arctg': _exact_arctg,
+}
+
+def _hypot(args, failed):
+    # reduce с одним аргументом вернул бы его без изменений, а hypot(-3) = 3
+    result = reduce(np.hypot, args) if len(args) > 1 else np.abs(args[0])
+    finite = reduce(np.logical_and, [np.isfinite(arg) for arg in args])
+    return _check(result, np.isinf(result) & finite, OverflowError, "Result is infinite", failed)
+
+def _extremum(better):
+    # Как встроенные min и max: значение заменяется, только если следующее
+    # строго лучше, поэтому NaN в первом аргументе сохраняется, а в
+    # остальных пропускается (np.minimum распространял бы его всегда).
+    # Так обрабатываются только настоящие NaN: ошибки аргументов хранятся
+    # в маске failed и пропуском не теряются
+    def kernel(args, failed):
+        return reduce(lambda current, arg: np.where(better(arg, current), arg, current), args)
+    return kernel
+
+# Функции нескольких аргументов: (список массивов аргументов, failed) -> массив
+CALL_KERNELS = {
+    'hypot': _hypot,
+    'pow': lambda args, failed: _power(args[0], args[1], failed),
+    'min': _extremum(np.less),
+    'max': _extremum(np.greater),
+}
+
+# Маркер в стеке обхода: следующий за ним узел готов к применению
+_APPLY = object()
+
+def evaluate_batch(expr, variables=None, degrees=False, errors='raise'):
+    """Вычисляет выражение сразу для массивов значений переменных.
+
+    variables сопоставляет имена переменных массивам (или скалярам) одной
+    формы либо транслируемым друг к другу. Ошибки, которые evaluate()
+    выбрасывает для отдельного значения, при errors='raise' выбрасываются
+    для всего пакета, а при errors='nan' превращаются в NaN в своих позициях.
+    """
+    if errors not in ERROR_POLICIES:
+        raise ValueError(f"Unknown error policy: {errors}")
+    if errors == 'raise':
+        return _evaluate_batch(expr, variables, degrees, masked=False)
+    result, failed = _evaluate_batch(expr, variables, degrees, masked=True)
+    result[failed] = np.nan
+    return result
+
+def evaluate_batch_masked(expr, variables=None, degrees=False):
+    """(массив значений, булева маска ошибок) для массивов переменных.
+
+    Маска отмечает позиции, где evaluate() выбросил бы исключение;
+    значения в них не определены. В отличие от NaN при errors='nan'
+    маску не спутать с NaN, который выражение дало как значение.
+    """
+    return _evaluate_batch(expr, variables, degrees, masked=True)
+
+def _evaluate_batch(expr, variables, degrees, masked):
+    arrays = {name: np.asarray(value, dtype=np.float64) for name, value in (variables or {}).items()}
+    shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+    functions = _angle_kernels(degrees)[0]
+    failed = np.zeros(shape, dtype=bool) if masked else None
+
+    values = []
+    stack = [expr]
+    push = stack.append
+    pop = stack.pop
+    with np.errstate(all='ignore'):
+        while stack:
+            node = pop()
+            if node is _APPLY:
+                node = pop()
+                if isinstance(node, BinaryOp):
+                    right = values.pop()
+                    values[-1] = BINARY_KERNELS[node.op](values[-1], right, failed)
+                elif isinstance(node, Function):
+                    values[-1] = functions[node.name](values[-1], failed)
+                elif isinstance(node, Call):
+                    count = len(node.args)
+                    result = CALL_KERNELS[node.name](values[-count:], failed)
+                    del values[-count:]
+                    values.append(result)
+                else:
+                    values[-1] = np.negative(values[-1])
+            elif isinstance(node, Number):
+                values.append(np.float64(node.value))
+            elif isinstance(node, Variable):
+                if node.name not in arrays:
+                    raise ValueError(f"Unknown variable: {node.name}")
+                values.append(arrays[node.name])
+            elif isinstance(node, BinaryOp):
+                if node.op not in BINARY_KERNELS:
+                    raise ValueError(f"Unknown operator: {node.op}")
+                push(node)
+                push(_APPLY)
+                push(node.right)
+                push(node.left)
+            elif isinstance(node, UnaryOp):
+                if node.op != '-':
+                    raise ValueError(f"Unknown unary operator: {node.op}")
+                push(node)
+                push(_APPLY)
+                push(node.operand)
+            elif isinstance(node, Function):
+                if node.name not in functions:
+                    raise ValueError(f"Unsupported function: {node.name}")
+                push(node)
+                push(_APPLY)
+                push(node.arg)
+            elif isinstance(node, Call):
+                if node.name not in CALL_KERNELS:
+                    raise ValueError(f"Unsupported function: {node.name}")
+                push(node)
+                push(_APPLY)
+                stack.extend(reversed(node.args))
+            else:
+                raise TypeError("Invalid expression type")
+
+    result = np.broadcast_to(values[0], shape).copy()
+    return (result, failed) if masked else result
+
+def _power_partials(left, right, result, need_left, need_right):
+    d_left = d_right = 0.0
+    if need_left:
+        d_left = np.where(right == 0, 0.0, right * np.power(left, right - 1))
+    if need_right:
+        positive = left > 0
+        log = np.log(np.where(positive, left, 1.0))
+        d_right = np.where(positive, result * log, np.where((left == 0) & (right > 0), 0.0, np.nan))
+    return d_left, d_right
+
+# Частные производные для gradient_batch (см. calculator.autodiff)
+BINARY_DERIVATIVE_KERNELS = {
+    '+': lambda left, right, result, need_left, need_right: (1.0, 1.0),
+    '-': lambda left, right, result, need_left, need_right: (1.0, -1.0),
+    '*': lambda left, right, result, need_left, need_right: (right, left),
+    '/': lambda left, right, result, need_left, need_right: (1.0 / right, -result / right),
+    '^': _power_partials,
+}
+
+RADIAN_DERIVATIVE_KERNELS = {
+    'sqrt': lambda x, y: 0.5 / y,
+    'sin': lambda x, y: np.cos(x),
+    'cos': lambda x, y: -np.sin(x),
+    'tg': lambda x, y: 1 + y * y,
+    'ctg': lambda x, y: -(1 + y * y),
+    'ln': lambda x, y: 1 / x,
+    'exp': lambda x, y: y,
+    'arctg': lambda x, y: 1 / (1 + x * x),
+}
+
+DEGREE_DERIVATIVE_KERNELS = {
+    **RADIAN_DERIVATIVE_KERNELS,
+    'sin': lambda x, y: np.cos(np.radians(x)) * (np.pi / 180),
+    'cos': lambda x, y: -np.sin(np.radians(x)) * (np.pi / 180),
+    'tg': lambda x, y: (1 + y * y) * (np.pi / 180),
+    'ctg': lambda x, y: -(1 + y * y) * (np.pi / 180),
+    'arctg': lambda x, y: (180 / np.pi) / (1 + x * x),
+}
+
+def _unchecked(kernel, x):
+    # Значение ядра без проверки ошибок: точки аргумента уже проверило само вычисление
+    return kernel(x, np.zeros(np.shape(x), dtype=bool))
+
+EXACT_DEGREE_DERIVATIVE_KERNELS = {
+    **DEGREE_DERIVATIVE_KERNELS,
+    'sin': lambda x, y: _unchecked(EXACT_DEGREE_KERNELS['cos'], x) * (np.pi / 180),
+    'cos': lambda x, y: -_unchecked(EXACT_DEGREE_KERNELS['sin'], x) * (np.pi / 180),
+}
+
+def _angle_kernels(degrees):
+    # (ядра функций, ядра производных) для режима углов, как evaluator.angle_functions
+    if degrees == trig.EXACT:
+        return EXACT_DEGREE_KERNELS, EXACT_DEGREE_DERIVATIVE_KERNELS
+    if degrees:
+        return DEGREE_KERNELS, DEGREE_DERIVATIVE_KERNELS
+    return RADIAN_KERNELS, RADIAN_DERIVATIVE_KERNELS
+
+def _selected(args, result):
+    # Производная min/max равна 1 по первому аргументу, давшему результат
+    taken = np.zeros(np.shape(result), dtype=bool)
+    partials = []
+    for arg in args:
+        mask = (arg == result) & ~taken
+        taken |= mask
+        partials.append(mask.astype(np.float64))
+    return partials
+
+def _pow_call_partials(args, result, needs):
+    return list(_power_partials(args[0], args[1], result, needs[0], needs[1]))
+
+# Частные производные функций нескольких аргументов: (аргументы, результат, нужные) -> список
+CALL_DERIVATIVE_KERNELS = {
+    'hypot': lambda args, result, needs: [arg / result for arg in args],
+    'pow': _pow_call_partials,
+    'min': lambda args, result, needs: _selected(args, result),
+    'max': lambda args, result, needs: _selected(args, result),
+}
+
+def gradient_batch(expr, variables=None, degrees=False, errors='raise'):
+    """Значения и градиенты выражения сразу для массивов переменных.
+
+    Обратный режим автоматического дифференцирования поверх тех же ядер,
+    что и evaluate_batch(); ошибки значений обрабатываются так же, при
+    errors='nan' NaN получают и значение, и градиент. В точках, где
+    производная не определена, градиент равен inf или NaN.
+    Возвращает (массив значений, {имя: массив частных производных}).
+    """
+    if errors not in ERROR_POLICIES:
+        raise ValueError(f"Unknown error policy: {errors}")
+
+    arrays = {name: np.asarray(value, dtype=np.float64) for name, value in (variables or {}).items()}
+    shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+    functions, partials = _angle_kernels(degrees)
+    failed = None if errors == 'raise' else np.zeros(shape, dtype=bool)
+
+    tape = []
+    slots = {}
+    values = []
+    indices = []
+    stack = [expr]
+    push = stack.append
+    pop = stack.pop
+    with np.errstate(all='ignore'):
+        while stack:
+            node = pop()
+            if node is _APPLY:
+                node = pop()
+                if isinstance(node, BinaryOp):
+                    right = values.pop()
+                    right_index = indices.pop()
+                    left = values[-1]
+                    left_index = indices[-1]
+                    result = BINARY_KERNELS[node.op](left, right, failed)
+                    values[-1] = result
+                    if left_index is None and right_index is None:
+                        continue
+                    d_left, d_right = BINARY_DERIVATIVE_KERNELS[node.op](
+                        left, right, result, left_index is not None, right_index is not None)
+                    entry = []
+                    if left_index is not None:
+                        entry.append((left_index, d_left))
+                    if right_index is not None:
+                        entry.append((right_index, d_right))
+                    indices[-1] = len(tape)
+                    tape.append(entry)
+                elif isinstance(node, Function):
+                    arg = values[-1]
+                    result = functions[node.name](arg, failed)
+                    values[-1] = result
+                    if indices[-1] is not None:
+                        tape.append(((indices[-1], partials[node.name](arg, result)),))
+                        indices[-1] = len(tape) - 1
+                elif isinstance(node, Call):
+                    count = len(node.args)
+                    args = values[-count:]
+                    arg_indices = indices[-count:]
+                    del values[-count:], indices[-count:]
+                    result = CALL_KERNELS[node.name](args, failed)
+                    values.append(result)
+                    needs = [index is not None for index in arg_indices]
+                    if not any(needs):
+                        indices.append(None)
+                        continue
+                    d_args = CALL_DERIVATIVE_KERNELS[node.name](args, result, needs)
+                    indices.append(len(tape))
+                    tape.append([(index, d) for index, d in zip(arg_indices, d_args) if index is not None])
+                else:
+                    values[-1] = np.negative(values[-1])
+                    if indices[-1] is not None:
+                        tape.append(((indices[-1], -1.0),))
+                        indices[-1] = len(tape) - 1
+            elif isinstance(node, Number):
+                values.append(np.float64(node.value))
+                indices.append(None)
+            elif isinstance(node, Variable):
+                if node.name not in arrays:
+                    raise ValueError(f"Unknown variable: {node.name}")
+                values.append(arrays[node.name])
+                if node.name not in slots:
+                    slots[node.name] = len(tape)
+                    tape.append(())
+                indices.append(slots[node.name])
+            elif isinstance(node, BinaryOp):
+                if node.op not in BINARY_KERNELS:
+                    raise ValueError(f"Unknown operator: {node.op}")
+                push(node)
+                push(_APPLY)
+                push(node.right)
+                push(node.left)
+            elif isinstance(node, UnaryOp):
+                if node.op != '-':
+                    raise ValueError(f"Unknown unary operator: {node.op}")
+                push(node)
+                push(_APPLY)
+                push(node.operand)
+            elif isinstance(node, Function):
+                if node.name not in functions:
+                    raise ValueError(f"Unsupported function: {node.name}")
+                push(node)
+                push(_APPLY)
+                push(node.arg)
+            elif isinstance(node, Call):
+                if node.name not in CALL_KERNELS:
+                    raise ValueError(f"Unsupported function: {node.name}")
+                push(node)
+                push(_APPLY)
+                stack.extend(reversed(node.args))
+            else:
+                raise TypeError("Invalid expression type")
+
+        adjoints = [None] * len(tape)
+        if indices[0] is not None:
+            adjoints[indices[0]] = np.ones(shape)
+        for i in range(len(tape) - 1, -1, -1):
+            adjoint = adjoints[i]
+            if adjoint is None:
+                continue
+            for j, partial in tape[i]:
+                contribution = adjoint * partial
+                adjoints[j] = contribution if adjoints[j] is None else adjoints[j] + contribution
+
+    result = {name: np.zeros(shape) for name in arrays}
+    for name, index in slots.items():
+        if adjoints[index] is not None:
+            result[name] = np.broadcast_to(adjoints[index], shape).copy()
+    value = np.broadcast_to(values[0], shape).copy()
+    if failed is not None:
+        value[failed] = np.nan
+        for partial in result.values():
+            partial[failed] = np.nan
+    return value, result
@@ -0,0 +1,34 @@
+import asyncio
+import threading
+import pytest
+from calculator.server import CalculatorServer
+
+class RunningServer:
+    def __init__(self, address, **options):
+        self.address = address
+        self.server = CalculatorServer(**options)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(self.address), self.loop).result()
+        return self
+
+    def __exit__(self, *exc_info):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+@pytest.fixture
+def start_server(tmp_path):
+    """Сервер в фоновом потоке: start_server(address=None, **options) - контекстный менеджер."""
+    def start(address=None, **options):
+        return RunningServer(address or f"unix:{tmp_path / 'calc.sock'}", **options)
+    return start
+
+@pytest.fixture
+def server(start_server):
+    with start_server(workers=0) as running:
+        yield running
@@ -0,0 +1,77 @@
+import math
+import pytest
+from calculator.trig import EXACT
+from calculator.parser import parse, Function, Variable
+from calculator.evaluator import evaluate
+from calculator.autodiff import derivative, gradient
+
+def _finite_difference(expr, variables, name, degrees=False, step=1e-6):
+    shifted = dict(variables)
+    shifted[name] = variables[name] + step
+    above = evaluate(expr, degrees, shifted)
+    shifted[name] = variables[name] - step
+    below = evaluate(expr, degrees, shifted)
+    return (above - below) / (2 * step)
+
+@pytest.mark.parametrize("expr_str", [
+    "x + y - 3",
+    "x * y * x",
+    "x / y",
+    "-(x ^ 3) + y ^ 0.5",
+    "2 ^ x + x ^ y",
+    "sqrt(x) + ln(y) + exp(x / y)",
+    "sin(x) * cos(y) + tg(x) - ctg(y)",
+    "arctg(x * y) + pi * e",
+    "sin(cos(tg(x))) ^ 2",
+    "hypot(x, y) * pow(x, y) + max(x, y, 1) - min(x * y, 2)",
+])
+@pytest.mark.parametrize("degrees", [False, True, EXACT])
+def test_gradient_matches_finite_differences(expr_str, degrees):
+    expr = parse(expr_str)
+    variables = {"x": 0.7, "y": 1.3}
+    value, grad = gradient(expr, variables, degrees)
+    assert value == evaluate(expr, degrees, variables)
+    for name in variables:
+        expected = _finite_difference(expr, variables, name, degrees)
+        assert grad[name] == pytest.approx(expected, rel=1e-6, abs=1e-8)
+        forward_value, forward = derivative(expr, variables, name, degrees)
+        assert forward_value == value
+        assert forward == pytest.approx(grad[name], rel=1e-12, abs=1e-15)
+
+def test_directional_derivative():
+    expr = parse("x * y + sin(x)")
+    variables = {"x": 0.5, "y": 2.0}
+    _, grad = gradient(expr, variables)
+    _, directional = derivative(expr, variables, {"x": 3.0, "y": -1.0})
+    assert directional == pytest.approx(3 * grad["x"] - grad["y"])
+
+def test_gradient_includes_unused_variables():
+    value, grad = gradient(parse("2 * x"), {"x": 1.0, "unused": 5.0})
+    assert value == 2
+    assert grad == {"x": 2.0, "unused": 0.0}
+
+def test_constant_expression_has_zero_gradient():
+    assert gradient(parse("0 ^ 0.5 + 1")) == (1.0, {})
+    assert derivative(parse("0 ^ 0.5"), wrt="x") == (0.0, 0.0)
+
+def test_repeated_variable_accumulates():
+    _, grad = gradient(parse("x + x * x + sin(x)"), {"x": 2.0})
+    assert grad["x"] == pytest.approx(1 + 4 + math.cos(2))
+
+def test_evaluation_errors_propagate():
+    with pytest.raises(ZeroDivisionError, match="Division by zero"):
+        gradient(parse("x / 0"), {"x": 1})
+    with pytest.raises(ValueError, match="Unknown variable: y"):
+        derivative(parse("x + y"), {"x": 1}, "x")
+    with pytest.raises(ValueError, match="Unsupported function: foo"):
+        gradient(Function("foo", Variable("x")), {"x": 1})
+
+def test_undefined_derivatives():
+    # Как в gradient_batch: inf или NaN вместо исключения
+    assert gradient(parse("sqrt(x)"), {"x": 0.0}) == (0.0, {"x": math.inf})
+    assert gradient(parse("x ^ 0.5"), {"x": 0.0}) == (0.0, {"x": math.inf})
+    assert gradient(parse("x / y"), {"x": 1e200, "y": 1e-100})[1]["y"] == -math.inf
+    assert math.isnan(gradient(parse("(-2) ^ x"), {"x": 2.0})[1]["x"])
+    assert math.isnan(gradient(parse("hypot(x, y)"), {"x": 0.0, "y": 0.0})[1]["x"])
+    # Показатель - константа: производная по основанию определена
+    assert gradient(parse("x ^ 2"), {"x": -3.0})[1]["x"] == -6
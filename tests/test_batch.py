@@ -0,0 +1,100 @@
+import io
+import json
+import sys
+import pytest
+from calculator.batch import read_expressions, run_batch
+from calculator.main import main, fast_arguments
+
+def test_read_expressions_skips_blank_lines():
+    stream = io.StringIO("1+1\n\n  2*3  \n")
+    assert list(read_expressions(stream)) == [(1, "1+1"), (3, "2*3")]
+
+def test_plain_output_continues_after_errors():
+    out = io.StringIO()
+    total, failed = run_batch(io.StringIO("1+1\n1/0\n2^3\n"), out)
+    assert (total, failed) == (3, 1)
+    assert out.getvalue() == "2.0\nError: Division by zero\n8.0\n"
+
+def test_csv_output():
+    out = io.StringIO()
+    run_batch(io.StringIO("1+1\n1 +\n"), out, output_format="csv")
+    lines = out.getvalue().splitlines()
+    assert lines[0] == "line,expression,result,error"
+    assert lines[1] == "1,1+1,2.0,"
+    assert lines[2].startswith("2,1 +,,")
+
+def test_json_output_with_degrees():
+    out = io.StringIO()
+    run_batch(io.StringIO("sin(90)\nsqrt(-1)\n"), out, degrees=True, output_format="json")
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert records[0] == {"line": 1, "expression": "sin(90)", "result": 1.0}
+    assert records[1]["line"] == 2
+    assert "error" in records[1]
+
+def test_json_output_is_strict_for_non_finite_results():
+    def reject(constant):
+        raise ValueError(f"non-standard JSON constant {constant}")
+
+    out = io.StringIO()
+    run_batch(io.StringIO("1e400\n-(1e400)\n1e400 - 1e400\n2\n"), out, output_format="json")
+    records = [json.loads(line, parse_constant=reject) for line in out.getvalue().splitlines()]
+    assert [record["result"] for record in records] == ["inf", "-inf", "nan", 2.0]
+    assert float(records[0]["result"]) == float("inf")
+
+def test_input_consumed_lazily():
+    consumed = []
+
+    def lines():
+        for i in range(1, 4):
+            consumed.append(i)
+            yield f"{i}\n"
+
+    out = io.StringIO()
+    results = run_batch(lines(), out)
+    assert results == (3, 0)
+    assert consumed == [1, 2, 3]
+
+def test_cli_batch_from_file(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "input.txt"
+    path.write_text("1+2\n3*4\n")
+    monkeypatch.setattr(sys, "argv", ["main.py", "--batch", str(path)])
+    main()
+    assert capsys.readouterr().out == "3.0\n12.0\n"
+
+def test_cli_batch_from_stdin_reports_failures(monkeypatch, capsys):
+    monkeypatch.setattr(sys, "stdin", io.StringIO("1+2\n1/0\n"))
+    monkeypatch.setattr(sys, "argv", ["main.py", "--batch", "--format", "json"])
+    with pytest.raises(SystemExit) as exc_info:
+        main()
+    assert exc_info.value.code == 1
+    captured = capsys.readouterr()
+    assert len(captured.out.splitlines()) == 2
+    assert "1 of 2 expressions failed" in captured.err
+
+def test_cli_single_expression(monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["main.py", "2^10"])
+    main()
+    assert capsys.readouterr().out == "1024.0\n"
+
+@pytest.mark.parametrize("argv, expected", [
+    (["sin(90)"], ("sin(90)", False)),
+    (["sin(90)", "--degrees"], ("sin(90)", True)),
+    (["--degrees", "sin(90)"], ("sin(90)", True)),
+    (["-(1)"], None),
+    (["1", "--format", "json"], None),
+    (["--batch"], None),
+    ([], None),
+])
+def test_fast_arguments(argv, expected):
+    assert fast_arguments(argv) == expected
+
+def test_cli_fast_path_matches_argparse(capsys):
+    main(["--degrees", "sin(90) * 2"])
+    assert capsys.readouterr().out == "2.0\n"
+    with pytest.raises(SystemExit):
+        main(["1 / 0"])
+    assert capsys.readouterr().err == "Error: Division by zero\n"
+    # Аргумент с '-' разбирает argparse, как и раньше
+    with pytest.raises(SystemExit):
+        main(["-(1)"])
+    assert "usage:" in capsys.readouterr().err
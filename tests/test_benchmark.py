@@ -0,0 +1,106 @@
+import json
+import pytest
+from calculator.benchmark import (
+    WORKLOADS, PHASES, measure, run, compare, phase_runner, import_times, startup, main,
+    trig_comparison, format_trig, interval_comparison, format_interval,
+    formula_library, library_comparison, format_library, thread_throughput, format_throughput,
+)
+
+def test_measure_reports_percentiles():
+    stats = measure(lambda: sum(range(100)), warmup=1, repeat=10, min_time=0)
+    assert stats["rounds"] == 10
+    assert stats["min"] <= stats["p50"] <= stats["p90"] <= stats["p99"]
+    assert stats["ops_per_sec"] > 0
+
+def test_measure_runs_at_least_min_time():
+    stats = measure(lambda: None, warmup=0, repeat=1, min_time=0.01)
+    assert stats["rounds"] > 1
+
+@pytest.mark.parametrize("name", WORKLOADS)
+def test_workloads_run_in_every_phase(name):
+    expressions = WORKLOADS[name]()
+    assert expressions
+    for phase in PHASES:
+        phase_runner(phase, expressions)()
+
+def test_unknown_phase_and_workload():
+    with pytest.raises(ValueError):
+        phase_runner("compile", ["1"])
+    with pytest.raises(ValueError):
+        run(["missing"])
+
+def test_run_report_shape():
+    report = run(["power_edges"], ["tokenize", "evaluate"], warmup=0, repeat=2, min_time=0)
+    assert set(report["results"]) == {"power_edges/tokenize", "power_edges/evaluate"}
+    assert "python" in report
+
+def _report(**p50):
+    return {"results": {name: {"p50": value} for name, value in p50.items()}}
+
+def test_compare_flags_relative_regressions():
+    baseline = _report(a=1.0, b=1.0, c=1.0)
+    current = _report(a=1.1, b=1.5, c=3.0, d=100.0)
+    assert compare(current, baseline, threshold=0.2) == [("c", 1.0, 3.0, 3.0), ("b", 1.0, 1.5, 1.5)]
+    assert compare(current, baseline, threshold=5) == []
+
+def test_cli_save_and_compare(tmp_path, capsys):
+    baseline = tmp_path / "baseline.json"
+    arguments = ["--workload", "power_edges", "--phase", "parse", "--repeat", "2", "--min-time", "0"]
+    assert main(arguments + ["--save", str(baseline)]) == 0
+    assert "power_edges/parse" in capsys.readouterr().out
+
+    # Базовая линия в 1000 раз быстрее текущей - регрессия
+    report = json.loads(baseline.read_text())
+    for stats in report["results"].values():
+        stats["p50"] /= 1000
+    baseline.write_text(json.dumps(report))
+    assert main(arguments + ["--compare", str(baseline)]) == 1
+    assert "Regression: power_edges/parse" in capsys.readouterr().err
+
+def test_import_times_reports_nested_modules():
+    times = import_times("calculator.evaluator")
+    own, cumulative = times["calculator.evaluator"]
+    assert 0 < own <= cumulative
+    assert "calculator.parser" in times
+
+def test_cli_startup_budget(capsys):
+    assert main(["--startup", "calculator.parser", "--repeat", "4"]) == 0
+    assert "calculator.parser" in capsys.readouterr().out
+    assert main(["--startup", "calculator.parser", "--repeat", "4", "--budget", "0"]) == 1
+    assert "Startup budget exceeded" in capsys.readouterr().err
+
+def test_trig_comparison_reports_accuracy():
+    results = trig_comparison(count=200, sample=100)
+    assert set(results) == {f"{grid}/{name}/{mode}" for grid in ("integer", "real")
+                            for name in ("sin", "cos", "tg", "ctg") for mode in ("degrees", "exact")}
+    for name, stats in results.items():
+        if name.endswith("/exact"):
+            assert stats["max_ulps"] <= 2
+            assert stats["special_exact"] in (None, 1.0)
+    assert results["integer/sin/degrees"]["special_exact"] < 1
+    assert "integer/tg/exact" in format_trig(results)
+
+def test_interval_comparison_bounds_contain_samples():
+    results = interval_comparison(samples=200, repeat=1)
+    assert set(results) == {"polynomial", "trig", "rational", "domain"}
+    for stats in results.values():
+        lo, hi = stats["bounds"]
+        assert lo <= stats["sampled"][0] <= stats["sampled"][1] <= hi
+    assert results["domain"]["issues"] == ["division by zero", "ln domain"]
+    assert results["polynomial"]["issues"] == []
+    assert "rational" in format_interval(results)
+
+def test_library_comparison():
+    stats = library_comparison(formula_library(300) + ["", "1 2"], repeat=1)
+    assert stats["expressions"] == 302
+    assert 0 < stats["binary_bytes"] < stats["text_bytes"]
+    assert stats["load_s"] > 0 and stats["parse_s"] > 0
+    assert "faster than parse" in format_library(stats)
+
+def test_thread_throughput():
+    results = thread_throughput(threads=(1, 2), count=400, distinct=50, repeat=1)
+    assert list(results) == [1, 2]
+    for stats in results.values():
+        assert set(stats) == {"evaluator", "locked_cache", "processes"}
+        assert all(rate > 0 for rate in stats.values())
+    assert "locked cache/s" in format_throughput(results)
@@ -0,0 +1,132 @@
+import io
+import math
+import sys
+import pytest
+from calculator.parser import parse
+from calculator.evaluator import evaluate
+
+np = pytest.importorskip("numpy")
+from calculator.bulk import evaluate_file, load_error_index, count_lines
+from main import main
+
+LINES = [
+    "1+2",
+    "  sin(90) * 2  ",
+    "1/0",
+    "",
+    "1 2",
+    "si n(1)",
+    "1 .5",
+    "x+1",
+    "é+1",
+    "1+*2",
+    "2 ^ 0.5\r",
+]
+
+def _expected(line):
+    try:
+        return evaluate(parse(line.strip()))
+    except Exception as e:
+        return str(e)
+
+@pytest.mark.parametrize("ending", ["", "\n"])
+def test_results_and_errors_match_line_by_line(tmp_path, ending):
+    path = tmp_path / "input.txt"
+    path.write_bytes(("\n".join(LINES) + ending).encode())
+    output = tmp_path / "out.npy"
+    result = evaluate_file(path, output, errors_path=tmp_path / "errors.npz")
+
+    values = np.load(output)
+    errors = dict(result.errors())
+    assert result.total == len(values) == len(LINES)
+    for i, line in enumerate(LINES):
+        expected = _expected(line)
+        if not line.strip():
+            assert math.isnan(values[i])
+            assert i not in errors
+        elif isinstance(expected, str):
+            assert math.isnan(values[i])
+            assert errors[i] == expected
+        else:
+            assert values[i] == expected
+    assert list(load_error_index(tmp_path / "errors.npz").errors()) == list(result.errors())
+
+def test_error_messages_are_deduplicated(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_text("1/0\n2/0\n3/0\n1\n")
+    result = evaluate_file(path, tmp_path / "out.npy")
+    assert result.error_lines.tolist() == [0, 1, 2]
+    assert result.messages == ["Division by zero"]
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_text("")
+    result = evaluate_file(path, tmp_path / "out.npy")
+    assert result.total == result.failed == 0
+    assert np.load(tmp_path / "out.npy").shape == (0,)
+
+def test_count_lines():
+    assert count_lines(b"") == 0
+    assert count_lines(b"1") == 1
+    assert count_lines(b"1\n") == 1
+    assert count_lines(b"1\n\n2") == 3
+
+def test_count_lines_universal_newlines(monkeypatch):
+    assert count_lines(b"1\r2\r") == 2
+    assert count_lines(b"1\r\n2\r\n") == 2
+    assert count_lines(b"1\r\r\n\n2") == 4
+    # Пара \r\n на границе блоков подсчёта - один перевод строки
+    monkeypatch.setattr("calculator.bulk._COUNT_BLOCK", 2)
+    assert count_lines(b"1\r\n2\r\n3") == 3
+
+@pytest.mark.parametrize("newline", ["\r", "\r\n", "\n"])
+def test_row_count_matches_text_batch(tmp_path, newline):
+    from calculator.batch import read_expressions, evaluate_expressions
+
+    path = tmp_path / "input.txt"
+    path.write_bytes(newline.join(["1+2", "", "2*3", "1/0", "  4 "]).encode() + b"\r\n7\r8\n")
+    result = evaluate_file(path, tmp_path / "out.npy")
+    values = np.load(tmp_path / "out.npy")
+    with open(path, encoding="utf-8") as stream:
+        assert result.total == len(values) == len(stream.readlines())
+    with open(path, encoding="utf-8") as stream:
+        expected = list(evaluate_expressions(read_expressions(stream)))
+    assert [values[line - 1] for line, _, value, _ in expected if value is not None] == \
+        [value for _, _, value, _ in expected if value is not None]
+    assert [line for line, _, _, error in expected if error] == [i + 1 for i, _ in result.errors()]
+
+def test_degrees(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_text("sin(90)\n")
+    evaluate_file(path, tmp_path / "out.npy", degrees=True)
+    assert np.load(tmp_path / "out.npy")[0] == pytest.approx(1.0)
+
+def test_cli_npy(tmp_path, monkeypatch):
+    path = tmp_path / "input.txt"
+    path.write_text("1+2\n3*4\n")
+    output = tmp_path / "out.npy"
+    monkeypatch.setattr(sys, "argv", ["main.py", "--batch", str(path), "--npy", str(output)])
+    main()
+    assert np.load(output).tolist() == [3.0, 12.0]
+    assert load_error_index(f"{output}.errors.npz").failed == 0
+
+def test_blank_lines_are_nan_not_errors(tmp_path, monkeypatch):
+    path = tmp_path / "input.txt"
+    path.write_text("1+1\n\n2*3\n   \n\t\r\n")
+    output = tmp_path / "out.npy"
+    result = evaluate_file(path, output)
+    values = np.load(output)
+    assert values[[0, 2]].tolist() == [2.0, 6.0]
+    assert np.isnan(values[[1, 3, 4]]).all()
+    assert result.total == 5 and result.failed == 0
+
+    # Код возврата тот же, что у построчного --batch
+    for extra in ([], ["--npy", str(output)]):
+        monkeypatch.setattr(sys, "argv", ["main.py", "--batch", str(path)] + extra)
+        main()
+
+def test_cli_npy_requires_file(monkeypatch):
+    monkeypatch.setattr(sys, "stdin", io.StringIO("1\n"))
+    monkeypatch.setattr(sys, "argv", ["main.py", "--batch", "--npy", "out.npy"])
+    with pytest.raises(SystemExit):
+        main()
@@ -0,0 +1,108 @@
+import threading
+import pytest
+from calculator.parser import parse, Number
+from calculator.evaluator import evaluate
+from calculator.cache import ParseCache
+
+def test_hit_on_whitespace_variants():
+    cache = ParseCache(capacity=4)
+    first = cache.parse("1 + 2 * 3")
+    second = cache.parse("1+2*3")
+    assert first is second
+    assert evaluate(second) == 7
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_spaces_between_numbers_still_rejected():
+    cache = ParseCache()
+    cache.parse("12 + 1")
+    with pytest.raises(ValueError):
+        cache.parse("1 2 + 1")
+    assert len(cache) == 1
+
+def test_errors_not_cached():
+    cache = ParseCache()
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cache.parse("1 +")
+    assert len(cache) == 0
+
+def test_lru_eviction():
+    cache = ParseCache(capacity=2)
+    a = cache.parse("1")
+    cache.parse("2")
+    cache.parse("1")
+    cache.parse("3")
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+    assert cache.parse("1") is a
+    assert cache.parse("2") is not None
+    assert cache.stats()["misses"] == 4
+
+def test_zero_capacity_disables_storage():
+    cache = ParseCache(capacity=0)
+    assert cache.parse("1+1") is not cache.parse("1+1")
+    assert len(cache) == 0
+
+def test_negative_capacity():
+    with pytest.raises(ValueError):
+        ParseCache(capacity=-1)
+
+def test_compiled_form_cached_per_angle_mode():
+    cache = ParseCache()
+    radians = cache.compile("sin(90)")
+    degrees = cache.compile("sin (90)", degrees=True)
+    assert radians is not degrees
+    assert degrees() == pytest.approx(1.0)
+    assert cache.compile("sin(90)", degrees=True) is degrees
+
+def test_compile_has_own_counters_and_storage():
+    cache = ParseCache(capacity=2)
+    tree = cache.parse("1 + x")
+    cache.compile("1 + x")
+    cache.compile("1+x")
+    cache.compile("2 * x")
+    cache.compile("3 * x")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (0, 1, 1)
+    assert stats["compiled"]["hits"] == 1 and stats["compiled"]["misses"] == 3
+    assert stats["compiled"]["evictions"] == 1
+    assert cache.parse("1 + x") is tree
+
+def test_clear():
+    cache = ParseCache()
+    cache.parse("1")
+    cache.compile("1")
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()["misses"] == 0
+    assert cache.stats()["compiled"]["size"] == 0
+
+def test_nodes_are_immutable():
+    expr = parse("1 + 2")
+    with pytest.raises(AttributeError):
+        expr.op = '-'
+    with pytest.raises(AttributeError):
+        Number(1).value = 2
+
+def test_shared_between_threads():
+    cache = ParseCache(capacity=8)
+    expressions = [f"{i} * sin({i})" for i in range(16)]
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(50):
+                for text in expressions:
+                    assert evaluate(cache.parse(text)) == evaluate(parse(text))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(cache) <= 8
@@ -0,0 +1,60 @@
+import pytest
+from calculator.trig import EXACT
+from calculator.parser import parse, Number, BinaryOp, UnaryOp, Function, Call
+from calculator.evaluator import evaluate
+from calculator.compiler import compile
+
+@pytest.mark.parametrize("expr_str", [
+    "42",
+    "1 + 2 * 3",
+    "(1 + 2) * 3 - 4 / 5",
+    "2^3^2",
+    "-(3+4)^2",
+    "3.375e+09^(1/3)",
+    "sqrt(ln(e))",
+    "sin(pi / 2) + cos(0) - tg(pi / 4) * ctg(pi / 4)",
+    "exp(1) + arctg(1)",
+    "hypot(3, 4) * max(1, 2, -(3)) - min(sin(1), 2)",
+    "pow(2, pow(2, 3)) + 1",
+])
+@pytest.mark.parametrize("degrees", [False, True, EXACT])
+def test_matches_evaluate(expr_str, degrees):
+    expr = parse(expr_str)
+    assert compile(expr, degrees=degrees)() == evaluate(expr, degrees=degrees)
+
+def test_repeated_calls():
+    compiled = compile(parse("sin(30) * 2"), degrees=True)
+    assert compiled() == compiled()
+    assert compiled() == pytest.approx(1.0)
+
+def test_arctg_degrees():
+    assert compile(Function('arctg', Number(1)), degrees=True)() == pytest.approx(45)
+
+@pytest.mark.parametrize("expr, error", [
+    (BinaryOp(Number(1), '/', Number(0)), ZeroDivisionError),
+    (BinaryOp(Number(1e300), '/', Number(1e-300)), OverflowError),
+    (BinaryOp(Number(-2), '^', Number(0.5)), ValueError),
+    (BinaryOp(Number(1), '%', Number(2)), ValueError),
+    (UnaryOp('+', Number(1)), ValueError),
+    (Function('log', Number(1)), ValueError),
+    (Call('pow', (Number(0), Number(-1))), ZeroDivisionError),
+    (Call('log', (Number(1), Number(2))), ValueError),
+    (BinaryOp(Number(1), '+', "2"), TypeError),
+])
+def test_errors_match_evaluate(expr, error):
+    with pytest.raises(error):
+        evaluate(expr)
+    compiled = compile(expr)
+    for _ in range(2):
+        with pytest.raises(error):
+            compiled()
+
+def test_error_raised_in_evaluation_order():
+    # Левый операнд вычисляется первым, как в evaluate()
+    expr = BinaryOp(BinaryOp(Number(1), '/', Number(0)), '%', Number(2))
+    with pytest.raises(ZeroDivisionError):
+        compile(expr)()
+
+def test_deep_expression():
+    expr = parse("-(" * 100_000 + "1" + ")" * 100_000)
+    assert compile(expr)() == 1
@@ -0,0 +1,133 @@
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import pytest
+from calculator.trig import EXACT
+from calculator.parser import parse
+from calculator.evaluator import evaluate
+from calculator.functions import FunctionRegistry
+from calculator.context import Evaluator
+
+EXPRESSIONS = ["1 + 2 * 3", "sin(x) * y", "1 / 0", "2 ^", "sqrt(x + y)", "tg(90)", "hypot(x, y, 2)"]
+VARIABLES = {"x": 30, "y": 2}
+
+def _expected(text, degrees=False):
+    try:
+        return evaluate(parse(text), degrees=degrees, variables=VARIABLES), None
+    except Exception as e:
+        return None, str(e)
+
+@pytest.mark.parametrize("degrees", [False, True, EXACT])
+def test_matches_evaluate(degrees):
+    evaluator = Evaluator(degrees=degrees)
+    for _ in range(2):
+        assert [evaluator._evaluate_chunk([text], VARIABLES)[0] for text in EXPRESSIONS] == \
+               [_expected(text, degrees) for text in EXPRESSIONS]
+    assert evaluator.evaluate(parse("sin(x) * y"), VARIABLES) == _expected("sin(x) * y", degrees)[0]
+
+def test_cache_and_counters():
+    evaluator = Evaluator()
+    program = evaluator.program("x * 2")
+    assert evaluator.program("x*2") is program
+    assert evaluator.evaluate("x  *  2", {"x": 4}) == 8
+    with pytest.raises(ZeroDivisionError):
+        evaluator.evaluate("1 / 0")
+    with pytest.raises(ValueError):
+        evaluator.evaluate("1 +")
+    stats = evaluator.stats()
+    assert (stats["evaluations"], stats["errors"], stats["hits"], stats["misses"]) == (3, 2, 2, 3)
+    evaluator.clear()
+    assert evaluator.stats()["evaluations"] == 0 and evaluator.stats()["cached"] == 0
+
+def test_cache_size_bounds_memory():
+    evaluator = Evaluator(cache_size=10)
+    for i in range(100):
+        assert evaluator.evaluate(f"{i} + 1") == i + 1
+    assert evaluator.stats()["cached"] <= 10
+    assert Evaluator(cache_size=0).evaluate("1+1") == 2
+    assert Evaluator(cache_size=0).stats()["cached"] == 0
+
+@pytest.mark.parametrize("cache_size", [1, 2, 3])
+def test_small_cache_never_overflows(cache_size):
+    evaluator = Evaluator(cache_size=cache_size)
+    for i in range(20):
+        assert evaluator.evaluate(f" {i} + 1 ") == i + 1
+        assert evaluator.stats()["cached"] <= cache_size
+    assert evaluator.evaluate(" 19 + 1 ") == 20
+    assert evaluator.stats()["hits"] == 1
+
+def test_precision_backend():
+    evaluator = Evaluator(precision=40)
+    assert evaluator.evaluate("1 / 3") == evaluate(parse("1 / 3"), precision=40)
+    assert isinstance(evaluator.evaluate("x", {"x": 2}), Decimal)
+
+def test_limits():
+    evaluator = Evaluator(max_length=20, max_nodes=5)
+    assert evaluator.evaluate("1 + 2 * 3") == 7
+    with pytest.raises(ValueError, match="too long"):
+        evaluator.evaluate("1 + " * 10 + "1")
+    with pytest.raises(ValueError, match="too large"):
+        evaluator.evaluate("1+2+3+4")
+    with pytest.raises(ValueError, match="too large"):
+        evaluator.evaluate(parse("1+2+3+4"))
+
+def test_user_functions():
+    functions = FunctionRegistry()
+    functions.define("sq(x) = x * x")
+    evaluator = Evaluator(functions=functions)
+    assert evaluator.evaluate("sq(3) + 1") == 10
+    with pytest.raises(ValueError, match="process pool"):
+        evaluator.evaluate_many(["sq(2)"], jobs=2, executor="process")
+    with pytest.raises(TypeError):
+        pickle.dumps(evaluator)
+
+def test_shared_between_threads():
+    evaluator = Evaluator(degrees=True, cache_size=8)
+    texts = [f"sin(x) * {i % 20} + 1 / ({i % 5} - 2)" for i in range(400)]
+    expected = [_expected(text, True) for text in texts]
+    barrier = threading.Barrier(4)
+
+    def work(offset):
+        barrier.wait()
+        return [evaluator._evaluate_chunk([text], VARIABLES)[0] for text in texts[offset:] + texts[:offset]]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(work, [0, 100, 200, 300]))
+    for offset, result in zip([0, 100, 200, 300], results):
+        assert result == expected[offset:] + expected[:offset]
+    stats = evaluator.stats()
+    assert stats["evaluations"] == 1600 and stats["errors"] == 320
+    assert stats["threads"] == 4 and stats["hits"] + stats["misses"] == 1600
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_evaluate_many(executor):
+    evaluator = Evaluator(degrees=True)
+    texts = EXPRESSIONS * 10
+    results = list(evaluator.evaluate_many(iter(texts), VARIABLES, jobs=2, chunk_size=3, executor=executor))
+    expected = [_expected(text, True) for text in texts]
+    assert results == expected
+    assert evaluator.stats()["evaluations"] == len(texts)
+    assert evaluator.stats()["errors"] == sum(error is not None for _, error in expected) == 20
+
+def test_evaluate_many_with_external_executor():
+    evaluator = Evaluator()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(evaluator.evaluate_many(EXPRESSIONS, VARIABLES, jobs=2, chunk_size=2, executor=pool))
+    assert results == [_expected(text) for text in EXPRESSIONS]
+    assert list(evaluator.evaluate_many(EXPRESSIONS, VARIABLES, jobs=1)) == results
+    assert list(evaluator.evaluate_many([], jobs=2)) == []
+
+def test_pickled_evaluator_keeps_settings():
+    copy = pickle.loads(pickle.dumps(Evaluator(degrees=EXACT, max_nodes=3)))
+    assert (copy.degrees, copy.max_nodes, copy.stats()["evaluations"]) == (EXACT, 3, 0)
+
+@pytest.mark.parametrize("options", [{"degrees": "grad"}, {"precision": 0}, {"cache_size": -1}])
+def test_invalid_settings(options):
+    with pytest.raises(ValueError):
+        Evaluator(**options)
+
+@pytest.mark.parametrize("options", [{"jobs": 0}, {"chunk_size": 0}, {"executor": "fiber"}])
+def test_invalid_evaluate_many_options(options):
+    with pytest.raises(ValueError):
+        Evaluator().evaluate_many(EXPRESSIONS, **options)
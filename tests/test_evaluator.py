@@ -1,6 +1,6 @@
 import pytest
 import math
-from calculator.parser import parse, Number, BinaryOp, UnaryOp, Function
+from calculator.parser import parse, Number, BinaryOp, UnaryOp, Function, Call
 from calculator.evaluator import evaluate
 
 @pytest.mark.parametrize("expr, result", [
@@ -37,6 +37,16 @@ def test_unary_minus():
     assert evaluate(expr) == -5
     assert evaluate(parse("-(3+4)")) == -7
 
+def test_deep_unary_chain():
+    expr = Number(5)
+    for _ in range(100_000):
+        expr = UnaryOp('-', expr)
+    assert evaluate(expr) == 5
+
+def test_unknown_unary_operator():
+    with pytest.raises(ValueError):
+        evaluate(UnaryOp('+', Number(1)))
+
 def test_nested_unary():
     expr = BinaryOp(UnaryOp('-', Number(3)), '+', Number(7))
     assert evaluate(expr) == 4
@@ -61,6 +71,47 @@ def test_negative_base_non_integer_exponent():
     with pytest.raises(ValueError):
         evaluate(expr)
 
+@pytest.mark.parametrize("expr_str, expected", [
+    ("1 ^ 36893488147419103232", 1),
+    ("0 ^ 0", 1),
+    ("0 ^ 5", 0),
+    ("(-1) ^ 3", -1),
+    ("(-1) ^ 1e300", 1),
+    ("3 ^ 40", float(3 ** 40)),
+    ("(-3) ^ 3", -27),
+    ("2 ^ 1023", 2.0 ** 1023),
+])
+def test_power_special_cases(expr_str, expected):
+    assert evaluate(parse(expr_str)) == expected
+
+@pytest.mark.parametrize("expr_str, error", [
+    ("1.000000000000001 ^ 36893488147419103232", OverflowError),
+    ("10 ^ 309", OverflowError),
+    ("2 ^ 1024", OverflowError),
+    ("0 ^ (-1)", ZeroDivisionError),
+    ("(-1) ^ 0.5", ValueError),
+])
+def test_power_errors(expr_str, error):
+    with pytest.raises(error):
+        evaluate(parse(expr_str))
+
+@pytest.mark.parametrize("left", [0.0, -0.0, 1.0, -1.0, 2.0])
+@pytest.mark.parametrize("right", [math.nan, math.inf, -math.inf, 0.0, 3.0])
+def test_power_fast_paths_match_builtin(left, right):
+    # Быстрые пути не меняют результат: 0^nan остаётся nan
+    try:
+        expected = left ** right
+    except ZeroDivisionError:
+        with pytest.raises(ZeroDivisionError):
+            evaluate(parse("x ^ y"), variables={"x": left, "y": right})
+        return
+    if left < 0 and not right.is_integer():
+        with pytest.raises(ValueError):
+            evaluate(parse("x ^ y"), variables={"x": left, "y": right})
+        return
+    result = evaluate(parse("x ^ y"), variables={"x": left, "y": right})
+    assert repr(result) == repr(float(expected))
+
 def test_exponentiation():
     assert evaluate(parse("2^3")) == 8
     assert evaluate(parse("3^2")) == 9
@@ -124,4 +175,30 @@ def test_arctg_radians(expr, expected):
 ])
 def test_arctg_degrees(expr, expected):
     result = evaluate(expr, degrees=True)
-    assert result == pytest.approx(expected, rel=1e-9)  
\ No newline at end of file
+    assert result == pytest.approx(expected, rel=1e-9)  
+
+@pytest.mark.parametrize("expr_str, expected", [
+    ("hypot(3, 4)", 5),
+    ("hypot(1, 2, 2)", 3),
+    ("pow(2, 10)", 1024),
+    ("min(3, 1, 2)", 1),
+    ("max(-(1), -(2))", -1),
+    ("max(7)", 7),
+    ("2 * max(1, min(5, 4)) ^ 2", 32),
+])
+def test_multi_argument_functions(expr_str, expected):
+    assert evaluate(parse(expr_str)) == expected
+
+@pytest.mark.parametrize("expr_str, error", [
+    ("pow(0, -1)", ZeroDivisionError),
+    ("pow(-8, 1/3)", ValueError),
+    ("hypot(1.7e308, 1.7e308)", OverflowError),
+    ("max(1, 1/0)", ZeroDivisionError),
+])
+def test_multi_argument_function_errors(expr_str, error):
+    with pytest.raises(error):
+        evaluate(parse(expr_str))
+
+def test_unknown_call():
+    with pytest.raises(ValueError, match="Unsupported function: log"):
+        evaluate(Call('log', (Number(1), Number(2))))
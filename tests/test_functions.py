@@ -0,0 +1,103 @@
+import pytest
+from calculator.parser import parse
+from calculator.evaluator import evaluate, evaluate_shared
+from calculator.compiler import compile
+from calculator.optimizer import node_statistics
+from calculator.functions import FunctionRegistry
+
+@pytest.fixture
+def registry():
+    registry = FunctionRegistry()
+    registry.define("sq(x) = x * x")
+    registry.define("dist(x1, y1, x2, y2) = hypot(x1 - x2, y1 - y2)")
+    registry.define("norm2(a, b) = sq(a) + sq(b)")
+    return registry
+
+def test_calls_are_inlined(registry):
+    expr = registry.parse("dist(0, 0, 3, 4) + norm2(1, 2) * k")
+    assert evaluate(expr, variables={"k": 2}) == 15
+    assert compile(expr)({"k": 2}) == 15
+    # После подстановки в дереве только встроенные узлы
+    assert evaluate(expr, variables={"k": 2}) == evaluate(parse("hypot(0 - 3, 0 - 4) + (1 * 1 + 2 * 2) * k"),
+                                                          variables={"k": 2})
+
+def test_argument_shared_between_uses(registry):
+    expr = registry.parse("sq(sin(y) + 1)")
+    assert expr.left is expr.right
+    assert evaluate(expr, variables={"y": 0}) == 1
+
+def test_free_variables_in_body():
+    registry = FunctionRegistry()
+    registry.define("scaled(x) = x * k")
+    assert evaluate(registry.parse("scaled(2)"), variables={"k": 3}) == 6
+
+def test_trivial_bodies():
+    registry = FunctionRegistry()
+    registry.define("first(x, y) = x")
+    registry.define("const(x) = 2 ^ 10")
+    arg = parse("sin(y)")
+    assert registry.inline("first", (arg, parse("1"))) is arg
+    assert evaluate(registry.parse("const(first(3, 4)) + first(3, 4)")) == 1027
+
+def test_parameters_do_not_capture_arguments(registry):
+    # Аргумент x2 подставляется вместо x1, а не переименовывается дальше
+    expr = registry.parse("dist(x2, 0, 1, 0)")
+    assert evaluate(expr, variables={"x2": 4}) == 3
+
+def test_plain_parse_does_not_know_user_functions(registry):
+    with pytest.raises(ValueError):
+        parse("sq(2)")
+    assert "sq" in registry
+    assert list(registry) == ["sq", "dist", "norm2"]
+    assert registry["dist"].params == ("x1", "y1", "x2", "y2")
+
+@pytest.mark.parametrize("definition, message", [
+    ("f(x) = f(x) + 1", "Recursive function definition: f"),
+    ("sin(x) = x", "Name is reserved: sin"),
+    ("f(pi) = pi", "Name is reserved: pi"),
+    ("f(x, x) = x", "Duplicate parameter in function f"),
+    ("f(sq) = sq", "Parameter name is already a function: sq"),
+    ("f = 1", "Function definition must look like"),
+    ("f(x,) = x", "Function definition must look like"),
+    ("f(1) = 1", "Invalid parameter name: 1"),
+    ("f(x) = sq(x, x)", "Function sq takes 1 arguments, got 2"),
+])
+def test_invalid_definitions(registry, definition, message):
+    with pytest.raises(ValueError, match=message.replace("(", r"\(").replace(")", r"\)")):
+        registry.define(definition)
+    assert "f" not in registry
+
+def test_wrong_argument_count(registry):
+    with pytest.raises(ValueError, match="Function dist takes 4 arguments, got 2"):
+        registry.parse("dist(1, 2)")
+
+def test_redefinition_keeps_parsed_expressions(registry):
+    before = registry.parse("sq(3)")
+    registry.define("sq(x) = x * x * x")
+    assert evaluate(before) == 9
+    assert evaluate(registry.parse("sq(3)")) == 27
+    registry.remove("sq")
+    assert "sq" not in registry
+
+def test_depth_guard():
+    registry = FunctionRegistry(max_depth=3)
+    registry.define("a(x) = x + 1")
+    registry.define("b(x) = a(x) * 2")
+    registry.define("c(x) = b(x) - 1")
+    assert registry["c"].depth == 3
+    with pytest.raises(ValueError, match="Function nesting is too deep: d"):
+        registry.define("d(x) = c(x)")
+
+def test_size_guard():
+    registry = FunctionRegistry(max_nodes=1000)
+    registry.define("twice(x) = x + x")
+    for i in range(1, 4):
+        registry.define(f"t{i}(x) = {'twice' if i == 1 else f't{i - 1}'}(twice(x))")
+    expr = registry.parse("t3(1)")
+    stats = node_statistics(expr)
+    # Дерево растёт экспоненциально, а число различных узлов - линейно
+    assert stats["tree_nodes"] == 31
+    assert stats["unique_nodes"] == 5
+    assert evaluate_shared(expr) == 16
+    with pytest.raises(ValueError, match="expands to"):
+        registry.parse("t3(t3(t3(x)))")
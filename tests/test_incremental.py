@@ -0,0 +1,114 @@
+import math
+import random
+import pytest
+from calculator.parser import parse
+from calculator.evaluator import evaluate
+from calculator.incremental import ExpressionSession
+
+def _outcome(function):
+    try:
+        return "ok", function()
+    except Exception as e:
+        return type(e).__name__, str(e)
+
+def _same(a, b):
+    if a[0] == "ok" and b[0] == "ok" and math.isnan(a[1]) and math.isnan(b[1]):
+        return True
+    return a == b
+
+def test_initial_value_matches_full_evaluation():
+    session = ExpressionSession("2 * (3 + sin(4)) - (5 ^ 2) / 7")
+    assert session.value == evaluate(parse(session.text))
+
+def test_edit_inside_group_reparses_only_that_group():
+    terms = [f"({i} + {i})" for i in range(50)]
+    session = ExpressionSession(" * ".join(terms))
+    before = session.reparsed_chars
+    session.edit(1, 2, "7")
+    assert session.text.startswith("(7 + 0)")
+    assert session.value == evaluate(parse(session.text))
+    assert session.reparsed_chars - before < 2 * len("(7 + 0)") + len(session.text) // 5
+
+def test_edit_reevaluates_only_path_to_root():
+    session = ExpressionSession("((1 + 2) * (3 + 4)) + ((5 + 6) * (7 + 8))")
+    before = session.evaluated_groups
+    session.edit(2, 3, "9")
+    assert session.value == evaluate(parse(session.text))
+    # (9 + 2), внешняя скобка и корень
+    assert session.evaluated_groups - before == 3
+
+def test_set_text_diffs_against_previous_text():
+    session = ExpressionSession("sin(1) + cos(2)")
+    session.set_text("sin(1) + cos(25)")
+    assert session.value == evaluate(parse("sin(1) + cos(25)"))
+    session.set_text("sin(1) + (cos(25))")
+    assert session.value == evaluate(parse("sin(1) + (cos(25))"))
+
+def test_unbalanced_edit_reports_parse_error_and_recovers():
+    session = ExpressionSession("2 * (3 + 4)")
+    session.edit(5, 5, "(")
+    with pytest.raises(ValueError) as excinfo:
+        session.value
+    with pytest.raises(ValueError) as expected:
+        parse(session.text)
+    assert str(excinfo.value) == str(expected.value)
+    session.edit(5, 6, "")
+    assert session.value == 14
+
+def test_evaluation_error_matches_evaluate():
+    session = ExpressionSession("1 / (2 - 2)")
+    with pytest.raises(ZeroDivisionError):
+        session.value
+    session.edit(9, 10, "1")
+    assert session.value == 1
+
+def test_variables_and_degrees():
+    session = ExpressionSession("sin(x) + (y * 2)", degrees=True, variables={"x": 30, "y": 1})
+    assert session.value == pytest.approx(2.5)
+    session.set_variables({"x": 90, "y": 0})
+    assert session.value == pytest.approx(1)
+    session.set_variables({"x": 90})
+    with pytest.raises(ValueError, match="Unknown variable: y"):
+        session.value
+
+def test_tree_matches_parse():
+    text = "-(1 + 2) * sin((3)) ^ (4 - e)"
+    session = ExpressionSession(text)
+    assert evaluate(session.tree) == evaluate(parse(text))
+
+def test_edit_out_of_bounds():
+    session = ExpressionSession("1 + 2")
+    with pytest.raises(ValueError, match="out of bounds"):
+        session.edit(3, 10, "")
+
+def test_multi_argument_calls_reparse_whole_text():
+    session = ExpressionSession("max(1, (2 + 3)) * (4 + 5)")
+    assert session.value == 45
+    session.set_text("max(1, (2 + 7)) * (4 + 5)")
+    assert session.value == 81
+    assert session.reparsed_chars == 2 * len(session.text)
+    # Без запятых правки снова разбираются по группам
+    session.set_text("max((2 + 7)) * (4 + 5)")
+    before = session.reparsed_chars
+    session.set_text("max((2 + 8)) * (4 + 5)")
+    assert session.value == 90
+    assert session.reparsed_chars - before == len("2 + 8")
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_edits_match_full_evaluation(seed):
+    rng = random.Random(seed)
+    alphabet = list("0123456789+-*/^() .,") + ["sin", "pi", "e", "ln", "(", ")", "sqrt(", "max("]
+    for _ in range(100):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 15)))
+        session = ExpressionSession(text)
+        for _ in range(15):
+            start = rng.randint(0, len(text))
+            end = rng.randint(start, min(len(text), start + 3))
+            replacement = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 3)))
+            text = text[:start] + replacement + text[end:]
+            if rng.random() < 0.5:
+                session.edit(start, end, replacement)
+            else:
+                session.set_text(text)
+            assert session.text == text
+            assert _same(_outcome(lambda: session.value), _outcome(lambda: evaluate(parse(text))))
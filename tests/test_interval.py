@@ -0,0 +1,108 @@
+import math
+import random
+import pytest
+from calculator.trig import EXACT
+from calculator.parser import parse
+from calculator.evaluator import evaluate
+from calculator.interval import (
+    Interval, evaluate_interval,
+    DIVISION_BY_ZERO, NEGATIVE_BASE, LN_DOMAIN, SQRT_DOMAIN, OVERFLOW,
+)
+
+CASES = [
+    ("x^2 - 2*x + 1", {"x": (-3, 4)}),
+    ("x * y - x / (y + 3)", {"x": (-2, 5), "y": (-1, 2)}),
+    ("sin(x) + cos(2 * x)", {"x": (-1, 2.5)}),
+    ("sin(x) * cos(x)", {"x": (100, 700)}),
+    ("tg(x) - ctg(x + 2)", {"x": (-1.2, 1.2)}),
+    ("arctg(x) * exp(0 - x)", {"x": (-3, 3)}),
+    ("sqrt(x) + ln(x + 1)", {"x": (0, 9)}),
+    ("x ^ y", {"x": (0.5, 3), "y": (-2, 2.5)}),
+    ("x ^ 3 + x ^ (-2)", {"x": (-2, -0.5)}),
+    ("hypot(x, y) - min(x, y, 1) + max(x, 2) + pow(y, 2)", {"x": (-3, 3), "y": (-1, 4)}),
+    ("-(x - 1) ^ 4", {"x": (-1, 2)}),
+]
+
+def _samples(expr, ranges, degrees, count=400, seed=0):
+    rng = random.Random(seed)
+    bounds = {name: (value, value) if isinstance(value, (int, float)) else value for name, value in ranges.items()}
+    points = [{name: lo for name, (lo, _) in bounds.items()}, {name: hi for name, (_, hi) in bounds.items()}]
+    points += [{name: rng.uniform(lo, hi) for name, (lo, hi) in bounds.items()} for _ in range(count)]
+    for point in points:
+        try:
+            yield evaluate(expr, degrees=degrees, variables=point)
+        except (ValueError, ZeroDivisionError, OverflowError):
+            pass
+
+@pytest.mark.parametrize("degrees", [False, True, EXACT])
+@pytest.mark.parametrize("text, ranges", CASES)
+def test_bounds_contain_samples(text, ranges, degrees):
+    expr = parse(text)
+    result, issues = evaluate_interval(expr, ranges, degrees=degrees)
+    assert not any(issue.certain for issue in issues)
+    for value in _samples(expr, ranges, degrees):
+        assert value in result, (value, result)
+
+def test_bounds_are_tight_for_monotonic_expressions():
+    result, issues = evaluate_interval(parse("2 * x + 1"), {"x": (0, 1)})
+    assert issues == []
+    assert result.lo <= 1 and result.hi >= 3
+    assert result.width < 2 + 1e-12
+    assert evaluate_interval(parse("sin(x)"), {"x": (0, 360)}, degrees=True)[0] == Interval(-1.0, 1.0)
+    assert evaluate_interval(parse("x - x"), {"x": (0, 1)})[0].lo < 0     # зависимость переменных не учитывается
+
+def test_point_ranges_match_evaluate():
+    expr = parse("sin(x) * y ^ 2 + ln(y)")
+    result, _ = evaluate_interval(expr, {"x": 0.5, "y": Interval(3.0)})
+    expected = evaluate(expr, variables={"x": 0.5, "y": 3.0})
+    assert expected in result
+    assert result.width <= 16 * math.ulp(expected)
+
+@pytest.mark.parametrize("text, ranges, kind, certain", [
+    ("1 / x", {"x": (-1, 1)}, DIVISION_BY_ZERO, False),
+    ("x / 0", {"x": (1, 2)}, DIVISION_BY_ZERO, True),
+    ("x ^ (-2)", {"x": 0}, DIVISION_BY_ZERO, True),
+    ("x ^ (-1)", {"x": (0, 2)}, DIVISION_BY_ZERO, False),
+    ("x ^ 0.5", {"x": (-1, 4)}, NEGATIVE_BASE, False),
+    ("x ^ y", {"x": (-3, -1), "y": (0.2, 0.8)}, NEGATIVE_BASE, True),
+    ("ln(x)", {"x": (0, 5)}, LN_DOMAIN, False),
+    ("ln(x)", {"x": (-5, 0)}, LN_DOMAIN, True),
+    ("sqrt(x)", {"x": (-1, 1)}, SQRT_DOMAIN, False),
+    ("sqrt(x - 3)", {"x": (0, 2)}, SQRT_DOMAIN, True),
+    ("exp(x)", {"x": (0, 800)}, OVERFLOW, False),
+    ("exp(x)", {"x": (800, 900)}, OVERFLOW, True),
+    ("x ^ 200", {"x": (1e3, 1e4)}, OVERFLOW, True),
+    ("ctg(x)", {"x": (-0.5, 0.5)}, DIVISION_BY_ZERO, False),
+])
+def test_domain_issues(text, ranges, kind, certain):
+    expr = parse(text)
+    result, issues = evaluate_interval(expr, ranges)
+    assert (issues[0].kind, issues[0].certain) == (kind, certain)
+    # Рядом с полюсом результат может ещё и переполниться
+    assert all(issue.kind == OVERFLOW for issue in issues[1:])
+    assert issues[0].message.startswith("Certain" if certain else "Possible")
+    assert (result is None) == certain
+
+def test_certain_issue_propagates_to_ancestors():
+    result, issues = evaluate_interval(parse("1 + sin(sqrt(x))"), {"x": (-4, -1)})
+    assert result is None
+    assert [issue.kind for issue in issues] == [SQRT_DOMAIN]
+
+def test_safe_expression_has_no_issues():
+    for text, ranges in [("sqrt(x ^ 2 + 1)", {"x": (-5, 5)}), ("ln(exp(x) + 1)", {"x": (-10, 10)}),
+                         ("1 / (x ^ 2 + 1)", {"x": (-1e6, 1e6)}), ("tg(x)", {"x": (-80, 80)})]:
+        assert evaluate_interval(parse(text), ranges, degrees="tg" in text)[1] == []
+
+def test_exact_degree_poles():
+    expr = parse("tg(x)")
+    assert [issue.kind for issue in evaluate_interval(expr, {"x": (80, 100)}, degrees=EXACT)[1]] == [DIVISION_BY_ZERO]
+    # В обычных градусах tg(90) - огромное число, а не ошибка
+    result, issues = evaluate_interval(expr, {"x": (80, 100)}, degrees=True)
+    assert issues == [] and result == Interval(-math.inf, math.inf)
+    assert evaluate_interval(expr, {"x": 90}, degrees=EXACT)[0] is None
+
+def test_invalid_input():
+    with pytest.raises(ValueError, match="Unknown variable"):
+        evaluate_interval(parse("x + y"), {"x": (0, 1)})
+    with pytest.raises(ValueError, match="Invalid interval"):
+        evaluate_interval(parse("x"), {"x": (2, 1)})
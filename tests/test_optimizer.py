@@ -0,0 +1,146 @@
+import pytest
+from calculator.trig import EXACT
+from calculator.parser import parse, Number, BinaryOp, UnaryOp, Function, Variable
+from calculator.evaluator import evaluate, evaluate_shared
+from calculator.optimizer import optimize, count_nodes, share, node_statistics
+
+def test_folds_constant_expression():
+    expr = optimize(parse("sin(pi/2)^2 + cos(pi/2)^2"))
+    assert isinstance(expr, Number)
+    assert expr.value == pytest.approx(1.0)
+
+def test_folds_multi_argument_calls():
+    assert optimize(parse("hypot(3, 4) + max(1, 2)")).value == 7
+    expr = optimize(parse("max(x, 2 * 3)"))
+    assert expr.args[1].value == 6
+    # Ошибка свёртки откладывается до вычисления
+    assert optimize(parse("pow(0, -1)")).name == "pow"
+
+def test_folds_constant_prefix():
+    expr = optimize(parse("2*pi/360*x"))
+    assert isinstance(expr, BinaryOp)
+    assert isinstance(expr.left, Number)
+    assert isinstance(expr.right, Variable)
+    assert count_nodes(expr) == 3
+
+def test_folding_respects_degrees():
+    assert optimize(parse("sin(90)"), degrees=True).value == pytest.approx(1.0)
+    assert optimize(parse("sin(90)")).value == pytest.approx(0.8939966636)
+
+@pytest.mark.parametrize("expr_str", ["x*1", "1*x", "x-0", "x-(0-0)", "x^1", "-(-(x))"])
+def test_identities_removed(expr_str):
+    expr = optimize(parse(expr_str))
+    assert isinstance(expr, Variable)
+
+@pytest.mark.parametrize("expr_str", ["x+0", "0+x", "x-(-(0))"])
+def test_zero_identities_keep_sign_of_zero(expr_str):
+    # -0.0 + 0 == 0.0, поэтому x + 0 нельзя заменить на x
+    expr = optimize(parse(expr_str))
+    assert isinstance(expr, BinaryOp)
+    assert repr(evaluate(expr, variables={"x": -0.0})) == repr(evaluate(parse(expr_str), variables={"x": -0.0}))
+    assert isinstance(optimize(BinaryOp(Variable("x"), '+', Number(-0.0))), Variable)
+
+def test_folded_literals_keep_exact_text():
+    expr = optimize(parse("(0.1 + 0.2) * x - (-(0.5)) / 4"))
+    assert expr.left.left.text == "0.3" and expr.right.text == "-0.125"
+    assert evaluate(expr, precision=40, variables={"x": 1}) == evaluate(parse("0.3 * x + 0.125"), precision=40,
+                                                                        variables={"x": 1})
+    assert evaluate(expr, variables={"x": 1}) == evaluate(parse("(0.1 + 0.2) * x - (-(0.5)) / 4"), variables={"x": 1})
+    # Неточные свёртки и константы точной записи не имеют
+    assert optimize(parse("1 / 3")).text is None
+    assert optimize(parse("pi * 2")).text is None
+
+def test_division_by_one_kept():
+    # x / 1 выбрасывает OverflowError для бесконечного x
+    assert isinstance(optimize(parse("x/1")), BinaryOp)
+
+def test_error_deferred_to_evaluation():
+    expr = optimize(parse("x + 1/0"))
+    with pytest.raises(ZeroDivisionError):
+        evaluate(expr, variables={"x": 1.0})
+
+def test_strict_raises_at_optimize_time():
+    with pytest.raises(ZeroDivisionError):
+        optimize(parse("x + 1/0"), strict=True)
+    with pytest.raises(ValueError):
+        optimize(parse("sqrt(-1)"), strict=True)
+
+def test_unknown_nodes_kept():
+    expr = BinaryOp(Number(1), '%', Number(2))
+    assert optimize(expr) is expr
+    expr = UnaryOp('+', Number(1))
+    assert optimize(expr) is expr
+    expr = Function('log', Number(1))
+    assert optimize(expr) is expr
+
+def test_unchanged_tree_reused():
+    expr = parse("x * y + sin(z)")
+    assert optimize(expr) is expr
+
+@pytest.mark.parametrize("expr_str", [
+    "1 + 2 * 3 - x / 4",
+    "sqrt(ln(e)) * x ^ 2",
+    "-(x + 0) * (2 ^ 3) + arctg(1)",
+    "exp(1) * (x - 0) / (y * 1)",
+    "max(x, 1 + 2) * hypot(3, 4) - pow(y, 2 * 1)",
+])
+@pytest.mark.parametrize("degrees", [False, True, EXACT])
+def test_results_preserved(expr_str, degrees):
+    expr = parse(expr_str)
+    variables = {"x": 1.5, "y": -2.0}
+    assert evaluate(optimize(expr, degrees), degrees, variables) == evaluate(expr, degrees, variables)
+
+def test_deep_expression():
+    expr = optimize(parse("-(" * 100_000 + "x" + ")" * 100_000))
+    assert isinstance(expr, Variable)
+
+def test_count_nodes():
+    assert count_nodes(parse("1 + sin(-(2))")) == 5
+
+def test_share_merges_identical_subtrees():
+    expr = share(parse("sin(x*pi/180) + sin(x*pi/180) * cos(x*pi/180)"))
+    first = expr.left
+    second = expr.right.left
+    assert first is second
+    assert expr.right.right.arg is first.arg
+
+def test_share_keeps_distinct_literals_apart():
+    expr = share(parse("(1 + x) * (1.0 + x) * (x + 1)"))
+    stats = node_statistics(expr)
+    # 1 и 1.0 записаны по-разному, x + 1 - другое поддерево
+    assert stats["unique_nodes"] == 8
+
+def test_node_statistics():
+    tree = parse("(x + 1) * (x + 1) + (x + 1)")
+    # parse() уже разделяет одинаковые литералы
+    assert node_statistics(tree) == {"tree_nodes": 11, "unique_nodes": 9, "shared_nodes": 1}
+    assert node_statistics(share(tree)) == {"tree_nodes": 11, "unique_nodes": 5, "shared_nodes": 1}
+    assert count_nodes(share(tree)) == count_nodes(tree)
+
+@pytest.mark.parametrize("expr_str", [
+    "sin(x*pi/180) ^ 2 + cos(x*pi/180) ^ 2 - sin(x*pi/180)",
+    "-(x + 2) * (0 - (x + 2)) / (x + 2)",
+    "ln(exp(x)) + ln(exp(x)) * ln(exp(x))",
+    "max(x, 1) + max(x, 1) * hypot(x, max(x, 1))",
+])
+@pytest.mark.parametrize("degrees", [False, True, EXACT])
+def test_evaluate_shared_matches_evaluate(expr_str, degrees):
+    tree = parse(expr_str)
+    variables = {"x": 1.5}
+    expected = evaluate(tree, degrees, variables)
+    assert evaluate_shared(share(tree), degrees, variables) == expected
+    assert evaluate_shared(tree, degrees, variables) == expected
+
+def test_evaluate_shared_raises_like_evaluate():
+    expr = share(parse("(x - x) + 1 / (x - x)"))
+    with pytest.raises(ZeroDivisionError, match="Division by zero"):
+        evaluate_shared(expr, variables={"x": 2})
+
+def test_share_is_linear_on_deep_dag():
+    # Каждый уровень ссылается на предыдущий дважды: 2^60 узлов в развёрнутом виде
+    expr = Variable("x")
+    for _ in range(60):
+        expr = BinaryOp(expr, '+', expr)
+    shared = share(expr)
+    assert node_statistics(shared) == {"tree_nodes": 2 ** 61 - 1, "unique_nodes": 61, "shared_nodes": 60}
+    assert evaluate_shared(shared, variables={"x": 1}) == 2 ** 60
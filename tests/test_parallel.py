@@ -0,0 +1,29 @@
+import pytest
+from calculator.batch import evaluate_expressions
+from calculator.parallel import evaluate_parallel
+
+ITEMS = [(i, expr) for i, expr in enumerate(["1+1", "1/0", "sin(90)", "2^", "sqrt(16)"] * 20, start=1)]
+
+def test_ordered_matches_serial():
+    expected = list(evaluate_expressions(ITEMS, degrees=True))
+    assert list(evaluate_parallel(ITEMS, degrees=True, jobs=2, chunk_size=7)) == expected
+
+def test_unordered_contains_all_results():
+    expected = list(evaluate_expressions(ITEMS))
+    results = list(evaluate_parallel(ITEMS, jobs=2, chunk_size=3, ordered=False))
+    assert sorted(results, key=lambda item: item[0]) == expected
+
+def test_errors_isolated_per_item():
+    results = list(evaluate_parallel(ITEMS[:5], jobs=2, chunk_size=1))
+    assert [error is None for _, _, _, error in results] == [True, False, True, False, True]
+
+def test_single_job_runs_in_process():
+    assert list(evaluate_parallel(ITEMS, jobs=1)) == list(evaluate_expressions(ITEMS))
+
+def test_empty_input():
+    assert list(evaluate_parallel([], jobs=2)) == []
+
+@pytest.mark.parametrize("options", [{"jobs": 0}, {"chunk_size": 0}])
+def test_invalid_options(options):
+    with pytest.raises(ValueError):
+        evaluate_parallel(ITEMS, **options)
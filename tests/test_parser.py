@@ -1,5 +1,6 @@
+import re
 import pytest
-from calculator.parser import parse, Number, BinaryOp, UnaryOp, Function
+from calculator.parser import parse, Number, BinaryOp, UnaryOp, Function, Call, tokenize, tokenize_buffer, canonicalize
 from calculator.evaluator import evaluate
 
 def test_single_number():
@@ -204,4 +205,61 @@ def test_parse_arctg():
     assert isinstance(expr, Function)
     assert expr.name == "arctg"
     assert isinstance(expr.arg, Number)
-    assert expr.arg.value == 1
\ No newline at end of file
+    assert expr.arg.value == 1
+
+@pytest.mark.parametrize("expression", [
+    "1+2*sin(x)^2.5e+3",
+    "12.5e-3/(4-pi)",
+    "1 + 2",
+    "si n(1)",
+    "1+*2",
+    "1+@",
+    "1+*2 3",
+    "é+1",
+    "",
+])
+def test_tokenize_buffer_matches_tokenize(expression):
+    data = b"##" + expression.encode() + b"\n##"
+    try:
+        expected = tokenize(expression)
+    except ValueError as e:
+        with pytest.raises(ValueError, match=re.escape(str(e))):
+            tokenize_buffer(memoryview(data), 2, len(data) - 3)
+    else:
+        assert tokenize_buffer(data, 2, len(data) - 3) == expected
+
+@pytest.mark.parametrize("expression, expected", [
+    ("3.2*sin(0.5)+1", ("#*sin(#)+#", [3.2, 0.5, 1.0])),
+    ("x12 + 2.5e-3 * y", ("x12+#*y", [0.0025])),
+    ("-(4) ^ 2", ("-(#)^#", [4.0, 2.0])),
+    ("pi", ("pi", [])),
+])
+def test_canonicalize(expression, expected):
+    assert canonicalize(expression) == expected
+
+@pytest.mark.parametrize("expression", ["1 2 + 3", "1.5.3", "#+1", "1 + .5"])
+def test_canonicalize_without_shape(expression):
+    assert canonicalize(expression) is None
+
+def test_parse_multi_argument_call():
+    expr = parse("max(1, x + 2, -(3)) * 2")
+    call = expr.left
+    assert isinstance(call, Call)
+    assert call.name == "max"
+    assert len(call.args) == 3
+    assert isinstance(call.args[1], BinaryOp)
+    assert isinstance(call.args[2], UnaryOp)
+
+@pytest.mark.parametrize("expression, message", [
+    ("pow(1)", "Function pow takes 2 arguments, got 1"),
+    ("pow(1, 2, 3)", "Function pow takes 2 arguments, got 3"),
+    ("max(1,", "Unexpected end of expression"),
+    ("max(1, 2", "Missing closing parenthesis after function arguments"),
+    ("max", "Expected '(' after function name"),
+    ("max(, 1)", "Unexpected token: ,"),
+    ("(1, 2)", "Missing closing parenthesis"),
+    ("sin(1, 2)", "Missing closing parenthesis after function argument"),
+])
+def test_multi_argument_call_errors(expression, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        parse(expression)
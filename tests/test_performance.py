@@ -1,38 +1,612 @@
-from calculator.evaluator import evaluate
+from calculator.evaluator import evaluate, evaluate_shared
 from calculator.parser import parse
+from calculator.compiler import compile
+from calculator.cache import ParseCache
+from calculator.optimizer import optimize, count_nodes, share, node_statistics
+from calculator.benchmark import measure
+import gc
+import random
+import statistics
+import tracemalloc
 import pytest
 import time
 
+def _latency(function, heavy=False):
+    # Медиана нескольких прогонов после разогрева: одиночный замер слишком шумный
+    if heavy:
+        return measure(function, warmup=0, repeat=1, min_time=0)['p50']
+    return measure(function, warmup=1, repeat=5, min_time=0)['p50']
+
+def _interleaved(*functions, rounds=7):
+    # Варианты чередуются по раундам, чтобы всплеск нагрузки на машине
+    # задел их одинаково; сравниваются медианы замеров measure()
+    for function in functions:
+        function()
+    timings = [[] for _ in functions]
+    for _ in range(rounds):
+        for function, samples in zip(functions, timings):
+            samples.append(measure(function, warmup=0, repeat=1, min_time=0)['p50'])
+    return [statistics.median(samples) for samples in timings]
+
 def test_large_number_expression():
-    large_expr = "1" + "0" * 100  
+    large_expr = "1" + "0" * 100
     expr = f"{large_expr} + 1"
-    start = time.time()
-    result = evaluate(parse(expr))
-    end = time.time()
-    assert result > 10**100
-    assert (end - start) < 0.2, "Execution time exceeded 200ms for large numbers"
+    assert evaluate(parse(expr)) > 10**100
+    assert _latency(lambda: evaluate(parse(expr))) < 0.2, "Execution time exceeded 200ms for large numbers"
+
+@pytest.mark.parametrize("depth, limit", [
+    (100, 0.2),
+    (100_000, 2.0),
+])
+def test_deeply_nested_expression(depth, limit):
+    expr = "sin(" * depth + "pi/2" + ")" * depth
+    result = None
+
+    def run():
+        nonlocal result
+        result = evaluate(parse(expr))
+
+    elapsed = _latency(run, heavy=depth > 1000)
+    assert -1 <= result <= 1
+    assert elapsed < limit, f"Execution time exceeded {limit}s for deeply nested expression"
+
+def test_long_left_leaning_chain():
+    expr = " + ".join(["1"] * 100_000)
+    result = None
+
+    def run():
+        nonlocal result
+        result = evaluate(parse(expr))
 
-def test_deeply_nested_expression():
-    expr = "sin(" * 100 + "pi/2" + ")" * 100
-    start = time.time()
-    result = evaluate(parse(expr))
-    end = time.time()
-    assert -1 <= result <= 1  
-    assert (end - start) < 0.2, "Execution time exceeded 200ms for deeply nested expression"
+    elapsed = _latency(run, heavy=True)
+    assert result == 100_000
+    assert elapsed < 2.0
 
 
 @pytest.mark.parametrize("expression", [
     " + ".join(["1"] * 1000),
-    "1.000000000000001 ^ 36893488147419103232",  
-    "1 ^ 36893488147419103232",  
-    " + ".join(["10000000000000000000000000000000"] * 50), 
-    "1 + (2 + (3 + (4 + (5 + (6 + (7 + (8 + (9 + (10))))))))",  
+    "1.000000000000001 ^ 36893488147419103232",
+    "1 ^ 36893488147419103232",
+    " + ".join(["10000000000000000000000000000000"] * 50),
+    "1 + (2 + (3 + (4 + (5 + (6 + (7 + (8 + (9 + (10))))))))",
 ])
 def test_heavy_expression_performance(expression):
-    start = time.time()
+    def run():
+        try:
+            evaluate(parse(expression))
+        except Exception:
+            pass
+
+    assert _latency(run) < 0.2
+
+
+def _best_parse_time(expression, repeat=3, parser=parse):
+    best = float("inf")
+    gc.disable()
     try:
-        result = evaluate(parse(expression))
-    except Exception:
-        result = None
-    end = time.time()
-    assert (end - start) < 0.2
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parser(expression)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best
+
+def test_parse_scales_linearly():
+    # n слагаемых дают 2n - 1 лексем: от ~1k до ~100k
+    timings = {}
+    for terms in (500, 5000, 50000):
+        expression = " + ".join(["1"] * terms)
+        timings[terms] = _best_parse_time(expression) / terms
+    # При квадратичной сложности время на лексему выросло бы в ~100 раз
+    assert timings[50000] < timings[500] * 5, f"Parse time per token grows superlinearly: {timings}"
+
+
+def test_compiled_evaluation_is_faster():
+    expr = parse("2*pi/360*sin(3.5)^2 + cos(1.2)^2 - ln(exp(2))/sqrt(16) + arctg(1)*3")
+    compiled = compile(expr)
+    runs = 2000
+
+    def walk():
+        for _ in range(runs):
+            evaluate(expr)
+
+    def run_compiled():
+        for _ in range(runs):
+            compiled()
+
+    compiled_time, tree_time = _interleaved(run_compiled, walk)
+    assert compiled() == evaluate(expr)
+    assert compiled_time < tree_time, f"compiled {compiled_time:.4f}s vs tree walker {tree_time:.4f}s"
+
+
+def test_batch_evaluation_is_faster_than_point_loop():
+    np = pytest.importorskip("numpy")
+    from calculator.vectorized import evaluate_batch
+
+    expr = parse("sin(x) ^ 2 + cos(x) ^ 2 * sqrt(x) / (1 + x)")
+    points = np.linspace(0.1, 100, 10_000)
+
+    batch = evaluate_batch(expr, {"x": points})
+    scalar = [evaluate(expr, variables={"x": x}) for x in points.tolist()]
+    batch_time, loop_time = _interleaved(
+        lambda: evaluate_batch(expr, {"x": points}),
+        lambda: [evaluate(expr, variables={"x": x}) for x in points.tolist()],
+        rounds=5,
+    )
+    assert batch.tolist() == pytest.approx(scalar, rel=1e-12)
+    assert batch_time * 10 < loop_time, f"batch {batch_time:.4f}s vs loop {loop_time:.4f}s"
+
+
+def test_parse_cache_on_zipf_workload():
+    rng = random.Random(0)
+    distinct = [f"{i} * sin({i} / 7) + sqrt({i}) ^ 2 - ln({i} + 1)" for i in range(1, 2001)]
+    weights = [1 / rank ** 1.1 for rank in range(1, len(distinct) + 1)]
+    workload = rng.choices(distinct, weights=weights, k=20_000)
+
+    hit_rates = {}
+
+    def runner(capacity):
+        def run():
+            cache = ParseCache(capacity=capacity)
+            for text in workload:
+                cache.parse(text)
+            hit_rates[capacity] = cache.stats()["hit_rate"]
+        return run
+
+    for capacity in (100, 500):
+        runner(capacity)()
+    # Время сравнивается только у крайних ёмкостей: без кэша и с полным кэшем
+    full, uncached = _interleaved(runner(2000), runner(0), rounds=3)
+
+    rates = [hit_rates[capacity] for capacity in (0, 100, 500, 2000)]
+    assert rates == sorted(rates)
+    assert hit_rates[2000] > 0.8
+    assert full < uncached, f"hit rates {hit_rates}, full cache {full:.3f}s vs no cache {uncached:.3f}s"
+
+
+def test_optimized_tree_is_smaller_and_faster():
+    expr = parse("2*pi/360*x + (sin(pi/2)^2 + cos(pi/2)^2) * y * 1 + ln(e^3) - 0")
+    optimized = optimize(expr)
+    variables = {"x": 90.0, "y": 2.0}
+    runs = 2000
+
+    def runner(tree):
+        def run():
+            for _ in range(runs):
+                evaluate(tree, variables=variables)
+        return run
+
+    optimized_time, original_time = _interleaved(runner(optimized), runner(expr))
+    assert evaluate(optimized, variables=variables) == pytest.approx(evaluate(expr, variables=variables))
+    assert count_nodes(optimized) * 2 < count_nodes(expr)
+    assert optimized_time < original_time, f"optimized {optimized_time:.4f}s vs original {original_time:.4f}s"
+
+
+# Узлы с __dict__, как до перехода на __slots__, для сравнения памяти
+class _DictNumber:
+    def __init__(self, value):
+        self.value = value
+
+class _DictBinaryOp:
+    def __init__(self, left, op, right):
+        self.left = left
+        self.op = op
+        self.right = right
+
+class _DictFunction:
+    def __init__(self, name, arg):
+        self.name = name
+        self.arg = arg
+
+class _DictVariable:
+    def __init__(self, name):
+        self.name = name
+
+def _dict_sum_tree(terms, make_term):
+    tree = make_term()
+    for _ in range(terms - 1):
+        tree = _DictBinaryOp(tree, '+', make_term())
+    return tree
+
+def _traced_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.parametrize("term, make_dict_term", [
+    ("1.5", lambda: _DictNumber(float("1.5"))),
+    ("sin(x) * 2.5", lambda: _DictBinaryOp(
+        _DictFunction("sin", _DictVariable("x")), '*', _DictNumber(float("2.5")))),
+], ids=["literals", "mixed"])
+def test_ast_bytes_per_node(term, make_dict_term):
+    terms = 20_000
+    expr, slots_bytes = _traced_bytes(lambda: parse(" + ".join([term] * terms)))
+    _, dict_bytes = _traced_bytes(lambda: _dict_sum_tree(terms, make_dict_term))
+    nodes = count_nodes(expr)
+    slots_per_node = slots_bytes / nodes
+    dict_per_node = dict_bytes / nodes
+    assert slots_per_node < dict_per_node * 0.6, f"{slots_per_node:.1f} vs {dict_per_node:.1f} bytes per node"
+
+
+def test_parallel_evaluation_scales():
+    from calculator.parallel import available_cpus, evaluate_parallel
+
+    jobs = min(available_cpus(), 4)
+    if jobs < 2:
+        pytest.skip("needs at least two CPUs")
+    items = [(i, f"sin({i}) * sqrt({i}) + ln({i} + 1) ^ 2") for i in range(1, 100_001)]
+
+    def runner(workers):
+        def run():
+            for _ in evaluate_parallel(items, jobs=workers, chunk_size=2000):
+                pass
+        return run
+
+    timings = dict(zip((1, jobs), _interleaved(runner(1), runner(jobs), rounds=3)))
+    assert timings[jobs] < timings[1], f"wall time by worker count: {timings}"
+
+
+def test_server_latency_and_throughput(server):
+    from calculator.client import Client
+
+    requests = [{"expression": f"sin({i % 50}) * 2 + 1"} for i in range(5000)]
+    with Client(server.address) as client:
+        sequential = measure(lambda: client.evaluate("sin(7) * 2 + 1"), warmup=20, repeat=500, min_time=0)
+        responses = client.evaluate_many(requests)
+        pipelined = _latency(lambda: client.evaluate_many(requests)) / len(requests)
+
+    assert all("result" in response for response in responses)
+    # Относительные пороги: конвейер экономит круговые задержки, а хвост
+    # задержек не должен отрываться от медианы на порядки
+    assert pipelined * 1.5 < sequential["p50"], \
+        f"pipelined {pipelined * 1e6:.1f}us vs round trip {sequential['p50'] * 1e6:.1f}us per request"
+    assert sequential["p99"] < sequential["p50"] * 50, \
+        f"p50 {sequential['p50'] * 1e3:.3f}ms, p99 {sequential['p99'] * 1e3:.3f}ms"
+
+
+@pytest.mark.parametrize("precision", [200, 500])
+def test_precise_evaluation_cost(precision):
+    from calculator.precise import evaluate_precise, pi, e
+
+    expr = parse("sin(1) + cos(2) * tg(3) / ctg(4) + ln(5) + exp(6) + arctg(7) + sqrt(8) + pi ^ e")
+
+    def runner(digits):
+        def run():
+            # Константы считаются заново: измеряется полная стоимость вычисления
+            pi.cache_clear()
+            e.cache_clear()
+            return evaluate_precise(expr, precision=digits)
+        return run
+
+    assert float(runner(precision)()) == pytest.approx(evaluate(expr), rel=1e-12)
+    base, elapsed = _interleaved(runner(50), runner(precision), rounds=5)
+    # Стоимость растёт медленнее квадрата числа цифр (сейчас ~p^1.5);
+    # ряды без сокращения аргумента и деления двоичным разбиением росли бы быстрее
+    limit = (precision / 50) ** 2
+    assert elapsed < base * limit, \
+        f"{precision} digits {elapsed * 1e3:.1f}ms vs 50 digits {base * 1e3:.1f}ms (limit x{limit:.0f})"
+
+
+@pytest.mark.parametrize("expression", [
+    "1.000000000000001 ^ 36893488147419103232",
+    "1 ^ 36893488147419103232",
+    "(-1) ^ 36893488147419103232",
+    "0 ^ 36893488147419103232",
+    "2 ^ 1023",
+    "9007199254740993 ^ 17",
+    "10 ^ 400",
+    "1e308 / 1e-308",
+    "1e-308 / 1e308",
+    "1 / 0",
+])
+def test_adversarial_power_and_division(expression):
+    expr = parse(expression)
+    runs = 1000
+    start = time.perf_counter()
+    for _ in range(runs):
+        try:
+            evaluate(expr)
+        except (OverflowError, ZeroDivisionError):
+            pass
+    per_eval = (time.perf_counter() - start) / runs
+    assert per_eval < 1e-4, f"{per_eval * 1e6:.1f}us per evaluation"
+
+
+def test_incremental_typing_into_long_expression():
+    from calculator.incremental import ExpressionSession
+
+    text = " + ".join(f"({i} * sin({i}) + {i})" for i in range(420))
+    assert len(text) > 10_000
+    session = ExpressionSession(text)
+    # Печатаем по одному символу внутрь группы в середине выражения
+    position = text.index("(200 * sin(200)") + 1
+    keystrokes = "12345678"
+
+    for i, char in enumerate(keystrokes):
+        session.edit(position + i, position + i, char)
+    full_text = text[:position] + keystrokes + text[position:]
+    assert session.text == full_text
+    assert session.value == evaluate(parse(full_text))
+
+    # Замер: те же символы стираются и набираются снова, текст после
+    # прогона прежний, поэтому прогоны можно повторять
+    def type_incrementally():
+        for i in range(len(keystrokes) - 1, -1, -1):
+            session.edit(position + i, position + i + 1, "")
+        for i, char in enumerate(keystrokes):
+            session.edit(position + i, position + i, char)
+
+    def reparse():
+        for i in range(len(keystrokes) - 1, -1, -1):
+            evaluate(parse(text[:position] + keystrokes[:i] + text[position:]))
+        for i in range(len(keystrokes)):
+            evaluate(parse(text[:position] + keystrokes[:i + 1] + text[position:]))
+
+    incremental, full = _interleaved(type_incrementally, reparse, rounds=5)
+    assert session.text == full_text
+    assert incremental * 5 < full, f"incremental {incremental * 1e3:.2f}ms vs full {full * 1e3:.2f}ms"
+
+
+def _many_variable_expression(n):
+    terms = [f"sin(x{i}) * x{(i + 1) % n} ^ 2 + exp(x{i} / {i + 1})" for i in range(n)]
+    variables = {f"x{i}": 0.5 + i / n for i in range(n)}
+    return parse(" + ".join(terms)), variables
+
+
+def test_gradient_faster_than_finite_differences():
+    from calculator.autodiff import gradient
+
+    expr, variables = _many_variable_expression(150)
+    step = 1e-6
+
+    def finite_differences():
+        base = evaluate(expr, variables=variables)
+        finite = {}
+        for name in variables:
+            shifted = dict(variables)
+            shifted[name] += step
+            finite[name] = (evaluate(expr, variables=shifted) - base) / step
+        return base, finite
+
+    value, grad = gradient(expr, variables)
+    base, finite = finite_differences()
+    reverse, differences = _interleaved(lambda: gradient(expr, variables), finite_differences, rounds=5)
+
+    assert value == base
+    for name in variables:
+        assert grad[name] == pytest.approx(finite[name], rel=1e-4, abs=1e-4)
+    assert reverse * 20 < differences, f"reverse {reverse * 1e3:.2f}ms vs differences {differences * 1e3:.2f}ms"
+
+
+def test_gradient_batch_faster_than_finite_differences():
+    np = pytest.importorskip("numpy")
+    from calculator.vectorized import evaluate_batch, gradient_batch
+
+    expr, scalars = _many_variable_expression(60)
+    rng = np.random.default_rng(0)
+    variables = {name: value + rng.random(1000) for name, value in scalars.items()}
+
+    def finite_differences():
+        evaluate_batch(expr, variables)
+        for name in variables:
+            shifted = dict(variables)
+            shifted[name] = variables[name] + 1e-6
+            evaluate_batch(expr, shifted)
+
+    values, grads = gradient_batch(expr, variables)
+    assert np.allclose(values, evaluate_batch(expr, variables))
+    reverse, differences = _interleaved(lambda: gradient_batch(expr, variables), finite_differences, rounds=3)
+
+    assert reverse * 10 < differences, f"reverse {reverse * 1e3:.2f}ms vs differences {differences * 1e3:.2f}ms"
+
+
+def test_shared_evaluation_on_repeated_subtrees():
+    angle = "sin(x*pi/180) * cos(y*pi/180) + cos(x*pi/180) * sin(y*pi/180)"
+    tree = parse(" + ".join(f"({angle}) * {i} - sqrt(({angle}) ^ 2 + {i})" for i in range(50)))
+    dag = share(tree)
+    stats = node_statistics(dag)
+    assert stats["tree_nodes"] == count_nodes(tree)
+    assert stats["unique_nodes"] * 5 < stats["tree_nodes"]
+
+    variables = {"x": 30.0, "y": 45.0}
+    runs = 50
+
+    def walk_tree():
+        for _ in range(runs):
+            evaluate(tree, variables=variables)
+
+    def walk_dag():
+        for _ in range(runs):
+            evaluate_shared(dag, variables=variables)
+
+    dag_time, tree_time = _interleaved(walk_dag, walk_tree)
+    assert evaluate_shared(dag, variables=variables) == evaluate(tree, variables=variables)
+    assert dag_time * 2 < tree_time, f"dag {dag_time * 1e3:.2f}ms vs tree {tree_time * 1e3:.2f}ms"
+
+
+def test_disabled_profiling_overhead():
+    from calculator import profiling
+    from calculator.evaluator import _evaluate
+    from calculator.parser import tokenize, parse_tokens
+
+    assert profiling.active is None
+    expression = "sin(x) * 2 + 1"
+    variables = {"x": 1.0}
+    runs = 10000
+
+    candidates = {
+        "hooked": lambda: evaluate(parse(expression), variables=variables),
+        "direct": lambda: _evaluate(parse_tokens(tokenize(expression)), False, variables, None),
+    }
+    best = dict.fromkeys(candidates, float("inf"))
+    # Замеры чередуются, чтобы колебания фоновой нагрузки влияли на оба одинаково
+    for _ in range(7):
+        for name, function in candidates.items():
+            start = time.perf_counter()
+            for _ in range(runs):
+                function()
+            best[name] = min(best[name], time.perf_counter() - start)
+    hooked, direct = best["hooked"], best["direct"]
+    assert hooked < direct * 1.15, f"hooked {hooked * 1e3:.1f}ms vs direct {direct * 1e3:.1f}ms"
+
+
+def test_bulk_file_faster_than_line_reader(tmp_path):
+    np = pytest.importorskip("numpy")
+    from calculator.batch import run_batch
+    from calculator.bulk import evaluate_file
+
+    # Короткие выражения: основная доля времени - ввод-вывод, а не вычисление
+    rng = random.Random(1)
+    lines = [f"{rng.random() * 1000:.6f}" if i % 4 else f"{rng.randint(1, 99)}/7" for i in range(50_000)]
+    path = tmp_path / "input.txt"
+    path.write_text("\n".join(lines) + "\n")
+
+    plain = bulk = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        with open(path, encoding="utf-8") as stream, open(tmp_path / "out.txt", "w") as out:
+            assert run_batch(stream, out) == (len(lines), 0)
+        plain = min(plain, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        result = evaluate_file(path, tmp_path / "out.npy")
+        bulk = min(bulk, time.perf_counter() - start)
+
+    assert result.total == len(lines) and result.failed == 0
+    values = np.load(tmp_path / "out.npy", mmap_mode="r")
+    assert values.tolist() == [float(line) for line in (tmp_path / "out.txt").read_text().splitlines()]
+    assert bulk < plain, f"bulk {bulk:.2f}s vs line reader {plain:.2f}s"
+
+
+def test_template_cache_faster_than_parsing_each_instance():
+    pytest.importorskip("numpy")
+    from calculator.templates import TemplateCache
+
+    rng = random.Random(2)
+    expressions = [f"{rng.uniform(0, 10):.4f} * sin({rng.uniform(0, 3):.3f}) + {rng.randint(1, 99)} / {rng.randint(1, 9)}"
+                   for _ in range(5000)]
+
+    cache = TemplateCache()
+    scalar = [cache.evaluate(expression) for expression in expressions]
+    assert cache.stats()["hit_rate"] > 0.99
+    batched = cache.evaluate_many(expressions)
+    expected = [evaluate(parse(expression)) for expression in expressions]
+    assert scalar == expected
+    assert [value for value, _ in batched] == pytest.approx(expected, rel=1e-12)
+
+    cached, many, plain = _interleaved(lambda: [cache.evaluate(expression) for expression in expressions],
+                                       lambda: cache.evaluate_many(expressions),
+                                       lambda: [evaluate(parse(expression)) for expression in expressions])
+    assert cached * 1.3 < plain, f"cached {cached * 1e3:.0f}ms vs parse {plain * 1e3:.0f}ms"
+    assert many * 1.8 < plain, f"batched {many * 1e3:.0f}ms vs parse {plain * 1e3:.0f}ms"
+
+
+def test_registered_functions_faster_than_textual_expansion():
+    from calculator.parser import tokenize
+    from calculator.functions import FunctionRegistry
+
+    body = "sqrt((x1 - x2) ^ 2 + (y1 - y2) ^ 2) * exp(-(x1 * x2 + y1 * y2) / 100) + hypot(x1, y1, x2, y2)"
+    registry = FunctionRegistry()
+    registry.define(f"kernel(x1, y1, x2, y2) = {body}")
+
+    rng = random.Random(3)
+    calls = [[f"{rng.uniform(0, 5):.3f}", "x", f"{rng.uniform(0, 5):.3f}", f"sin({rng.randint(1, 9)})"]
+             for _ in range(200)]
+    params = registry["kernel"].params
+    # Текстовая подстановка: каждый вызов заменяется полным телом функции
+    expanded = " + ".join(
+        " ".join(f"({args[params.index(token)]})" if token in params else token for token in tokenize(body))
+        for args in calls)
+    text = " + ".join(f"kernel({', '.join(args)})" for args in calls)
+
+    assert evaluate(registry.parse(text), variables={"x": 2}) == pytest.approx(
+        evaluate(parse(expanded), variables={"x": 2}), rel=1e-12)
+    registered, textual = _interleaved(lambda: registry.parse(text), lambda: parse(expanded), rounds=9)
+    assert registered * 1.25 < textual, f"registry {registered * 1e3:.1f}ms vs expansion {textual * 1e3:.1f}ms"
+
+
+def test_cli_startup_imports():
+    from calculator.benchmark import startup
+
+    # Абсолютное время импорта зависит от машины, поэтому проверяется
+    # набор модулей: с argparse, json и socket импорт был вдвое дольше
+    total, times = startup("calculator.main", repeat=1)
+    heavy = {"argparse", "asyncio", "re", "json", "csv", "socket", "threading", "decimal", "numpy"} & set(times)
+    assert not heavy, f"imported at startup: {sorted(heavy)}"
+    assert total > 0
+
+
+def test_exact_degrees_faster_on_integer_grid():
+    from calculator.evaluator import resolve_function
+    from calculator.trig import EXACT
+
+    grid = [float(x) for x in range(-720, 720)] * 50
+
+    def runner(degrees):
+        functions = [resolve_function(name, degrees) for name in ("sin", "cos")]
+
+        def run():
+            for function in functions:
+                for x in grid:
+                    function(x)
+        return run
+
+    exact, libm = _interleaved(runner(EXACT), runner(True))
+    assert exact * 1.15 < libm, f"exact {exact * 1e3:.1f}ms vs libm {libm * 1e3:.1f}ms"
+
+
+def test_interval_faster_than_sampling():
+    from calculator.interval import evaluate_interval
+
+    expr = parse("sin(x) * cos(y) + sqrt(x ^ 2 + y ^ 2) / (y ^ 2 + 1)")
+    ranges = {"x": (-3.0, 3.0), "y": (-2.0, 2.0)}
+    rng = random.Random(0)
+    points = [{"x": rng.uniform(-3, 3), "y": rng.uniform(-2, 2)} for _ in range(5000)]
+    bounds, issues = evaluate_interval(expr, ranges)
+    values = [evaluate(expr, variables=point) for point in points]
+    assert issues == []
+    assert all(value in bounds for value in values)
+    interval_time = _latency(lambda: evaluate_interval(expr, ranges))
+    sampling_time = _latency(lambda: [evaluate(expr, variables=point) for point in points], heavy=True)
+    assert interval_time * 100 < sampling_time, f"interval {interval_time * 1e3:.3f}ms vs sampling {sampling_time * 1e3:.1f}ms"
+
+
+def test_library_loads_faster_than_parse():
+    from calculator.benchmark import formula_library
+    from calculator.serialize import dumps, loads
+
+    lines = formula_library(5000)
+    trees = [parse(line) for line in lines]
+    data = dumps(trees)
+    assert list(map(count_nodes, loads(data))) == list(map(count_nodes, trees))
+    load, parsing = _interleaved(lambda: loads(data), lambda: [parse(line) for line in lines])
+    assert load * 1.5 < parsing, f"load {load * 1e3:.1f}ms vs parse {parsing * 1e3:.1f}ms"
+
+
+def test_shared_evaluator_faster_than_parse_and_evaluate():
+    from concurrent.futures import ThreadPoolExecutor
+    from calculator.benchmark import formula_library
+    from calculator.context import Evaluator
+
+    lines = formula_library(200) * 10
+    variables = {"x": 0.7, "y": 1.3, "z": 2.5}
+    evaluator = Evaluator()
+
+    def direct():
+        for line in lines:
+            try:
+                evaluate(parse(line), variables=variables)
+            except Exception:
+                pass
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        def shared():
+            list(evaluator.evaluate_many(lines, variables, jobs=4, chunk_size=250, executor=pool))
+
+        shared_time, direct_time = _interleaved(shared, direct, rounds=5)
+    assert shared_time * 3 < direct_time, f"evaluator {shared_time * 1e3:.1f}ms vs parse+evaluate {direct_time * 1e3:.1f}ms"
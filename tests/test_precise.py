@@ -0,0 +1,100 @@
+import decimal
+from decimal import Decimal
+import pytest
+from calculator.parser import parse, Number, BinaryOp, UnaryOp, Function
+from calculator.evaluator import evaluate
+from calculator.precise import evaluate_precise, pi
+
+PI_100 = ("3.14159265358979323846264338327950288419716939937510"
+          "58209749445923078164062862089986280348253421170679")
+
+def test_literals_keep_all_digits():
+    assert evaluate_precise(parse("1 + 0.0000000000000000000001")) == Decimal("1.0000000000000000000001")
+    assert evaluate_precise(parse("1" + "0" * 100 + " + 1")) == Decimal(10) ** 100 + 1
+
+def test_pi_to_requested_digits():
+    assert str(evaluate_precise(parse("pi"), precision=110)).startswith(PI_100)
+    assert str(pi(120)).startswith(PI_100)
+
+def test_result_rounded_to_precision():
+    result = evaluate_precise(parse("1/3"), precision=20)
+    assert result == Decimal("0.33333333333333333333")
+
+@pytest.mark.parametrize("expr_str", [
+    "1 + 2 * 3 - 4 / 5",
+    "2 ^ 10 - 3.5 ^ 2",
+    "sqrt(2) * ln(10) + exp(1.5)",
+    "sin(1) + cos(2) + tg(3) + ctg(4) + arctg(5)",
+    "sin(-7.5) * cos(100) + arctg(-0.25)",
+    "-(2)^3",
+    "hypot(3, 4.5) + pow(2, 0.5) - max(1, 2, 3) * min(4, 5)",
+])
+@pytest.mark.parametrize("degrees", [False, True])
+def test_agrees_with_float_evaluate(expr_str, degrees):
+    expr = parse(expr_str)
+    precise = evaluate_precise(expr, precision=40, degrees=degrees)
+    assert float(precise) == pytest.approx(evaluate(expr, degrees=degrees), rel=1e-12)
+
+@pytest.mark.parametrize("expr_str, expected", [
+    ("sin(pi / 6)", "0.5"),
+    ("arctg(1) * 4 - pi", "0"),
+    ("sin(1.2) ^ 2 + cos(1.2) ^ 2", "1"),
+    ("exp(ln(7))", "7"),
+    ("sqrt(2) ^ 2", "2"),
+])
+def test_identities(expr_str, expected):
+    result = evaluate_precise(parse(expr_str), precision=200)
+    assert abs(result - Decimal(expected)) < Decimal("1e-195")
+
+def test_degrees():
+    assert evaluate_precise(parse("arctg(1)"), precision=30, degrees=True) == 45
+    assert abs(evaluate_precise(parse("sin(30)"), degrees=True) - Decimal("0.5")) < Decimal("1e-45")
+
+def test_huge_power_does_not_overflow():
+    result = evaluate_precise(parse("1.000000000000001 ^ 36893488147419103232"), precision=30)
+    assert result.adjusted() == 16022
+
+def test_range_not_limited_to_float():
+    # evaluate() выбрасывает OverflowError, Decimal - нет
+    for text in ("10^400", "exp(1000)", "10^400 / 10^399"):
+        with pytest.raises(OverflowError):
+            evaluate(parse(text))
+    assert evaluate_precise(parse("10^400"), precision=20) == Decimal("1e400")
+    assert evaluate_precise(parse("10^400 / 10^399"), precision=20) == 10
+    assert evaluate_precise(parse("exp(1000)"), precision=20).adjusted() == 434
+
+def test_huge_trigonometric_argument_rejected():
+    assert abs(evaluate_precise(parse("sin(1e300)"), precision=20)) <= 1
+    for text in ("sin(1e100000)", "cos(10 ^ 5000)", "tg(1e2000)"):
+        with pytest.raises(ValueError, match="too large"):
+            evaluate_precise(parse(text), precision=20)
+    with pytest.raises(ValueError, match="too large"):
+        evaluate_precise(parse("ctg(1e2000)"), precision=20, degrees=True)
+
+@pytest.mark.parametrize("expr, error", [
+    (BinaryOp(Number(1), '/', Number(0)), ZeroDivisionError),
+    (BinaryOp(Number(-2), '^', Number(0.5)), ValueError),
+    (BinaryOp(Number(0), '^', UnaryOp('-', Number(1))), ZeroDivisionError),
+    (Function('sqrt', Number(-1)), ValueError),
+    (Function('ln', Number(0)), ValueError),
+    (Function('ctg', Number(0)), ZeroDivisionError),
+    (Function('log', Number(1)), ValueError),
+    (BinaryOp(Number(1), '%', Number(2)), ValueError),
+    (Function('exp', Number(1e300)), OverflowError),
+])
+def test_errors(expr, error):
+    with pytest.raises(error):
+        evaluate_precise(expr)
+
+def test_selectable_per_call():
+    expr = parse("0.1 + 0.2")
+    assert evaluate(expr) == 0.30000000000000004
+    assert evaluate(expr, precision=30) == Decimal("0.3")
+
+def test_variables():
+    assert evaluate_precise(parse("x * 3"), variables={"x": 0.1}) == Decimal("0.3")
+
+def test_context_not_leaked():
+    before = decimal.getcontext().prec
+    evaluate_precise(parse("sin(1)"), precision=300)
+    assert decimal.getcontext().prec == before
@@ -0,0 +1,89 @@
+import json
+import sys
+import pytest
+from calculator import profiling
+from calculator.parser import parse
+from calculator.evaluator import evaluate
+from calculator.optimizer import optimize
+from calculator.profiling import Profiler, tree_statistics
+from main import main
+
+def test_disabled_by_default():
+    assert profiling.active is None
+    assert evaluate(parse("1 + 2")) == 3
+
+def test_phase_timers_and_call_counters():
+    with Profiler() as profiler:
+        expr = parse("sin(x) + sin(2) * (-(3))")
+        evaluate(optimize(expr), variables={"x": 1})
+        evaluate(expr, variables={"x": 2})
+    assert profiling.active is None
+    snapshot = profiler.snapshot()
+    phases = snapshot["phases"]
+    assert phases["tokenize"]["calls"] == 1
+    assert phases["parse"]["calls"] == 1
+    assert phases["optimize"]["calls"] == 1
+    assert phases["evaluate"]["calls"] == 2
+    assert all(stats["total"] >= stats["max"] >= 0 for stats in phases.values())
+    # Оптимизированное дерево: sin(x) + const; исходное - полностью
+    assert snapshot["calls"] == {"sin": 3, "+": 2, "*": 1, "unary -": 1}
+
+def test_errors_are_counted_per_phase():
+    with Profiler() as profiler:
+        with pytest.raises(ValueError):
+            parse("1 + @")
+        with pytest.raises(ValueError):
+            parse("1 +")
+        with pytest.raises(ZeroDivisionError):
+            evaluate(parse("1 / 0"))
+    phases = profiler.snapshot()["phases"]
+    assert phases["tokenize"]["calls"] == 3
+    assert phases["tokenize"]["errors"] == 1
+    assert phases["parse"]["calls"] == 2
+    assert phases["parse"]["errors"] == 1
+    assert phases["evaluate"]["errors"] == 1
+    assert profiler.snapshot()["calls"] == {}
+
+def test_histograms():
+    assert tree_statistics(parse("(1 + 2) * 3"))[:2] == (5, 3)
+    with Profiler() as profiler:
+        parse("1")
+        parse("(1 + 2) * 3")
+        parse("1 + 2 + 3 + 4")
+    snapshot = profiler.snapshot()
+    assert snapshot["size_histogram"] == {"1": 1, "8": 2}
+    assert snapshot["depth_histogram"] == {"1": 1, "4": 2}
+
+def test_slow_log():
+    with Profiler(slow_threshold=0, slow_log_size=2) as profiler:
+        evaluate(parse("2 ^ 10"))
+    slow = profiler.snapshot()["slow"]
+    assert [entry["phase"] for entry in slow] == ["parse", "evaluate"]
+    assert all(entry["expression"] == "2 ^ 10" for entry in slow)
+
+def test_snapshot_is_json_and_reset():
+    profiler = profiling.enable(Profiler())
+    try:
+        evaluate(parse("1 + 1"))
+    finally:
+        profiling.disable()
+    assert json.loads(profiler.to_json())["phases"]["evaluate"]["calls"] == 1
+    profiler.reset()
+    assert profiler.snapshot()["phases"]["evaluate"]["calls"] == 0
+
+def test_cli_profile(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "profile.json"
+    monkeypatch.setattr(sys, "argv", ["main.py", "sin(90) * 2", "--degrees", "--profile", str(path)])
+    main()
+    assert capsys.readouterr().out == "2.0\n"
+    snapshot = json.loads(path.read_text())
+    assert snapshot["calls"] == {"sin": 1, "*": 1}
+    assert profiling.active is None
+
+def test_cli_profile_to_stderr(monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["main.py", "1 / 0", "--profile"])
+    with pytest.raises(SystemExit):
+        main()
+    err = capsys.readouterr().err
+    assert err.startswith("Error: Division by zero\n")
+    assert json.loads(err.split("\n", 1)[1])["phases"]["evaluate"]["errors"] == 1
@@ -0,0 +1,162 @@
+import math
+import mmap
+import struct
+import pytest
+from calculator.trig import EXACT
+from calculator.parser import parse, Number, Function, Variable, BinaryOp
+from calculator.evaluator import evaluate
+from calculator.optimizer import optimize, share, count_nodes
+from calculator.serialize import dumps, loads, dump, load, read_header, precompile, MAGIC, VERSION
+
+EXPRESSIONS = [
+    "1 + 2 * 3",
+    "sin(x) ^ 2 + cos(x) ^ 2",
+    "-(x - y) / (z + 1)",
+    "hypot(x, 3, -(y)) - min(x, 2) * max(1, y, z) + pow(x, 0.5)",
+    "tg(x) + ctg(y) + ln(z) + exp(1) + sqrt(x) + arctg(y)",
+    "pi * e ^ 2",
+    "x",
+    "42",
+    "2 ^ 3 ^ 2 - 10 / 4 / 2",
+]
+VARIABLES = {"x": 0.7, "y": 1.3, "z": 2.5}
+
+def _same(a, b):
+    # Структурное равенство деревьев (запись литерала может опускаться)
+    stack = [(a, b)]
+    while stack:
+        a, b = stack.pop()
+        assert type(a) is type(b)
+        if isinstance(a, Number):
+            assert repr(a.value) == repr(b.value)
+        elif isinstance(a, Variable):
+            assert a.name == b.name
+        elif isinstance(a, BinaryOp):
+            assert a.op == b.op
+            stack += [(a.left, b.left), (a.right, b.right)]
+        elif isinstance(a, Function):
+            assert a.name == b.name
+            stack.append((a.arg, b.arg))
+        elif hasattr(a, "args"):
+            assert a.name == b.name and len(a.args) == len(b.args)
+            stack += zip(a.args, b.args)
+        else:
+            assert a.op == b.op
+            stack.append((a.operand, b.operand))
+
+def test_round_trip():
+    trees = [parse(text) for text in EXPRESSIONS]
+    loaded = loads(dumps(trees))
+    assert len(loaded) == len(trees)
+    for tree, copy in zip(trees, loaded):
+        _same(tree, copy)
+        assert evaluate(copy, variables=VARIABLES) == evaluate(tree, variables=VARIABLES)
+
+def test_missing_entries_and_empty_library():
+    assert loads(dumps([None, parse("1"), None]))[::2] == [None, None]
+    assert loads(dumps([])) == []
+
+def test_precise_literals_keep_text():
+    tree = parse("pi + 0.1000000000000000000001 + 3")
+    copy = loads(dumps([tree]))[0]
+    assert evaluate(copy, precision=40) == evaluate(tree, precision=40)
+    assert copy.left.left.text == "pi"
+    # Запись, совпадающая с float, не хранится
+    assert copy.right.text is None
+
+def test_signed_zero_and_special_values():
+    trees = [Number(-0.0), Number(0.0), Number(math.inf), Number(1e-320)]
+    loaded = loads(dumps(trees))
+    assert [repr(node.value) for node in loaded] == ["-0.0", "0.0", "inf", "1e-320"]
+    assert loaded[0] is not loaded[1]
+
+def test_shared_subtrees_stay_shared():
+    dag = share(parse("sin(x * 2) * sin(x * 2) + sin(x * 2)"))
+    copy = loads(dumps([dag]))[0]
+    assert copy.left.left is copy.left.right is copy.right
+    # Одинаковые поддеревья разных выражений тоже становятся одним объектом
+    first, second = loads(dumps([parse("cos(y) + 1"), parse("cos(y) * 2")]))
+    assert first.left is second.left
+
+def test_custom_function_names():
+    tree = BinaryOp(Function("custom", Variable("x")), "+", Number(1.0))
+    copy = loads(dumps([tree]))[0]
+    assert copy.left.name == "custom" and copy.left.arg.name == "x"
+
+def test_large_and_deep_libraries():
+    # Ссылки длиннее двух байт и листья, записанные заново
+    trees = [parse(f"x * {i} + sin(y / {i + 0.5})") for i in range(5000)]
+    trees = [parse("cos(z) * 3")] + trees + [parse("cos(z) + 1")]
+    loaded = loads(dumps(trees))
+    assert loaded[-1].left is loaded[0].left
+    assert [evaluate(tree, variables=VARIABLES) for tree in loaded[::250]] == \
+           [evaluate(tree, variables=VARIABLES) for tree in trees[::250]]
+    deep = parse("sin(" * 20000 + "x" + ")" * 20000)
+    copy = loads(dumps([deep]))[0]
+    assert count_nodes(copy) == 20001
+    assert evaluate(copy, variables=VARIABLES) == evaluate(deep, variables=VARIABLES)
+
+@pytest.mark.parametrize("degrees", [False, True, EXACT])
+def test_optimized_libraries_record_angle_mode(degrees):
+    data = dumps([optimize(parse("sin(30) * x"), degrees)], degrees)
+    assert read_header(data) == degrees
+    assert evaluate(loads(data, degrees)[0], degrees=degrees, variables=VARIABLES) == \
+           evaluate(parse("sin(30) * x"), degrees=degrees, variables=VARIABLES)
+    other = False if degrees else True
+    with pytest.raises(ValueError, match="optimized for"):
+        loads(data, other)
+    assert read_header(dumps([parse("sin(30)")])) is None
+    with pytest.raises(ValueError, match="Unknown angle mode"):
+        dumps([], degrees="grad")
+
+def test_corrupted_data_is_rejected():
+    data = dumps([parse(text) for text in EXPRESSIONS])
+    flipped = bytearray(data)
+    flipped[-5] ^= 0xff
+    cases = [
+        (b"XXXX" + data[4:], "Not an expression library"),
+        (data[:4] + struct.pack("<H", VERSION + 1) + data[6:], "Unsupported expression library version"),
+        (bytes(flipped), "checksum mismatch"),
+        (data[:-3], "Truncated"),
+        (data[:8], "Truncated"),
+    ]
+    for corrupted, message in cases:
+        with pytest.raises(ValueError, match=message):
+            loads(corrupted)
+    assert data.startswith(MAGIC)
+
+def test_file_and_mmap(tmp_path):
+    path = tmp_path / "library.calx"
+    trees = [parse(text) for text in EXPRESSIONS]
+    dump(trees, path)
+    assert [evaluate(tree, variables=VARIABLES) for tree in load(path)] == \
+           [evaluate(tree, variables=VARIABLES) for tree in trees]
+    with open(path, "rb") as stream, mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        assert len(loads(buffer)) == len(trees)
+
+def test_precompile(tmp_path):
+    path = tmp_path / "library.calx"
+    total, errors = precompile(["1 + 2\n", "\n", "sin(30) * x\n", "1 2\n"], path, degrees=True)
+    assert total == 4
+    assert [line for line, _ in errors] == [4]
+    library = load(path, degrees=True)
+    assert library[1] is None and library[3] is None
+    # Константы свёрнуты для режима градусов
+    assert count_nodes(library[2]) == 3
+    assert evaluate(library[2], degrees=True, variables={"x": 3}) == evaluate(parse("sin(30) * 3"), degrees=True)
+
+def test_cli_precompile(tmp_path, capsys):
+    from calculator.main import main
+
+    source = tmp_path / "formulas.txt"
+    source.write_text("2 * x\nsqrt(16)\n", encoding="utf-8")
+    output = tmp_path / "formulas.calx"
+    main(["--batch", str(source), "--precompile", str(output)])
+    assert [evaluate(tree, variables={"x": 4}) for tree in load(output)] == [8, 4]
+
+    source.write_text("2 * x\n1 +\n", encoding="utf-8")
+    with pytest.raises(SystemExit):
+        main(["--batch", str(source), "--precompile", str(output), "--optimize"])
+    assert "line 2" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        main(["--precompile", str(output), "1 + 2"])
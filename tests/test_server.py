@@ -0,0 +1,124 @@
+import asyncio
+import json
+import socket
+import sys
+import pytest
+from calculator.server import CalculatorServer, handle_request
+from calculator.client import Client, parse_address
+from calculator.main import main
+
+def test_handle_request():
+    assert handle_request({"id": 7, "expression": "1+2"}) == {"id": 7, "result": 3.0}
+    response = handle_request({"expression": "1/0"})
+    assert response["type"] == "ZeroDivisionError"
+    assert handle_request({"expression": "x*2", "variables": {"x": 4}})["result"] == 8
+    assert "error" in handle_request(["1+1"])
+
+def test_parse_address():
+    assert parse_address("unix:/tmp/calc.sock") == (socket.AF_UNIX, "/tmp/calc.sock")
+    assert parse_address("localhost:9000") == (socket.AF_INET, ("localhost", 9000))
+    with pytest.raises(ValueError):
+        parse_address("localhost")
+
+def test_client_evaluate(server):
+    with Client(server.address) as client:
+        assert client.evaluate("2^10") == 1024
+        assert client.evaluate("sin(90)", degrees=True) == pytest.approx(1.0)
+        assert client.evaluate("x + y", variables={"x": 1, "y": 2}) == 3
+        with pytest.raises(ZeroDivisionError):
+            client.evaluate("1/0")
+        with pytest.raises(ValueError):
+            client.evaluate("1 +")
+
+def test_pipelined_responses_in_order(server):
+    requests = [{"id": i, "expression": f"{i} * 2"} for i in range(1000)]
+    with Client(server.address) as client:
+        responses = client.evaluate_many(requests, window=300)
+    assert [response["id"] for response in responses] == list(range(1000))
+    assert [response["result"] for response in responses] == [i * 2 for i in range(1000)]
+
+def test_shared_cache_across_connections(server):
+    for _ in range(3):
+        with Client(server.address) as client:
+            client.evaluate("1 + 2 * 3")
+    assert server.server.cache.stats()["hits"] == 2
+
+def test_malformed_request(server):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(parse_address(server.address)[1])
+    with sock, sock.makefile("rb") as reader:
+        sock.sendall(b"not json\n")
+        assert "malformed" in json.loads(reader.readline())["error"]
+
+def test_non_finite_results_are_strict_json(server):
+    def reject(constant):
+        raise ValueError(f"non-standard JSON constant {constant}")
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(parse_address(server.address)[1])
+    with sock, sock.makefile("rb") as reader:
+        sock.sendall(b'{"expression": "1e400"}\n{"expression": "x - x", "variables": {"x": "-inf"}}\n'
+                     b'{"expression": "1", "id": NaN}\n')
+        responses = [json.loads(reader.readline(), parse_constant=reject) for _ in range(3)]
+    assert responses[0] == {"result": "inf"} and responses[1] == {"result": "nan"}
+    assert "malformed" in responses[2]["error"]
+    with Client(server.address) as client:
+        assert client.evaluate("-(1e400)") == float("-inf")
+        assert client.evaluate("x * 2", variables={"x": float("inf")}) == float("inf")
+        assert [response["result"] for response in client.evaluate_many([{"expression": "1e400"}])] == [float("inf")]
+
+def test_heavy_expression_offloaded(start_server):
+    with start_server(workers=1, heavy_threshold=100) as running:
+        with Client(running.address) as client:
+            assert client.evaluate(" + ".join(["1"] * 1000)) == 1000
+            assert client.evaluate("1+1") == 2
+        assert running.server._executor is not None
+
+def test_start_replaces_only_stale_socket(tmp_path, start_server):
+    path = tmp_path / "calc.sock"
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(path))
+    stale.close()
+    with start_server(f"unix:{path}", workers=0) as running:
+        with Client(running.address) as client:
+            assert client.evaluate("1+1") == 2
+
+    important = tmp_path / "important.txt"
+    important.write_text("data")
+    with pytest.raises(FileExistsError, match="not a socket"):
+        asyncio.run(CalculatorServer(workers=0).start(f"unix:{important}"))
+    assert important.read_text() == "data"
+
+def test_cli_serve_refuses_regular_file(tmp_path, capsys):
+    important = tmp_path / "important.txt"
+    important.write_text("data")
+    with pytest.raises(SystemExit):
+        main(["--serve", f"unix:{important}"])
+    assert "not a socket" in capsys.readouterr().err
+    assert important.read_text() == "data"
+
+def test_cli_routes_to_server(server, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["main.py", "--server", server.address, "3*4"])
+    main()
+    assert capsys.readouterr().out == "12.0\n"
+    assert len(server.server.cache) == 1
+
+def test_cli_falls_back_without_server(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["main.py", "--server", f"unix:{tmp_path / 'missing.sock'}", "3*4"])
+    main()
+    assert capsys.readouterr().out == "12.0\n"
+
+def test_unresponsive_server_falls_back_after_timeout(tmp_path, monkeypatch, capsys):
+    from calculator import main as cli
+
+    # Сервер принимает соединения, но не отвечает
+    path = tmp_path / "hung.sock"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(path))
+    listener.listen()
+    with listener:
+        assert cli.evaluate_remote(f"unix:{path}", "3*4", False, timeout=0.1) is None
+        monkeypatch.setattr(cli, "REMOTE_TIMEOUT", 0.1)
+        monkeypatch.setattr(sys, "argv", ["main.py", "--server", f"unix:{path}", "3*4"])
+        main()
+    assert capsys.readouterr().out == "12.0\n"
@@ -0,0 +1,75 @@
+import math
+import random
+import pytest
+from calculator.parser import parse, Variable
+from calculator.evaluator import evaluate
+from calculator.templates import Template, TemplateCache, MIN_VECTOR_GROUP, slot_name
+
+def reference(expression, degrees=False, variables=None):
+    try:
+        return evaluate(parse(expression), degrees=degrees, variables=variables), None
+    except Exception as e:
+        return None, str(e)
+
+def test_template_slots_become_variables():
+    template = Template("#*sin(#)+#")
+    assert template.slots == [slot_name(0), slot_name(1), slot_name(2)]
+    assert isinstance(template.tree.left.left, Variable)
+    assert template.evaluate([2, 0, 1]) == 1
+    assert template.evaluate([2.0, math.pi / 2, 0.5]) == 2.5
+
+def test_instances_of_one_shape_share_template():
+    cache = TemplateCache()
+    assert cache.evaluate("3.2 * sin(0.5) + 1") == evaluate(parse("3.2*sin(0.5)+1"))
+    assert cache.evaluate("4*sin(0.25)+7") == evaluate(parse("4*sin(0.25)+7"))
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+@pytest.mark.parametrize("degrees", [False, True])
+@pytest.mark.parametrize("expression", [
+    "1/0", "-(5)^2", "(1)2", "1.5.3", "1 2 + 3", "sqrt(-1)", "10^400", "", "sin(",
+    "x+1", "y+1", "pi", "sin(30)", "(-8)^(1/3)", "ln(0)", "2x",
+])
+def test_same_result_or_error_as_evaluate(expression, degrees):
+    cache = TemplateCache()
+    try:
+        result = cache.evaluate(expression, degrees, {"x": 2}), None
+    except Exception as e:
+        result = None, str(e)
+    assert result == reference(expression, degrees, {"x": 2})
+
+def test_evaluate_many_matches_scalar_path():
+    rng = random.Random(3)
+    expressions = [f"{rng.uniform(-5, 5):.3f}*sin({rng.uniform(-3, 3):.2f})+{rng.randint(0, 9)}/{rng.randint(0, 3)}"
+                   for _ in range(200)]
+    expressions += [f"({rng.randint(-3, 3)})^{rng.choice(['0.5', '2', '-1'])}" for _ in range(100)]
+    expressions += ["1/0", "x*2", "1 2", "unknown+1", "pi"] * MIN_VECTOR_GROUP
+    cache = TemplateCache()
+    for degrees in (False, True):
+        results = cache.evaluate_many(expressions, degrees, {"x": 3})
+        for expression, (value, error) in zip(expressions, results):
+            expected, expected_error = reference(expression, degrees, {"x": 3})
+            assert error == expected_error, expression
+            if expected is not None:
+                assert value == pytest.approx(expected, rel=1e-12), expression
+
+@pytest.mark.parametrize("form", [
+    "max(2, sqrt({k} - 8))", "hypot(-{k})", "(1/({k} - 5))^0*1", "min(ln({k} - 3), 7)",
+])
+def test_evaluate_many_reports_errors_hidden_by_later_operations(form):
+    # Ошибка в одном подвыражении не должна исчезать в пакетном пути
+    expressions = [form.format(k=k) for k in range(2 * MIN_VECTOR_GROUP)]
+    results = TemplateCache().evaluate_many(expressions)
+    assert results == [reference(expression) for expression in expressions]
+
+def test_evaluate_many_keeps_order_and_empty_input():
+    cache = TemplateCache()
+    assert cache.evaluate_many([]) == []
+    assert cache.evaluate_many(["2*3", "1/0", "2*4"]) == [(6, None), (None, "Division by zero"), (8, None)]
+
+def test_capacity_is_respected():
+    cache = TemplateCache(capacity=1)
+    cache.evaluate("1+2")
+    cache.evaluate("1*2")
+    assert cache.stats()["evictions"] == 1
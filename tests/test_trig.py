@@ -0,0 +1,130 @@
+import math
+import random
+import decimal
+from decimal import Decimal
+import pytest
+from calculator import trig
+from calculator.trig import EXACT
+from calculator.parser import parse
+from calculator.evaluator import evaluate
+from calculator.compiler import compile
+from calculator.precise import pi, sin_cos, _context
+
+SPECIAL = [
+    # угол, sin, cos, tg, ctg; None - полюс
+    (0, 0.0, 1.0, 0.0, None),
+    (30, 0.5, trig.SQRT3_HALF, trig.TAN30, trig.SQRT3),
+    (45, trig.SQRT_HALF, trig.SQRT_HALF, 1.0, 1.0),
+    (60, trig.SQRT3_HALF, 0.5, trig.SQRT3, trig.TAN30),
+    (90, 1.0, 0.0, None, 0.0),
+    (120, trig.SQRT3_HALF, -0.5, -trig.SQRT3, -trig.TAN30),
+    (135, trig.SQRT_HALF, -trig.SQRT_HALF, -1.0, -1.0),
+    (180, 0.0, -1.0, 0.0, None),
+    (210, -0.5, -trig.SQRT3_HALF, trig.TAN30, trig.SQRT3),
+    (270, -1.0, 0.0, None, 0.0),
+    (315, -trig.SQRT_HALF, trig.SQRT_HALF, -1.0, -1.0),
+    (360, 0.0, 1.0, 0.0, None),
+    (-90, -1.0, 0.0, None, 0.0),
+    (-180, 0.0, -1.0, 0.0, None),
+    (-330, 0.5, trig.SQRT3_HALF, trig.TAN30, trig.SQRT3),
+    (360 * 2.0 ** 40 + 90, 1.0, 0.0, None, 0.0),
+]
+
+@pytest.mark.parametrize("angle, sin, cos, tg, ctg", SPECIAL)
+def test_special_angles_are_exact(angle, sin, cos, tg, ctg):
+    for function, value in zip((trig.sin, trig.cos, trig.tg, trig.ctg), (sin, cos, tg, ctg)):
+        if value is None:
+            with pytest.raises(ZeroDivisionError):
+                function(float(angle))
+        else:
+            result = function(float(angle))
+            assert result == value and math.copysign(1, result) == math.copysign(1, value), (function, angle)
+
+def _reference(name, x):
+    # sin_cos точного остатка Decimal(x) % 360, без округления аргумента
+    with decimal.localcontext(_context(40)):
+        sin, cos = sin_cos(Decimal(x) % 360 * pi(40) / 180)
+        return float({'sin': sin, 'cos': cos, 'tg': sin / cos, 'ctg': cos / sin}[name])
+
+@pytest.mark.parametrize("name", ["sin", "cos", "tg", "ctg"])
+def test_accuracy_within_two_ulps(name):
+    rng = random.Random(1)
+    angles = [rng.uniform(-1e4, 1e4) for _ in range(300)] + [rng.uniform(-1e-3, 1e-3) for _ in range(50)]
+    angles += [90 * k + rng.choice([-1, 1]) * 1e-9 for k in range(-8, 8)]
+    for x in angles:
+        expected = _reference(name, x)
+        assert abs(getattr(trig, name)(x) - expected) <= 2 * math.ulp(expected), x
+
+def test_arctg():
+    assert [trig.arctg(x) for x in (1.0, -1.0, trig.SQRT3, -trig.TAN30, math.inf)] == [45, -45, 60, -30, 90]
+    assert trig.arctg(0.5) == math.degrees(math.atan(0.5))
+
+def test_infinite_and_nan_arguments():
+    for function in (trig.sin, trig.cos, trig.tg, trig.ctg):
+        with pytest.raises(ValueError, match="math domain error"):
+            function(math.inf)
+        assert math.isnan(function(math.nan))
+
+def test_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(trig, "MEMO_SIZE", 10)
+    trig.clear_memos()
+    for x in range(25):
+        assert trig.FUNCTIONS['sin'](float(x)) == trig.sin(float(x))
+    assert 0 < len(trig.MEMOS['sin']) <= 10
+    trig.FUNCTIONS['sin'](math.nan)
+    assert all(x == x for x in trig.MEMOS['sin'])
+    with pytest.raises(ZeroDivisionError):
+        trig.FUNCTIONS['tg'](90.0)
+    assert 90.0 not in trig.MEMOS['tg']
+
+@pytest.mark.parametrize("first, second", [(0.0, -0.0), (-0.0, 0.0)])
+def test_memo_keeps_sign_of_zero(first, second):
+    # Результат не зависит от того, какой ноль вычислялся первым
+    trig.clear_memos()
+    for x in (first, second):
+        for name in ('sin', 'tg', 'arctg'):
+            assert repr(trig.FUNCTIONS[name](x)) == repr(getattr(trig, name)(x)), (name, x)
+    assert repr(evaluate(parse("arctg(x)"), degrees=EXACT, variables={"x": -0.0})) == "-0.0"
+
+def test_evaluate_exact_mode():
+    assert evaluate(parse("sin(180)"), degrees=EXACT) == 0
+    assert evaluate(parse("sin(180)"), degrees=True) != 0
+    assert evaluate(parse("sin(30) * 2 + cos(60) * 2"), degrees=EXACT) == 2
+    assert compile(parse("tg(x) + 1"), degrees=EXACT)({"x": 45}) == 2
+    with pytest.raises(ZeroDivisionError):
+        evaluate(parse("tg(90)"), degrees=EXACT)
+    # Функции без углов не меняются
+    assert evaluate(parse("sqrt(16) + ln(1)"), degrees=EXACT) == 4
+
+def test_vectorized_exact_mode():
+    np = pytest.importorskip("numpy")
+    from calculator.vectorized import evaluate_batch
+
+    angles = np.array([row[0] for row in SPECIAL] + [0.5, -1e5 - 7.25, 1e-300, np.nan], dtype=np.float64)
+    for name in ("sin", "cos", "tg", "ctg"):
+        values = evaluate_batch(parse(f"{name}(x)"), {"x": angles}, degrees=EXACT, errors='nan')
+        for x, value in zip(angles.tolist(), values.tolist()):
+            try:
+                expected = evaluate(parse(f"{name}(x)"), degrees=EXACT, variables={"x": x})
+            except ZeroDivisionError:
+                assert math.isnan(value)
+            else:
+                assert value == expected or (math.isnan(value) and math.isnan(expected)), (name, x)
+    with pytest.raises(ZeroDivisionError):
+        evaluate_batch(parse("ctg(x)"), {"x": angles}, degrees=EXACT)
+    arctg = evaluate_batch(parse("arctg(x)"), {"x": np.array([1.0, -trig.SQRT3, 0.5])}, degrees=EXACT)
+    assert arctg.tolist() == [45.0, -60.0, trig.arctg(0.5)]
+
+def test_cli_exact_trig(capsys):
+    from calculator.main import main
+
+    main(["sin(180)", "--degrees", "--exact-trig"])
+    assert capsys.readouterr().out.strip() == "0.0"
+    with pytest.raises(SystemExit):
+        main(["sin(180)", "--exact-trig"])
+
+def test_server_accepts_exact_mode():
+    from calculator.server import handle_request
+
+    assert handle_request({"expression": "cos(90)", "degrees": EXACT}) == {"result": 0.0}
+    assert handle_request({"expression": "cos(90)", "degrees": True})["result"] != 0
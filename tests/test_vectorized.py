@@ -0,0 +1,181 @@
+import math
+import pytest
+from calculator.parser import parse, Variable, BinaryOp, Number
+from calculator.evaluator import evaluate
+from calculator.trig import EXACT
+
+np = pytest.importorskip("numpy")
+from calculator.vectorized import evaluate_batch, gradient_batch
+
+X = [-3.5, -1.0, 0.5, 1.0, 2.0, 7.25]
+
+@pytest.mark.parametrize("expr_str", [
+    "x + 1",
+    "2 * x - x / 4",
+    "x ^ 2 + 3",
+    "-(x) * pi",
+    "sin(x) + cos(x) * tg(x)",
+    "arctg(x) + exp(x)",
+    "sqrt(x * x) + ln(x ^ 2)",
+    "hypot(x, 2) + max(x, 1, -(x)) * min(x, 2) - pow(x, 2)",
+])
+@pytest.mark.parametrize("degrees", [False, True, EXACT])
+def test_matches_scalar_evaluate(expr_str, degrees):
+    expr = parse(expr_str)
+    result = evaluate_batch(expr, {"x": np.array(X)}, degrees=degrees)
+    expected = [evaluate(expr, degrees=degrees, variables={"x": x}) for x in X]
+    assert result == pytest.approx(expected, rel=1e-12)
+
+@pytest.mark.parametrize("expr_str", ["min(x, y)", "max(x, y)", "min(y, x, 1)", "max(1, x, y)"])
+def test_min_max_nan_like_scalar_evaluate(expr_str):
+    # NaN в первом аргументе сохраняется, в остальных пропускается, как у встроенных min и max
+    nan = float("nan")
+    xs = [nan, 1.0, nan, -0.0, 0.0]
+    ys = [2.0, nan, nan, 0.0, -0.0]
+    expr = parse(expr_str)
+    result = evaluate_batch(expr, {"x": np.array(xs), "y": np.array(ys)})
+    expected = [evaluate(expr, variables={"x": x, "y": y}) for x, y in zip(xs, ys)]
+    assert [repr(value) for value in result.tolist()] == [repr(value) for value in expected]
+
+def test_single_argument_hypot_is_absolute_value():
+    expr = parse("hypot(x)")
+    result = evaluate_batch(expr, {"x": np.array([-3.0, 0.0, 2.5, -np.inf])})
+    assert result.tolist() == [evaluate(expr, variables={"x": x}) for x in [-3.0, 0.0, 2.5, -math.inf]]
+
+def test_min_max_keep_errors_of_skipped_arguments():
+    expr = parse("max(x, sqrt(y))")
+    variables = {"x": np.array([1.0, 1.0]), "y": np.array([4.0, -1.0])}
+    assert np.isnan(evaluate_batch(expr, variables, errors="nan")).tolist() == [False, True]
+    with pytest.raises(ValueError):
+        evaluate(expr, variables={"x": 1.0, "y": -1.0})
+
+def test_several_variables_broadcast():
+    expr = parse("x * y + 1")
+    result = evaluate_batch(expr, {"x": np.array([1.0, 2.0, 3.0]), "y": 2.0})
+    assert result.tolist() == [3.0, 5.0, 7.0]
+
+def test_constant_expression_takes_variables_shape():
+    result = evaluate_batch(parse("2 + 2"), {"x": np.zeros(4)})
+    assert result.tolist() == [4.0] * 4
+
+def test_parse_variable():
+    expr = parse("x + 1")
+    assert isinstance(expr.left, Variable)
+    assert expr.left.name == "x"
+
+def test_unknown_variable():
+    with pytest.raises(ValueError, match="Unknown variable"):
+        evaluate_batch(parse("x + y"), {"x": np.ones(3)})
+    with pytest.raises(ValueError, match="Unknown variable"):
+        evaluate(parse("x + y"), variables={"x": 1.0})
+
+@pytest.mark.parametrize("expr_str, x, error", [
+    ("1 / x", [1.0, 0.0], ZeroDivisionError),
+    ("1e300 / x", [1.0, 1e-300], OverflowError),
+    ("x ^ 0.5", [4.0, -2.0], ValueError),
+    ("x ^ (-1)", [2.0, 0.0], ZeroDivisionError),
+    ("10 ^ x", [2.0, 400.0], OverflowError),
+    ("sqrt(x)", [4.0, -1.0], ValueError),
+    ("ln(x)", [1.0, 0.0], ValueError),
+    ("exp(x)", [1.0, 1000.0], OverflowError),
+    ("ctg(x)", [1.0, 0.0], ZeroDivisionError),
+])
+def test_errors_match_scalar_evaluate(expr_str, x, error):
+    expr = parse(expr_str)
+    with pytest.raises(error):
+        evaluate(expr, variables={"x": x[1]})
+    with pytest.raises(error):
+        evaluate_batch(expr, {"x": np.array(x)})
+
+    result = evaluate_batch(expr, {"x": np.array(x)}, errors="nan")
+    assert result[0] == pytest.approx(evaluate(expr, variables={"x": x[0]}))
+    assert math.isnan(result[1])
+
+@pytest.mark.parametrize("expr_str, x, y", [
+    ("(1 / x) ^ 0", [2.0, 0.0], [0.0, 0.0]),
+    ("1 ^ ln(x)", [2.0, 0.0], [0.0, 0.0]),
+    ("hypot(sqrt(x), y)", [4.0, -1.0], [3.0, float("inf")]),
+    ("max(2, sqrt(x))", [9.0, -4.0], [0.0, 0.0]),
+    ("min(y, ln(x))", [1.0, -1.0], [5.0, 5.0]),
+    ("x / y * 0", [1.0, 1.0], [2.0, 0.0]),
+])
+def test_error_rows_stay_errors_after_later_operations(expr_str, x, y):
+    # NaN ошибки мог бы скрыть следующий шаг (nan^0 = 1), поэтому ошибки идут маской
+    from calculator.vectorized import evaluate_batch_masked
+
+    expr = parse(expr_str)
+    variables = {"x": np.array(x), "y": np.array(y)}
+    with pytest.raises(Exception):
+        evaluate(expr, variables={"x": x[1], "y": y[1]})
+    with pytest.raises(Exception):
+        evaluate_batch(expr, variables)
+
+    expected = evaluate(expr, variables={"x": x[0], "y": y[0]})
+    result = evaluate_batch(expr, variables, errors="nan")
+    assert result[0] == pytest.approx(expected) and math.isnan(result[1])
+    values, failed = evaluate_batch_masked(expr, variables)
+    assert failed.tolist() == [False, True] and values[0] == pytest.approx(expected)
+    value, partials = gradient_batch(expr, variables, errors="nan")
+    assert math.isnan(value[1]) and all(math.isnan(partial[1]) for partial in partials.values())
+
+def test_unknown_error_policy():
+    with pytest.raises(ValueError):
+        evaluate_batch(Number(1), errors="ignore")
+
+def test_unknown_operator():
+    with pytest.raises(ValueError):
+        evaluate_batch(BinaryOp(Number(1), '%', Number(2)))
+
+@pytest.mark.parametrize("expr_str", [
+    "x * y - x / y",
+    "sqrt(x) * ln(y) + exp(0 - x) ^ y",
+    "sin(x) * cos(y) + tg(x) - ctg(y) + arctg(x * y)",
+    "hypot(x, y, 1) + pow(x, y) - max(x, y) * min(x, 2 * y)",
+])
+@pytest.mark.parametrize("degrees", [False, True, EXACT])
+def test_gradient_batch_matches_scalar_gradient(expr_str, degrees):
+    from calculator.autodiff import gradient
+
+    expr = parse(expr_str)
+    xs = np.array([0.3, 1.1, 2.5])
+    ys = np.array([0.7, 1.9, 0.4])
+    values, grads = gradient_batch(expr, {"x": xs, "y": ys}, degrees)
+    for i in range(len(xs)):
+        value, grad = gradient(expr, {"x": xs[i], "y": ys[i]}, degrees)
+        assert values[i] == pytest.approx(value)
+        assert grads["x"][i] == pytest.approx(grad["x"])
+        assert grads["y"][i] == pytest.approx(grad["y"])
+
+@pytest.mark.parametrize("expr_str, x, y", [
+    ("sqrt(x)", 0.0, 1.0),
+    ("x ^ 0.5 + y ^ (-1)", 0.0, 2.0),
+    ("(x * 0) ^ (-1.5) + y", 1.0, 1.0),
+    ("x / y", 1e200, 1e-100),
+    ("y ^ x", 2.0, -2.0),
+    ("0 ^ x", 2.0, 1.0),
+    ("hypot(x, y)", 0.0, 0.0),
+    ("x ^ 3", -1e200, 1.0),
+    ("ln(x) * y", 1e-320, 1.0),
+])
+def test_gradient_batch_and_scalar_agree_where_derivative_is_undefined(expr_str, x, y):
+    from calculator.autodiff import gradient
+
+    expr = parse(expr_str)
+    variables = {"x": x, "y": y}
+    try:
+        value, grad = gradient(expr, variables)
+    except Exception as error:
+        with pytest.raises(type(error)):
+            gradient_batch(expr, {"x": np.array([x]), "y": np.array([y])})
+        return
+    batch_value, batch_grad = gradient_batch(expr, {"x": np.array([x]), "y": np.array([y])})
+    assert batch_value[0] == pytest.approx(value, nan_ok=True)
+    for name in variables:
+        assert batch_grad[name][0] == pytest.approx(grad[name], nan_ok=True), name
+
+def test_gradient_batch_broadcasts_scalars():
+    values, grads = gradient_batch(parse("a * x + 1"), {"a": 2.0, "x": np.arange(3.0), "b": 1.0})
+    assert values.tolist() == [1.0, 3.0, 5.0]
+    assert grads["a"].tolist() == [0.0, 1.0, 2.0]
+    assert grads["x"].tolist() == [2.0, 2.0, 2.0]
+    assert grads["b"].tolist() == [0.0, 0.0, 0.0]